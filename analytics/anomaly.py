@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import subprocess
+from datetime import datetime, timezone
+
+from analytics.profiles import PROFILE_TZ
+
+# Потоковый детектор аномалий. Таблицы anomalies и anomaly_baselines
+# создаются в collector.db.init_db.
+#
+# На каждого пользователя — базовая линия постоянного размера:
+#   * P²-оценки квантилей длительности сессии (5 маркеров на квантиль,
+#     Jain & Chlamtac, 1985) — история не хранится;
+#   * частоты начала сессий по часам суток (локальное время)
+#     с экспоненциальным затуханием.
+#
+# События:
+#   unusual_time — вход в час, где пользователь почти не бывает
+#   long_session — онлайн дольше LONG_FACTOR × p95 длительности
+
+QUANTILES = (0.5, 0.95)
+MIN_SESSIONS = 20
+LONG_FACTOR = 2.0
+LONG_MIN = 600
+RARE_SHARE = 0.02
+HOURS_HALF_LIFE = 30 * 86400
+
+ANOMALY_HOOK = os.getenv("ANOMALY_HOOK")
+
+
+class P2Quantile:
+    """Оценка квантиля p за O(1) памяти (алгоритм P²)."""
+
+    def __init__(self, p, state=None):
+        self.p = p
+        state = state or {}
+        self.n = state.get("n", 0)
+        self.q = state.get("q", [])
+        self.pos = state.get("pos", [1, 2, 3, 4, 5])
+        self.want = state.get("want", [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5])
+
+    def to_dict(self):
+        return {"n": self.n, "q": self.q, "pos": self.pos, "want": self.want}
+
+    def value(self):
+        if self.n == 0:
+            return None
+        if self.n < 5:
+            q = sorted(self.q)
+            return q[min(len(q) - 1, int(self.p * len(q)))]
+        return self.q[2]
+
+    def add(self, x):
+        self.n += 1
+        if self.n <= 5:
+            self.q.append(x)
+            if self.n == 5:
+                self.q.sort()
+            return
+
+        q, pos = self.q, self.pos
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+
+        for i in range(k + 1, 5):
+            pos[i] += 1
+        p = self.p
+        for i, dw in enumerate((0, p / 2, p, (1 + p) / 2, 1)):
+            self.want[i] += dw
+
+        for i in (1, 2, 3):
+            d = self.want[i] - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+                d = 1 if d > 0 else -1
+                qi = self._parabolic(i, d)
+                if not q[i - 1] < qi < q[i + 1]:
+                    qi = q[i] + d * (q[i + d] - q[i]) / (pos[i + d] - pos[i])
+                q[i] = qi
+                pos[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self.q, self.pos
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+
+class Baseline:
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.sessions = state.get("sessions", 0)
+        self.updated_at = state.get("updated_at")
+        self.hours = state.get("hours", [0.0] * 24)
+        self.quantiles = {
+            p: P2Quantile(p, state.get("quantiles", {}).get(str(p)))
+            for p in QUANTILES
+        }
+
+    def to_dict(self):
+        return {
+            "sessions": self.sessions,
+            "updated_at": self.updated_at,
+            "hours": self.hours,
+            "quantiles": {str(p): q.to_dict() for p, q in self.quantiles.items()},
+        }
+
+    def warm(self):
+        return self.sessions >= MIN_SESSIONS
+
+    def hour_share(self, hour):
+        total = sum(self.hours)
+        if total <= 0:
+            return None
+        # соседние часы сглаживают границу: 21:59 и 22:01 — одно и то же
+        w = 0.5 * self.hours[hour] + 0.25 * (self.hours[hour - 1] + self.hours[(hour + 1) % 24])
+        return w / total
+
+    def long_threshold(self):
+        p95 = self.quantiles[0.95].value()
+        return None if p95 is None else max(LONG_MIN, LONG_FACTOR * p95)
+
+    def add(self, start, end):
+        if self.updated_at is not None and end > self.updated_at:
+            k = 0.5 ** ((end - self.updated_at) / HOURS_HALF_LIFE)
+            self.hours = [w * k for w in self.hours]
+        self.hours[local_hour(start)] += 1.0
+        for q in self.quantiles.values():
+            q.add(float(end - start))
+        self.sessions += 1
+        self.updated_at = max(self.updated_at or end, end)
+
+
+def local_hour(ts):
+    return datetime.fromtimestamp(ts, PROFILE_TZ).hour
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(int(ts), timezone.utc).isoformat()
+
+
+class Detector:
+    """
+    Вызывается из collector.save_session:
+
+        on_online(user_id, start)        — сессия началась
+        on_tick(user_id, start, now)     — пользователь всё ещё онлайн
+        on_session(user_id, start, end)  — сессия закрыта, обновить базу
+
+    Базовые линии читаются из базы один раз и живут в памяти.
+    """
+
+    def __init__(self, conn, hooks=None):
+        self.conn = conn
+        self.hooks = list(hooks or [])
+        self._baselines = {}
+        self._flagged = set()  # (user_id, start) — long_session уже отправлен
+
+    def baseline(self, user_id):
+        b = self._baselines.get(user_id)
+        if b is None:
+            row = self.conn.execute(
+                "SELECT state FROM anomaly_baselines WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            b = Baseline(json.loads(row[0]) if row else None)
+            self._baselines[user_id] = b
+        return b
+
+    def _save(self, user_id, b):
+        self.conn.execute(
+            """
+            INSERT INTO anomaly_baselines(user_id, state) VALUES (?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET state = excluded.state
+            """,
+            (user_id, json.dumps(b.to_dict()))
+        )
+
+    def emit(self, user_id, kind, started_at, value, threshold, details=None, commit=True):
+        event = {
+            "user_id": user_id,
+            "kind": kind,
+            "detected_at": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+            "started_at": _iso(started_at),
+            "value": round(float(value), 4),
+            "threshold": round(float(threshold), 4),
+            "details": details or {},
+        }
+        self.conn.execute(
+            """
+            INSERT INTO anomalies(user_id, kind, detected_at, started_at, value, threshold, details)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (user_id, kind, event["detected_at"], event["started_at"],
+             event["value"], event["threshold"], json.dumps(event["details"]))
+        )
+        if commit:
+            self.conn.commit()
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                print(f"⚠️ Anomaly hook failed: {e}")
+        return event
+
+    # --------------------------------------------------
+    # Events
+    # --------------------------------------------------
+    def on_online(self, user_id, start):
+        b = self.baseline(user_id)
+        if not b.warm():
+            return None
+        hour = local_hour(start)
+        share = b.hour_share(hour)
+        if share is not None and share < RARE_SHARE:
+            return self.emit(user_id, "unusual_time", start, share, RARE_SHARE, {"hour": hour})
+        return None
+
+    def on_tick(self, user_id, start, now):
+        b = self.baseline(user_id)
+        limit = b.long_threshold()
+        if not b.warm() or limit is None or (user_id, start) in self._flagged:
+            return None
+        if now - start > limit:
+            self._flagged.add((user_id, start))
+            return self.emit(user_id, "long_session", start, now - start, limit, {"ongoing": True})
+        return None
+
+    def on_session(self, user_id, start, end, commit=True):
+        start, end = int(start), int(end)
+        b = self.baseline(user_id)
+
+        event = None
+        limit = b.long_threshold()
+        if (user_id, start) in self._flagged:
+            self._flagged.discard((user_id, start))
+        elif b.warm() and limit is not None and end - start > limit:
+            event = self.emit(user_id, "long_session", start, end - start, limit, {"ongoing": False}, commit=False)
+
+        b.add(start, end)
+        self._save(user_id, b)
+        if commit:
+            self.conn.commit()
+        return event
+
+
+def command_hook(command):
+    # внешняя команда получает событие JSON-строкой на stdin, не блокируя коллектор
+    def hook(event):
+        proc = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE)
+        proc.stdin.write(json.dumps(event, ensure_ascii=False).encode() + b"\n")
+        proc.stdin.close()
+    return hook
+
+
+def default_hooks():
+    hooks = [lambda e: print(f"🚨 {e['kind']}: user {e['user_id']} at {e['started_at']} ({e['value']} vs {e['threshold']})")]
+    if ANOMALY_HOOK:
+        hooks.append(command_hook(ANOMALY_HOOK))
+    return hooks
+
+# --------------------------------------------------
+# Seed
+# --------------------------------------------------
+def seed(db_file):
+    """Начальные базовые линии по online_sessions (разовый проход)."""
+    from collector.db import connect, init_db
+
+    conn = connect(db_file)
+    init_db(conn)
+    conn.execute("DELETE FROM anomaly_baselines")
+
+    detector = Detector(conn)
+    rows = conn.execute(
+        "SELECT user_id, started_at, ended_at FROM online_sessions ORDER BY ended_at"
+    ).fetchall()
+    for user_id, s, e in rows:
+        b = detector.baseline(user_id)
+        b.add(int(datetime.fromisoformat(s).timestamp()), int(datetime.fromisoformat(e).timestamp()))
+
+    for user_id, b in detector._baselines.items():
+        detector._save(user_id, b)
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed anomaly baselines from online_sessions")
+    parser.add_argument("--db", default=os.getenv("DB_FILE", "shared/vitm.db"))
+    args = parser.parse_args()
+
+    n = seed(args.db)
+    print(f"✅ Anomaly baselines seeded from {n} sessions")
+
+
+if __name__ == "__main__":
+    main()
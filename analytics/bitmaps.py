@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Битовые карты онлайна: один файл на пользователя на сутки (UTC),
+# 1 бит на секунду — 86400 бит = 10800 байт. Файлы открываются через
+# np.memmap, поэтому запрос за месяц читает только нужные килобайты.
+#
+#   shared/bitmaps/<user_id>/<YYYY-MM-DD>.bin
+#
+# Порядок бит как у np.packbits: секунда 0 — старший бит байта 0.
+
+DAY = 86400
+DAY_BYTES = DAY // 8
+BITMAP_DIR = os.getenv("BITMAP_DIR", "shared/bitmaps")
+
+# после полного бэкфилла карты считаются полными, дальше их ведёт коллектор
+READY_MARKER = "_backfill.json"
+
+_HEAD_MASK = np.array([0xFF >> i for i in range(8)], dtype=np.uint8)           # биты с i-го до конца байта
+_TAIL_MASK = np.array([(0xFF << (8 - i)) & 0xFF for i in range(9)], dtype=np.uint8)  # первые i бит
+
+
+def day_of(ts):
+    return int(ts) // DAY
+
+
+def day_name(day):
+    return datetime.fromtimestamp(day * DAY, timezone.utc).strftime("%Y-%m-%d")
+
+
+def split_days(lo, hi):
+    # [lo, hi) -> (day, a, b): смещения в секундах внутри суток
+    lo, hi = int(lo), int(hi)
+    for day in range(day_of(lo), day_of(hi - 1) + 1 if hi > lo else day_of(lo)):
+        base = day * DAY
+        yield day, max(lo, base) - base, min(hi, base + DAY) - base
+
+
+def set_bits(buf, a, b):
+    # выставить биты [a, b) в uint8-буфере
+    if b <= a:
+        return
+    first, last = a // 8, (b - 1) // 8
+    if first == last:
+        buf[first] |= _HEAD_MASK[a % 8] & _TAIL_MASK[(b - 1) % 8 + 1]
+        return
+    buf[first] |= _HEAD_MASK[a % 8]
+    buf[first + 1:last] = 0xFF
+    buf[last] |= _TAIL_MASK[(b - 1) % 8 + 1]
+
+
+def clear_bits(buf, a, b):
+    # сбросить биты [a, b)
+    if b <= a:
+        return
+    first, last = a // 8, (b - 1) // 8
+    if first == last:
+        buf[first] &= ~(_HEAD_MASK[a % 8] & _TAIL_MASK[(b - 1) % 8 + 1])
+        return
+    buf[first] &= ~_HEAD_MASK[a % 8]
+    buf[first + 1:last] = 0
+    buf[last] &= ~_TAIL_MASK[(b - 1) % 8 + 1]
+
+
+def masked(buf, a, b):
+    # копия байтов, покрывающих [a, b), с обнулёнными битами вне диапазона
+    first, last = a // 8, (b - 1) // 8
+    out = np.array(buf[first:last + 1], dtype=np.uint8)
+    out[0] &= _HEAD_MASK[a % 8]
+    out[-1] &= _TAIL_MASK[(b - 1) % 8 + 1]
+    return out
+
+
+class BitmapStore:
+
+    def __init__(self, root=BITMAP_DIR):
+        self.root = root
+
+    def path(self, user_id, day):
+        return os.path.join(self.root, str(user_id), f"{day_name(day)}.bin")
+
+    def ready(self):
+        return os.path.exists(os.path.join(self.root, READY_MARKER))
+
+    def info(self):
+        # сведения полного бэкфилла или None, пока его не было
+        if not self.ready():
+            return None
+        with open(os.path.join(self.root, READY_MARKER)) as f:
+            return json.load(f)
+
+    def mark_ready(self, info):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, READY_MARKER), "w") as f:
+            json.dump(info, f)
+
+    def day(self, user_id, day):
+        # только чтение; нет файла — пользователь в эти сутки не был онлайн
+        path = self.path(user_id, day)
+        if not os.path.exists(path):
+            return None
+        return np.memmap(path, dtype=np.uint8, mode="r", shape=(DAY_BYTES,))
+
+    def _day_rw(self, user_id, day):
+        path = self.path(user_id, day)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.truncate(DAY_BYTES)
+        return np.memmap(path, dtype=np.uint8, mode="r+", shape=(DAY_BYTES,))
+
+    # --------------------------------------------------
+    # Запись
+    # --------------------------------------------------
+    def add_interval(self, user_id, start, end):
+        for day, a, b in split_days(start, end):
+            buf = self._day_rw(user_id, day)
+            set_bits(buf, a, b)
+            buf.flush()
+
+    def add_intervals(self, user_id, starts, ends):
+        by_day = {}
+        for s, e in zip(starts, ends):
+            for day, a, b in split_days(s, e):
+                by_day.setdefault(day, []).append((a, b))
+        for day, ranges in by_day.items():
+            buf = self._day_rw(user_id, day)
+            for a, b in ranges:
+                set_bits(buf, a, b)
+            buf.flush()
+
+    def clear(self, lo=None, hi=None, user_ids=None):
+        """
+        Сбросить биты [lo, hi) в существующих картах (None — без границы).
+
+        Возвращает [(user_id, day, a, b)] — что было очищено.
+        """
+        cleared = []
+        if not os.path.isdir(self.root):
+            return cleared
+        names = [str(u) for u in user_ids] if user_ids is not None else os.listdir(self.root)
+        for name in sorted(names):
+            folder = os.path.join(self.root, name)
+            if not name.isdigit() or not os.path.isdir(folder):
+                continue
+            for file in sorted(os.listdir(folder)):
+                if not file.endswith(".bin"):
+                    continue
+                date = datetime.strptime(file[:-4], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+                day = int(date.timestamp()) // DAY
+                base = day * DAY
+                a = 0 if lo is None else min(max(int(lo) - base, 0), DAY)
+                b = DAY if hi is None else min(max(int(hi) - base, 0), DAY)
+                if b <= a:
+                    continue
+                buf = self._day_rw(int(name), day)
+                clear_bits(buf, a, b)
+                buf.flush()
+                cleared.append((int(name), day, a, b))
+        return cleared
+
+    # --------------------------------------------------
+    # Запросы
+    # --------------------------------------------------
+    def _chunks(self, user_id, lo, hi):
+        # (day, a, b, байты или None) по суткам окна
+        for day, a, b in split_days(lo, hi):
+            buf = self.day(user_id, day)
+            yield day, a, b, None if buf is None else masked(buf, a, b)
+
+    def uptime(self, user_id, lo, hi):
+        return int(sum(
+            np.bitwise_count(chunk).sum()
+            for _, _, _, chunk in self._chunks(user_id, lo, hi)
+            if chunk is not None
+        ))
+
+    def _combine(self, user_ids, lo, hi, op):
+        total = 0
+        for day, a, b in split_days(lo, hi):
+            acc = None
+            for uid in user_ids:
+                buf = self.day(uid, day)
+                chunk = masked(buf, a, b) if buf is not None else None
+                if chunk is None:
+                    if op is np.bitwise_and:
+                        acc = None
+                        break
+                    continue
+                acc = chunk if acc is None else op(acc, chunk)
+            if acc is not None:
+                total += int(np.bitwise_count(acc).sum())
+        return total
+
+    def overlap(self, user_ids, lo, hi):
+        """Секунды, когда онлайн были все user_ids одновременно (AND)."""
+        return self._combine(user_ids, lo, hi, np.bitwise_and)
+
+    def any_online(self, user_ids, lo, hi):
+        """Секунды, когда онлайн был хоть кто-то из user_ids (OR)."""
+        return self._combine(user_ids, lo, hi, np.bitwise_or)
+
+    def bits(self, user_id, lo, hi):
+        # распакованное окно [lo, hi) — bool по секундам
+        parts = []
+        for _, a, b, chunk in self._chunks(user_id, lo, hi):
+            if chunk is None:
+                parts.append(np.zeros(b - a, dtype=bool))
+            else:
+                off = a % 8
+                parts.append(np.unpackbits(chunk)[off:off + b - a].astype(bool))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=bool)
+
+    def downsample(self, user_id, lo, hi, step):
+        """Доля онлайна в каждом интервале step секунд окна [lo, hi)."""
+        bits = self.bits(user_id, lo, hi)
+        n = -(-len(bits) // step)
+        padded = np.zeros(n * step, dtype=np.float32)
+        padded[:len(bits)] = bits
+        frac = padded.reshape(n, step).sum(axis=1)
+        # последний неполный интервал нормируем на его длину
+        sizes = np.full(n, step, dtype=np.float32)
+        if n and len(bits) % step:
+            sizes[-1] = len(bits) % step
+        return frac / sizes
+
+# --------------------------------------------------
+# Backfill
+# --------------------------------------------------
+def backfill(db_file, store, lo=None, hi=None, user_ids=None):
+    """
+    Переписать карты из online_sessions за [lo, hi) (None — без границы).
+
+    Биты диапазона сначала сбрасываются: сессии, которые укоротил
+    collector.rebuild, иначе так и остались бы в картах. Готовыми карты
+    помечаются только после полного бэкфилла — частичный не знает, что
+    лежит вне диапазона.
+    """
+    from analytics.pyramid import PyramidStore
+    from collector.db import connect_readonly
+
+    sql = "SELECT user_id, started_at, ended_at FROM online_sessions WHERE 1 = 1"
+    params = []
+    if lo is not None:
+        sql += " AND ended_at >= ?"
+        params.append(datetime.fromtimestamp(lo, timezone.utc).isoformat())
+    if hi is not None:
+        sql += " AND started_at <= ?"
+        params.append(datetime.fromtimestamp(hi, timezone.utc).isoformat())
+    if user_ids is not None:
+        sql += f" AND user_id IN ({', '.join('?' * len(user_ids))})"
+        params += list(user_ids)
+
+    conn = connect_readonly(db_file)
+    rows = conn.execute(sql, params).fetchall()
+    conn.close()
+
+    per_user = {}
+    for uid, s, e in rows:
+        s = int(datetime.fromisoformat(s).timestamp())
+        e = int(datetime.fromisoformat(e).timestamp())
+        if lo is not None:
+            s = max(s, lo)
+        if hi is not None:
+            e = min(e, hi)
+        if e > s:
+            starts, ends = per_user.setdefault(uid, ([], []))
+            starts.append(s)
+            ends.append(e)
+
+    cleared = store.clear(lo, hi, user_ids)
+    for uid, (starts, ends) in per_user.items():
+        store.add_intervals(uid, starts, ends)
+
+    # пирамида строится из бит — очищенные часы пересчитываем
+    pyramid = PyramidStore(store.root, store)
+    if pyramid.ready():
+        for uid, day, a, b in cleared:
+            pyramid._rebuild(uid, day, [(h * 3600, (h + 1) * 3600) for h in range(a // 3600, -(-b // 3600))])
+        for uid, (starts, ends) in per_user.items():
+            pyramid.add_intervals(uid, starts, ends)
+
+    if lo is None and hi is None and user_ids is None:
+        store.mark_ready({
+            "db_file": db_file,
+            "sessions": len(rows),
+            "at": datetime.now(timezone.utc).isoformat(),
+        })
+    return len(rows)
+
+
+def _parse_date(value):
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill online bitmaps from online_sessions")
+    parser.add_argument("--db", default=os.getenv("DB_FILE", "shared/vitm.db"))
+    parser.add_argument("--dir", default=BITMAP_DIR)
+    parser.add_argument("--from", dest="lo", type=_parse_date, help="UTC date/time, e.g. 2025-12-01")
+    parser.add_argument("--to", dest="hi", type=_parse_date)
+    args = parser.parse_args()
+
+    store = BitmapStore(args.dir)
+    n = backfill(args.db, store, args.lo, args.hi)
+    print(f"✅ Bitmaps updated from {n} sessions → {args.dir}")
+    if not store.ready():
+        print("⚠️ Partial backfill: bitmaps stay unused until a full run without --from/--to")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+from functools import partial
+
+import numpy as np
+import pytz
+
+from analytics.bitmaps import BitmapStore
+from analytics.copresence import co_online, overlap_totals
+from analytics.correlation import correlation_matrix, lead_lag, rasterize
+from analytics.intervals import merge
+
+DAY = 86400
+DISPLAY_TZ = os.getenv("DISPLAY_TZ", "Europe/Kiev")
+
+# Пакетная аналитика по диапазону дат.
+#
+#   python -m analytics --from "2025-12-01" --to "2026-01-01" --user @a --user @b
+#
+# Работа режется на куски (пользователь, сутки) и считается в пуле
+# процессов. Каждый кусок сам читает свои строки из базы и возвращает
+# только счётчики и интервалы сессий, поэтому память главного процесса
+# не зависит от числа строк в online_statuses.
+#
+# С --history DIR данные читаются из выгрузки analytics.export, живая
+# база не открывается вовсе.
+#
+# Если битовые карты (analytics.bitmaps) построены по этой же базе,
+# uptime.csv считается по ним popcount'ом, а не по интервалам сессий.
+
+# --------------------------------------------------
+# Chunk (выполняется в воркере)
+# --------------------------------------------------
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def longest_session(conn):
+    """Длина самой длинной сессии в базе, не меньше суток (секунды)."""
+    row = conn.execute(
+        "SELECT MAX(strftime('%s', ended_at) - strftime('%s', started_at)) FROM online_sessions"
+    ).fetchone()
+    return max(DAY, int(row[0] or 0))
+
+
+def analyze_chunk(db_file, user_id, lo, hi, reach=DAY):
+    from collector.db import connect_readonly
+
+    conn = connect_readonly(db_file)
+    try:
+        online, total = conn.execute(
+            """
+            SELECT TOTAL(status = 'online'), COUNT(*) FROM online_statuses
+            WHERE user_id = ? AND date >= ? AND date < ?
+            """,
+            (user_id, _iso(lo), _iso(hi))
+        ).fetchone()
+
+        # started_at снизу ограничен на reach раньше — так работает индекс
+        # UNIQUE(user_id, started_at); reach — самая длинная сессия базы
+        # (longest_session), иначе часть сессии длиннее reach пропадёт
+        rows = conn.execute(
+            """
+            SELECT started_at, ended_at FROM online_sessions
+            WHERE user_id = ? AND started_at >= ? AND started_at < ? AND ended_at > ?
+            """,
+            (user_id, _iso(lo - reach), _iso(hi), _iso(lo))
+        ).fetchall()
+    finally:
+        conn.close()
+
+    starts = np.array([datetime.fromisoformat(s).timestamp() for s, _ in rows], dtype="int64")
+    ends = np.array([datetime.fromisoformat(e).timestamp() for _, e in rows], dtype="int64")
+    starts, ends = merge(np.maximum(starts, lo), np.minimum(ends, hi))
+
+    return user_id, int(online), int(total), starts, ends
+
+
+def analyze_chunk_history(root, user_id, lo, hi):
+    # то же по выгрузке analytics.export: файлы суток открываются через mmap.
+    # Сессии выгрузки лежат по суткам начала, load берёт сутки назад —
+    # от сессий длиннее суток здесь видна только часть
+    from analytics.export import load
+
+    statuses = load("statuses", lo, hi, [user_id], root)
+    sessions = load("sessions", lo, hi, [user_id], root)
+
+    online = statuses["online"].to_numpy(zero_copy_only=False)
+    starts = np.maximum(sessions["start"].to_numpy(), lo)
+    ends = np.minimum(sessions["end"].to_numpy(), hi)
+    starts, ends = merge(starts, ends)
+
+    return user_id, int(online.sum()), len(online), starts, ends
+
+# --------------------------------------------------
+# Driver
+# --------------------------------------------------
+def split_chunks(user_ids, lo, hi):
+    day = lo - lo % DAY
+    while day < hi:
+        for uid in user_ids:
+            yield uid, max(lo, day), min(hi, day + DAY)
+        day += DAY
+
+
+def run_chunks(db_file, chunks, workers, fn=analyze_chunk):
+    # в полёте не больше 2 × workers кусков — результаты сразу агрегируются
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        chunks = iter(chunks)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < workers * 2:
+                try:
+                    uid, a, b = next(chunks)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(fn, db_file, uid, a, b))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+
+
+class Report:
+
+    def __init__(self, user_ids):
+        self.online = dict.fromkeys(user_ids, 0)
+        self.total = dict.fromkeys(user_ids, 0)
+        self.parts = {uid: ([], []) for uid in user_ids}
+
+    def add(self, result):
+        uid, online, total, starts, ends = result
+        self.online[uid] += online
+        self.total[uid] += total
+        self.parts[uid][0].append(starts)
+        self.parts[uid][1].append(ends)
+
+    def intervals(self):
+        out = {}
+        for uid, (starts, ends) in self.parts.items():
+            if starts:
+                s, e = merge(np.concatenate(starts), np.concatenate(ends))
+                if len(s):
+                    out[uid] = (s, e)
+        return out
+
+
+def resolve_users(db_file, names, history=None, strict=True):
+    """
+    {id: username} для names (имена или id); пустой names — все пользователи.
+
+    Неизвестное имя: strict — выход с ошибкой (ручной запуск), иначе
+    предупреждение и пропуск (плановые отчёты).
+    """
+    if history:
+        from analytics.export import load_users
+        users = load_users(history)
+        rows = list(zip(users["id"].to_pylist(), users["username"].to_pylist()))
+    else:
+        from collector.db import connect_readonly
+        conn = connect_readonly(db_file)
+        rows = conn.execute("SELECT id, username FROM users ORDER BY id").fetchall()
+        conn.close()
+
+    user_map = dict(rows)
+    if not names:
+        return user_map
+
+    by_name = {name: uid for uid, name in rows}
+    selected = {}
+    for name in names:
+        # в REPORTS_CONFIG id бывают JSON-числами
+        name = str(name)
+        uid = int(name) if name.isdigit() else by_name.get(name)
+        if uid not in user_map:
+            if strict:
+                raise SystemExit(f"Unknown user: {name}")
+            print(f"⚠️ Unknown user: {name}, skipped")
+            continue
+        selected[uid] = user_map[uid]
+    return selected
+
+def bitmaps_for(db_file):
+    # карты годятся, только если полный бэкфилл шёл по этой же базе
+    store = BitmapStore()
+    info = store.info()
+    if info and os.path.realpath(info.get("db_file", "")) == os.path.realpath(db_file):
+        return store
+    return None
+
+# --------------------------------------------------
+# Output
+# --------------------------------------------------
+def write_csv(path, header, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def save_heatmaps(out_dir, user_map, intervals, lo, hi, step, tz):
+    from matplotlib.figure import Figure
+
+    users, packed, n_bits = rasterize(intervals, lo, hi, step)
+    if not users:
+        return
+    grid = np.unpackbits(packed, axis=1, count=n_bits)
+    labels = [user_map.get(u, f"User {u}") for u in users]
+
+    def fmt(ts, pattern):
+        return datetime.fromtimestamp(ts, tz).strftime(pattern)
+
+    # Heatmap timeline
+    fig = Figure(figsize=(15, len(users) * 0.5 + 2))
+    ax = fig.subplots()
+    im = ax.imshow(grid, aspect="auto", cmap="Greens", interpolation="nearest")
+    fig.colorbar(im, ax=ax, label="Online (1) / Offline (0)")
+    ax.set_yticks(np.arange(len(users)), labels=labels)
+    xticks = np.arange(0, n_bits, max(1, n_bits // 20))
+    ax.set_xticks(xticks, labels=[fmt(lo + i * step, "%m-%d %H:%M") for i in xticks], rotation=45)
+    ax.set_title(f"Online Status Heatmap (Timeline)\n{fmt(lo, '%Y-%m-%d %H:%M')} — {fmt(hi, '%Y-%m-%d %H:%M')}")
+    fig.tight_layout()
+    fig.savefig(os.path.join(out_dir, "online_statuses_heatmap_timeline.png"))
+
+    # Доля онлайна по часам суток (локальное время)
+    import pandas as pd
+    cell_ts = lo + np.arange(n_bits, dtype="int64") * step
+    hours = pd.to_datetime(cell_ts, unit="s", utc=True).tz_convert(tz).hour.to_numpy()
+    hour_share = np.zeros((len(users), 24))
+    for hour in range(24):
+        mask = hours == hour
+        if mask.any():
+            hour_share[:, hour] = grid[:, mask].mean(axis=1)
+
+    fig = Figure(figsize=(15, len(users) * 0.5 + 2))
+    ax = fig.subplots()
+    im = ax.imshow(hour_share, aspect="auto", cmap="Greens", interpolation="nearest", vmin=0, vmax=1)
+    fig.colorbar(im, ax=ax, label="Доля онлайна")
+    ax.set_yticks(np.arange(len(users)), labels=labels)
+    ax.set_xticks(np.arange(24))
+    ax.set_xlabel("Час")
+    ax.set_title("Онлайн по часам суток")
+    fig.tight_layout()
+    fig.savefig(os.path.join(out_dir, "online_hours_share.png"))
+
+
+def build_reports(report, user_map, lo, hi, step, out_dir, tz, bitmaps=None):
+    os.makedirs(out_dir, exist_ok=True)
+    intervals = report.intervals()
+
+    if bitmaps is not None:
+        # popcount по битовым картам — читаются только нужные сутки
+        uptime = {u: bitmaps.uptime(u, lo, hi) for u in user_map}
+    else:
+        uptime = {u: int((e - s).sum()) for u, (s, e) in intervals.items()}
+
+    write_csv(os.path.join(out_dir, "percentage.csv"),
+              ("user_id", "username", "online", "total", "percent"),
+              [(u, user_map[u], report.online[u], report.total[u],
+                round(report.online[u] / report.total[u] * 100, 2) if report.total[u] else 0)
+               for u in user_map])
+
+    write_csv(os.path.join(out_dir, "uptime.csv"),
+              ("user_id", "username", "online_seconds", "hours"),
+              [(u, user_map[u], seconds, round(seconds / 3600, 2))
+               for u, seconds in uptime.items() if seconds])
+
+    overlaps = co_online(intervals, k=2)
+    write_csv(os.path.join(out_dir, "overlaps.csv"),
+              ("user_a", "user_b", "together_seconds", "intervals"),
+              [(a, b, total, len(overlaps[(a, b)][0]))
+               for (a, b), total in overlap_totals(overlaps).items()])
+
+    users, packed, n_bits = rasterize(intervals, lo, hi, step)
+    corr = correlation_matrix(packed, n_bits)
+    write_csv(os.path.join(out_dir, "correlation.csv"),
+              ("user_id", *[str(u) for u in users]),
+              [(u, *[round(v, 4) for v in row]) for u, row in zip(users, corr)])
+
+    # кто заходит после кого: моменты входа, сетка 1 минута, лаг до 30 минут
+    _, onsets, onset_bits = rasterize(intervals, lo, hi, 60, onsets=True)
+    best_lag, best_corr = lead_lag(onsets, onset_bits, 30)
+    write_csv(os.path.join(out_dir, "lead_lag.csv"),
+              ("leader", "follower", "lag_minutes", "corr"),
+              [(a, b, int(best_lag[i, j]), round(float(best_corr[i, j]), 4))
+               for i, a in enumerate(users) for j, b in enumerate(users)
+               if i != j and np.isfinite(best_corr[i, j])])
+
+    save_heatmaps(out_dir, user_map, intervals, lo, hi, step, tz)
+
+
+def run(db_file, lo, hi, user_names=None, out_dir="analyze", step=60, workers=None, tz=None, history=None):
+    tz = tz or pytz.timezone(DISPLAY_TZ)
+    workers = workers or os.cpu_count() or 1
+    user_map = resolve_users(db_file, user_names, history)
+
+    if history:
+        source, fn = history, analyze_chunk_history
+    else:
+        from collector.db import connect_readonly
+        conn = connect_readonly(db_file)
+        try:
+            reach = longest_session(conn)
+        finally:
+            conn.close()
+        source, fn = db_file, partial(analyze_chunk, reach=reach)
+
+    t0 = time.perf_counter()
+    report = Report(user_map)
+    n = 0
+    for result in run_chunks(source, split_chunks(list(user_map), lo, hi), workers, fn):
+        report.add(result)
+        n += 1
+    t1 = time.perf_counter()
+
+    bitmaps = None if history else bitmaps_for(db_file)
+    build_reports(report, user_map, lo, hi, step, out_dir, tz, bitmaps)
+    t2 = time.perf_counter()
+
+    print(f"✅ {n} chunks in {t1 - t0:.1f}s, reports in {t2 - t1:.1f}s → {out_dir}/")
+
+
+def _local_ts(value, tz):
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = tz.localize(dt)
+    return int(dt.timestamp())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m analytics", description="Batch online analytics")
+    parser.add_argument("--db", default=os.getenv("DB_FILE", "shared/vitm.db"))
+    parser.add_argument("--from", dest="start", required=True, help="local time, e.g. '2025-12-22 06:30'")
+    parser.add_argument("--to", dest="end", required=True)
+    parser.add_argument("--user", dest="users", action="append", help="username or id, repeatable")
+    parser.add_argument("--out", default="analyze")
+    parser.add_argument("--step", type=int, default=60, help="grid step, seconds")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tz", default=DISPLAY_TZ)
+    parser.add_argument("--history", metavar="DIR", help="read the analytics.export files instead of the database")
+    args = parser.parse_args(argv)
+
+    tz = pytz.timezone(args.tz)
+    lo = _local_ts(args.start, tz)
+    hi = min(_local_ts(args.end, tz), int(time.time()))
+    run(args.db, lo, hi, args.users, args.out, args.step, args.workers, tz, args.history)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import numpy as np
+
+from analytics.intervals import merge
+
+# Совпадения онлайна по интервалам сессий.
+# Вход — {user_id: (starts, ends)} из analytics.intervals: у каждого
+# пользователя интервалы уже слиты и не пересекаются.
+
+_EMPTY = (np.empty(0, "int64"), np.empty(0, "int64"))
+
+
+def _events(intervals):
+    times, deltas = [], []
+    for s, e in intervals.values():
+        times += [s, e]
+        deltas += [np.ones(len(s), "int64"), -np.ones(len(e), "int64")]
+
+    if not times:
+        return np.empty(0, "int64"), np.empty(0, "int64")
+
+    times = np.concatenate(times)
+    deltas = np.concatenate(deltas)
+
+    # при равном времени сначала концы: [a, b) и [b, c) не пересекаются
+    order = np.lexsort((deltas, times))
+    return times[order], deltas[order]
+
+
+def intersect(a, b):
+    """
+    Пересечение двух отсортированных наборов непересекающихся интервалов.
+
+    Слияние двух упорядоченных списков событий, векторизованное через
+    searchsorted: для каждого интервала a ищем диапазон интервалов b,
+    которые с ним пересекаются.
+    """
+    sa, ea = a
+    sb, eb = b
+    if len(sa) == 0 or len(sb) == 0 or ea[-1] <= sb[0] or eb[-1] <= sa[0]:
+        return _EMPTY
+
+    lo = np.searchsorted(eb, sa, "right")  # первый b с концом после начала a
+    hi = np.searchsorted(sb, ea, "left")   # b, начавшиеся до конца a
+    count = np.maximum(hi - lo, 0)
+    n = int(count.sum())
+    if n == 0:
+        return _EMPTY
+
+    ia = np.repeat(np.arange(len(sa)), count)
+    offsets = np.cumsum(count) - count
+    ib = np.arange(n) - np.repeat(offsets, count) + np.repeat(lo, count)
+
+    starts = np.maximum(sa[ia], sb[ib])
+    ends = np.minimum(ea[ia], eb[ib])
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+
+def co_online(intervals, k=2):
+    """
+    Интервалы, когда одновременно онлайн каждая k-комбинация пользователей.
+
+    Возвращает {(uid, ...): (starts, ends)} только для комбинаций с
+    непустым пересечением. Комбинации наращиваются по уровням: тройка
+    проверяется, только если пересекается её пара, и т.д.
+    """
+    users = sorted(u for u, (s, _) in intervals.items() if len(s))
+    level = {(u,): intervals[u] for u in users}
+
+    for _ in range(k - 1):
+        nxt = {}
+        for combo, iv in level.items():
+            for v in users:
+                if v <= combo[-1]:
+                    continue
+                r = intersect(iv, intervals[v])
+                if len(r[0]):
+                    nxt[combo + (v,)] = r
+        level = nxt
+
+    return level
+
+
+def overlap_totals(overlaps):
+    # {combo: секунды совместного онлайна}, по убыванию
+    totals = {combo: int((e - s).sum()) for combo, (s, e) in overlaps.items()}
+    return dict(sorted(totals.items(), key=lambda kv: -kv[1]))
+
+
+def anyone_online(intervals, min_users=1):
+    """
+    Интервалы, когда онлайн не меньше min_users пользователей.
+
+    Sweep line: события начала (+1) и конца (-1) сортируются по времени,
+    накопленная сумма даёт число онлайн на каждом отрезке между событиями.
+    """
+    times, deltas = _events(intervals)
+    if len(times) == 0:
+        return _EMPTY
+
+    count = np.cumsum(deltas)
+    # отрезок [times[j], times[j+1]) действует после применения события j
+    last = np.ones(len(times), dtype=bool)
+    last[:-1] = times[1:] != times[:-1]
+    seg_t, seg_c = times[last], count[last]
+
+    on = seg_c[:-1] >= min_users
+    starts, ends = seg_t[:-1][on], seg_t[1:][on]
+    return merge(starts, ends)
@@ -0,0 +1,152 @@
+import numpy as np
+
+# Корреляция онлайна пользователей на фиксированной сетке.
+# Каждый пользователь — битовая строка (np.packbits), 1 бит на ячейку
+# шага step: месяц по минутам — 5.4 КБ на пользователя. Матрица
+# совместных единиц считается кусками через BLAS: кусок — float32-матрица
+# пользователи × chunk_bits ячеек, и его ширина подбирается под
+# CHUNK_BUDGET, поэтому в памяти никогда нет плотной матрицы
+# пользователи × время.
+
+# байт на распакованный кусок (при лаге их два)
+CHUNK_BUDGET = 64 << 20
+MIN_CHUNK_BITS = 1024
+
+
+def chunk_bits(n_users, budget=CHUNK_BUDGET):
+    """Ширина куска в ячейках: float32 на пользователя, кратно байту."""
+    bits = max(MIN_CHUNK_BITS, budget // (4 * max(n_users, 1)))
+    return bits - bits % 8
+
+
+def rasterize(intervals, lo, hi, step, onsets=False):
+    """
+    {user_id: (starts, ends)} -> (users, packed, n_bits).
+
+    Ячейка онлайн, если пересекается хотя бы с одним интервалом.
+    onsets=True отмечает только ячейку, где сессия началась —
+    удобно для «кто заходит после кого».
+    """
+    n_bits = max(0, -(-(hi - lo) // step))
+    users = sorted(intervals)
+    packed = np.zeros((len(users), -(-n_bits // 8)), dtype=np.uint8)
+
+    for row, uid in enumerate(users):
+        s, e = intervals[uid]
+        keep = (e > lo) & (s < hi)
+        s, e = s[keep], e[keep]
+        if len(s) == 0:
+            continue
+
+        first = (np.maximum(s, lo) - lo) // step
+        if onsets:
+            bits = np.zeros(n_bits, dtype=bool)
+            bits[first[s >= lo]] = True
+        else:
+            last = (np.minimum(e, hi) - 1 - lo) // step
+            # разностный массив: +1 в начале диапазона, -1 после конца
+            diff = np.zeros(n_bits + 1, dtype=np.int32)
+            np.add.at(diff, first, 1)
+            np.add.at(diff, last + 1, -1)
+            bits = np.cumsum(diff[:-1]) > 0
+        packed[row] = np.packbits(bits)
+
+    return users, packed, n_bits
+
+
+def popcount(packed):
+    return np.bitwise_count(packed).sum(axis=-1, dtype=np.int64)
+
+
+def cooccurrence(packed, n_bits, lag=0):
+    """
+    Матрица C[i, j] = число ячеек t, где онлайн i в t и j в t + lag.
+    """
+    n = len(packed)
+    out = np.zeros((n, n), dtype=np.float64)
+    length = n_bits - lag
+    width = chunk_bits(n)
+    for c0 in range(0, length, width):
+        c1 = min(c0 + width, length)
+        a = _bits(packed, c0, c1)
+        b = a if lag == 0 else _bits(packed, c0 + lag, c1 + lag)
+        out += a @ b.T
+    return out
+
+
+def _bits(packed, start, stop):
+    # распаковываем только байты, покрывающие [start, stop)
+    b0, b1 = start // 8, -(-stop // 8)
+    chunk = np.unpackbits(packed[:, b0:b1], axis=1)
+    return chunk[:, start - b0 * 8:stop - b0 * 8].astype(np.float32)
+
+
+def _pearson(n11, n1_a, n1_b, n):
+    # корреляция Пирсона для бинарных векторов через счётчики
+    num = n * n11 - np.outer(n1_a, n1_b)
+    den = np.sqrt(np.outer(n1_a * (n - n1_a), n1_b * (n - n1_b)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den > 0, num / den, np.nan)
+
+
+def _prefix_counts(packed, n_bits, lag):
+    # единицы в [0, n - lag) и [lag, n) для каждой строки
+    n = len(packed)
+    head = np.zeros(n, dtype=np.float64)
+    tail = np.zeros(n, dtype=np.float64)
+    length = n_bits - lag
+    width = chunk_bits(n)
+    for c0 in range(0, length, width):
+        c1 = min(c0 + width, length)
+        head += _bits(packed, c0, c1).sum(axis=1)
+        tail += _bits(packed, c0 + lag, c1 + lag).sum(axis=1)
+    return head, tail
+
+
+def correlation_matrix(packed, n_bits):
+    n1 = popcount(packed).astype(np.float64)
+    return _pearson(cooccurrence(packed, n_bits), n1, n1, n_bits)
+
+
+def lagged_correlation(packed, n_bits, lag):
+    """
+    R[i, j] = corr(x_i(t), x_j(t + lag)): насколько j онлайн через
+    lag ячеек после i.
+    """
+    if lag == 0:
+        return correlation_matrix(packed, n_bits)
+    head, tail = _prefix_counts(packed, n_bits, lag)
+    return _pearson(cooccurrence(packed, n_bits, lag), head, tail, n_bits - lag)
+
+
+def lead_lag(packed, n_bits, max_lag):
+    """
+    Для каждой пары — лаг 1..max_lag с максимальной корреляцией.
+
+    Возвращает (best_lag, best_corr): best_lag[i, j] = N означает, что
+    j чаще всего появляется через N ячеек после i.
+    """
+    n = len(packed)
+    best_corr = np.full((n, n), -np.inf)
+    best_lag = np.zeros((n, n), dtype=np.int32)
+    for lag in range(1, max_lag + 1):
+        r = np.nan_to_num(lagged_correlation(packed, n_bits, lag), nan=-np.inf)
+        better = r > best_corr
+        best_corr[better] = r[better]
+        best_lag[better] = lag
+    best_corr[np.isinf(best_corr)] = np.nan
+    return best_lag, best_corr
+
+
+def cross_correlation(packed, n_bits, i, j, max_lag):
+    """Корреляция строки i со сдвинутой строкой j для лагов -max_lag..max_lag."""
+    pair = packed[[i, j]]
+    lags = np.arange(-max_lag, max_lag + 1)
+    values = []
+    for lag in lags:
+        if lag >= 0:
+            r = lagged_correlation(pair, n_bits, int(lag))[0, 1]
+        else:
+            r = lagged_correlation(pair, n_bits, int(-lag))[1, 0]
+        values.append(r)
+    return lags, np.array(values)
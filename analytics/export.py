@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+from analytics.bitmaps import DAY, day_name
+
+# Колоночная копия истории для аналитики — тяжёлые проходы не трогают
+# живую базу и не держат её блокировки.
+#
+#   shared/history/
+#     _watermark.json                      последний выгруженный rowid
+#     users.arrow                          users целиком
+#     statuses/2025-12-22/part-<rowid>.arrow
+#     sessions/2025-12-22/part-<rowid>.arrow
+#
+# Сутки — UTC (как в analytics.bitmaps), время — int64 epoch.
+# Каждый запуск дописывает новые part-файлы от водяного знака rowid.
+# Arrow IPC file читается через memory map без копирования; parquet —
+# компактнее, но читается с декодированием.
+#
+# Строки, переписанные на месте (python -m collector.rebuild), по rowid
+# не видны — после rebuild нужен --full.
+
+HISTORY_DIR = os.getenv("HISTORY_DIR", "shared/history")
+WATERMARK = "_watermark.json"
+BATCH = 200_000
+
+TABLES = {
+    "statuses": (
+        "SELECT id, user_id, date, status = 'online' FROM online_statuses WHERE id > ? ORDER BY id LIMIT ?",
+        pa.schema([("id", pa.int64()), ("user_id", pa.int64()), ("ts", pa.int64()), ("online", pa.bool_())]),
+    ),
+    "sessions": (
+        "SELECT id, user_id, started_at, ended_at FROM online_sessions WHERE id > ? ORDER BY id LIMIT ?",
+        pa.schema([("id", pa.int64()), ("user_id", pa.int64()), ("start", pa.int64()), ("end", pa.int64())]),
+    ),
+}
+
+
+def _epoch(values):
+    return np.array([int(datetime.fromisoformat(v).timestamp()) for v in values], dtype=np.int64)
+
+
+def _to_table(name, rows):
+    ids, user_ids, a, b = zip(*rows)
+    schema = TABLES[name][1]
+    if name == "statuses":
+        cols = [ids, user_ids, _epoch(a), np.array(b, dtype=bool)]
+    else:
+        cols = [ids, user_ids, _epoch(a), _epoch(b)]
+    return pa.Table.from_arrays([pa.array(c, type=f.type) for c, f in zip(cols, schema)], schema=schema)
+
+
+def _write(table, path, fmt):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, tmp)
+    else:
+        with pa.OSFile(tmp, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    # читатель никогда не видит недописанный файл
+    os.replace(tmp, path)
+
+# --------------------------------------------------
+# Export
+# --------------------------------------------------
+def load_watermark(root):
+    path = os.path.join(root, WATERMARK)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_watermark(root, marks):
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, WATERMARK + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(marks, f)
+    os.replace(tmp, os.path.join(root, WATERMARK))
+
+
+def export_table(conn, root, name, after, fmt="arrow"):
+    sql, _ = TABLES[name]
+    time_col = "ts" if name == "statuses" else "start"
+    ext = "parquet" if fmt == "parquet" else "arrow"
+
+    total = 0
+    while True:
+        rows = conn.execute(sql, (after, BATCH)).fetchall()
+        if not rows:
+            break
+        table = _to_table(name, rows)
+        days = np.floor_divide(table[time_col].to_numpy(), DAY)
+        for day in np.unique(days):
+            part = table.filter(pa.array(days == day))
+            first = part["id"][0].as_py()
+            _write(part, os.path.join(root, name, day_name(int(day)), f"part-{first:012d}.{ext}"), fmt)
+        after = rows[-1][0]
+        total += len(rows)
+    return after, total
+
+
+def export(db_file, root=HISTORY_DIR, fmt="arrow", full=False):
+    from collector.db import connect_readonly
+
+    if full and os.path.exists(root):
+        shutil.rmtree(root)
+    marks = load_watermark(root)
+
+    conn = connect_readonly(db_file)
+    try:
+        users = conn.execute("SELECT id, username, active FROM users ORDER BY id").fetchall()
+        ids, names, active = zip(*users) if users else ((), (), ())
+        _write(pa.table({
+            "id": pa.array(ids, type=pa.int64()),
+            "username": pa.array(names, type=pa.string()),
+            "active": pa.array(active, type=pa.int64()),
+        }), os.path.join(root, "users.arrow"), "arrow")
+
+        counts = {}
+        for name in TABLES:
+            marks[name], counts[name] = export_table(conn, root, name, marks.get(name, 0), fmt)
+    finally:
+        conn.close()
+
+    marks["exported_at"] = datetime.now(timezone.utc).isoformat()
+    save_watermark(root, marks)
+    return counts
+
+# --------------------------------------------------
+# Load
+# --------------------------------------------------
+def read_file(path):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, memory_map=True)
+    # буферы таблицы указывают прямо в отображённый файл
+    return ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+def load_users(root=HISTORY_DIR):
+    return read_file(os.path.join(root, "users.arrow"))
+
+
+def load(name, lo=None, hi=None, user_ids=None, root=HISTORY_DIR):
+    """
+    Таблица statuses или sessions за [lo, hi) (epoch), читается через mmap.
+
+    Открываются только папки суток, попадающих в окно; sessions берутся
+    с запасом в сутки назад, чтобы не потерять сессии через полночь.
+    """
+    base = os.path.join(root, name)
+    schema = TABLES[name][1]
+    if not os.path.isdir(base):
+        return schema.empty_table()
+
+    first = None if lo is None else day_name(int(lo) // DAY - (1 if name == "sessions" else 0))
+    last = None if hi is None else day_name((int(hi) - 1) // DAY)
+
+    tables = []
+    for day in sorted(os.listdir(base)):
+        if (first and day < first) or (last and day > last):
+            continue
+        folder = os.path.join(base, day)
+        for file in sorted(os.listdir(folder)):
+            if not file.endswith(".tmp"):
+                tables.append(read_file(os.path.join(folder, file)))
+    if not tables:
+        return schema.empty_table()
+
+    table = pa.concat_tables(tables)
+
+    conds = []
+    if name == "statuses":
+        if lo is not None:
+            conds.append(pc.greater_equal(table["ts"], lo))
+        if hi is not None:
+            conds.append(pc.less(table["ts"], hi))
+    else:
+        if lo is not None:
+            conds.append(pc.greater(table["end"], lo))
+        if hi is not None:
+            conds.append(pc.less(table["start"], hi))
+    if user_ids:
+        conds.append(pc.is_in(table["user_id"], pa.array(list(user_ids), type=pa.int64())))
+
+    if not conds:
+        return table
+    mask = conds[0]
+    for cond in conds[1:]:
+        mask = pc.and_(mask, cond)
+    return table.filter(mask)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export statuses and sessions to day-partitioned Arrow/Parquet")
+    parser.add_argument("--db", default=os.getenv("DB_FILE", "shared/vitm.db"))
+    parser.add_argument("--dir", default=HISTORY_DIR)
+    parser.add_argument("--format", choices=("arrow", "parquet"), default="arrow")
+    parser.add_argument("--full", action="store_true", help="drop the export and start from rowid 0")
+    args = parser.parse_args()
+
+    counts = export(args.db, args.dir, args.format, args.full)
+    print(f"✅ Exported {counts.get('statuses', 0)} statuses, {counts.get('sessions', 0)} sessions → {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import numpy as np
+
+# Интервалы онлайна храним как пары int64-массивов (starts, ends) в секундах
+# UTC epoch, полуоткрытые [start, end). Все функции analytics работают с ними.
+
+
+def to_epoch(series):
+    # tz-aware datetime Series -> int64 секунды, без поэлементного Python
+    import pandas as pd
+    delta = series.dt.tz_convert("UTC") - pd.Timestamp(0, tz="UTC")
+    return (delta // pd.Timedelta(seconds=1)).to_numpy("int64")
+
+
+def merge(starts, ends):
+    starts = np.asarray(starts, dtype="int64")
+    ends = np.asarray(ends, dtype="int64")
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        return starts, ends
+
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+
+    # новая группа начинается, если старт правее всех предыдущих концов
+    reach = np.maximum.accumulate(ends)
+    new = np.ones(len(starts), dtype=bool)
+    new[1:] = starts[1:] > reach[:-1]
+
+    group = np.cumsum(new) - 1
+    merged_ends = np.zeros(group[-1] + 1, dtype="int64")
+    np.maximum.at(merged_ends, group, ends)
+    return starts[new], merged_ends
+
+
+def clip(starts, ends, lo=None, hi=None):
+    if lo is not None:
+        starts = np.maximum(starts, lo)
+    if hi is not None:
+        ends = np.minimum(ends, hi)
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+
+def group_by_user(user_ids, starts, ends, lo=None, hi=None):
+    user_ids = np.asarray(user_ids)
+    starts = np.asarray(starts, dtype="int64")
+    ends = np.asarray(ends, dtype="int64")
+
+    result = {}
+    for uid in np.unique(user_ids):
+        mask = user_ids == uid
+        s, e = clip(starts[mask], ends[mask], lo, hi)
+        s, e = merge(s, e)
+        if len(s):
+            result[uid.item()] = (s, e)
+    return result
+
+
+def total(starts, ends):
+    return int((ends - starts).sum())
+
+
+def sessions_frame_to_intervals(df, lo=None, hi=None):
+    # DataFrame online_sessions (started_at/ended_at — datetime) -> {user_id: (starts, ends)}
+    if df.empty:
+        return {}
+    return group_by_user(
+        df["user_id"].to_numpy(),
+        to_epoch(df["started_at"]),
+        to_epoch(df["ended_at"]),
+        lo, hi
+    )
+
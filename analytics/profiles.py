@@ -0,0 +1,211 @@
+import argparse
+import os
+from datetime import datetime
+
+import numpy as np
+import pytz
+
+# Таблица activity_profiles создаётся в collector.db.init_db.
+#
+# Профили активности по часам недели: для каждого пользователя массив
+# 7 × 288 (пн..вс × 5-минутные ячейки, локальное время) с секундами
+# онлайна. Обновляются инкрементально при закрытии сессии, поэтому
+# «когда он обычно онлайн» — чтение одной строки, без скана истории.
+#
+# Варианты:
+#   total   — накопленные секунды за всё время
+#   decay   — экспоненциальное затухание, полураспад DECAY_HALF_LIFE
+#   rolling — сумма за последние ROLLING_WEEKS недель (кольцо по неделям)
+
+SLOT = 300
+SLOTS_PER_DAY = 86400 // SLOT
+BUCKETS = 7 * SLOTS_PER_DAY
+WEEK = 7 * 86400
+
+DECAY_HALF_LIFE = 14 * 86400
+ROLLING_WEEKS = 4
+VARIANTS = ("total", "decay", "rolling")
+WEEKDAYS = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")
+
+PROFILE_TZ = pytz.timezone(os.getenv("PROFILE_TZ", os.getenv("DISPLAY_TZ", "Europe/Kiev")))
+
+
+def buckets(start, end, tz=PROFILE_TZ):
+    """
+    Раскладывает [start, end) (epoch) по ячейкам недели.
+
+    Возвращает (bucket_idx, seconds). Смещение зоны кратно 5 минутам,
+    поэтому границы ячеек в UTC и в локальном времени совпадают, а
+    переход на летнее время учитывается при переводе каждой ячейки.
+    """
+    import pandas as pd
+
+    start, end = int(start), int(end)
+    if end <= start:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    cells = np.arange(start // SLOT, (end - 1) // SLOT + 1, dtype=np.int64)
+    cell_start = cells * SLOT
+    seconds = np.minimum(end, cell_start + SLOT) - np.maximum(start, cell_start)
+
+    local = pd.to_datetime(cell_start, unit="s", utc=True).tz_convert(tz)
+    idx = (
+        local.weekday.to_numpy() * SLOTS_PER_DAY
+        + (local.hour.to_numpy() * 60 + local.minute.to_numpy()) // (SLOT // 60)
+    )
+    return idx.astype(np.int64), seconds.astype(np.float64)
+
+# --------------------------------------------------
+# Storage
+# --------------------------------------------------
+def _shape(variant):
+    return (ROLLING_WEEKS + 1, BUCKETS) if variant == "rolling" else (BUCKETS,)
+
+
+def _load_row(conn, user_id, variant):
+    row = conn.execute(
+        "SELECT first_ts, updated_at, data FROM activity_profiles WHERE user_id = ? AND variant = ?",
+        (user_id, variant)
+    ).fetchone()
+    if row is None:
+        return None, None, np.zeros(_shape(variant))
+    first_ts, updated_at, data = row
+    return first_ts, updated_at, np.frombuffer(data, dtype=np.float64).reshape(_shape(variant)).copy()
+
+
+def _save_row(conn, user_id, variant, first_ts, updated_at, data):
+    conn.execute(
+        """
+        INSERT INTO activity_profiles(user_id, variant, first_ts, updated_at, data)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, variant) DO UPDATE SET
+            updated_at = excluded.updated_at,
+            data = excluded.data
+        """,
+        (user_id, variant, first_ts, updated_at, data.astype(np.float64).tobytes())
+    )
+
+
+def _apply(variant, data, updated_at, start, end, idx, seconds):
+    if variant == "total":
+        np.add.at(data, idx, seconds)
+
+    elif variant == "decay":
+        # сначала «состариваем» накопленное до конца новой сессии
+        if updated_at is not None and end > updated_at:
+            data *= 0.5 ** ((end - updated_at) / DECAY_HALF_LIFE)
+        np.add.at(data, idx, seconds)
+
+    elif variant == "rolling":
+        # строка 0 — номера недель в слотах, строки 1.. — данные по неделям
+        weeks = data[0, :ROLLING_WEEKS]
+        week = (start // WEEK)
+        slot = int(week % ROLLING_WEEKS)
+        if weeks[slot] != week:
+            data[slot + 1] = 0
+            weeks[slot] = week
+        np.add.at(data[slot + 1], idx, seconds)
+
+    return data
+
+
+def record_session(conn, user_id, start, end, commit=True):
+    start, end = int(start), int(end)
+    idx, seconds = buckets(start, end)
+    if len(idx) == 0:
+        return
+
+    for variant in VARIANTS:
+        first_ts, updated_at, data = _load_row(conn, user_id, variant)
+        data = _apply(variant, data, updated_at, start, end, idx, seconds)
+        _save_row(
+            conn, user_id, variant,
+            start if first_ts is None else min(first_ts, start),
+            end if updated_at is None else max(updated_at, end),
+            data
+        )
+
+    if commit:
+        conn.commit()
+
+# --------------------------------------------------
+# Lookup
+# --------------------------------------------------
+def load_profile(conn, user_id, variant="total", now=None):
+    """
+    Профиль 7 × 288: секунды онлайна и доля онлайна в каждой ячейке.
+    """
+    first_ts, updated_at, data = _load_row(conn, user_id, variant)
+    if first_ts is None:
+        return None
+
+    now = int(now or datetime.now().timestamp())
+
+    if variant == "total":
+        weeks = max(1.0, (updated_at - first_ts) / WEEK)
+        seconds = data
+
+    elif variant == "decay":
+        seconds = data * 0.5 ** (max(0, now - updated_at) / DECAY_HALF_LIFE)
+        # суммарный вес всех прошлых недель при затухании
+        weeks = 1 / (1 - 0.5 ** (WEEK / DECAY_HALF_LIFE))
+
+    else:
+        current = now // WEEK
+        weeks_ids = data[0, :ROLLING_WEEKS]
+        live = weeks_ids > current - ROLLING_WEEKS
+        seconds = data[1:][live].sum(axis=0)
+        weeks = max(1, int(live.sum()))
+
+    seconds = seconds.reshape(7, SLOTS_PER_DAY)
+    share = np.clip(seconds / (SLOT * weeks), 0, 1)
+    return seconds, share
+
+
+def to_hours(matrix):
+    # 7 × 288 -> 7 × 24 (среднее по 12 пятиминуткам)
+    return matrix.reshape(7, 24, SLOTS_PER_DAY // 24).mean(axis=2)
+
+
+def usual_hours(share, threshold=0.3):
+    """[(день недели 0..6, час 0..23, доля)] — часы, где доля онлайна выше порога."""
+    hourly = to_hours(share)
+    days, hours = np.nonzero(hourly >= threshold)
+    return [(int(d), int(h), float(hourly[d, h])) for d, h in zip(days, hours)]
+
+# --------------------------------------------------
+# Rebuild
+# --------------------------------------------------
+def rebuild(db_file):
+    from collector.db import connect, init_db
+
+    conn = connect(db_file)
+    init_db(conn)
+    conn.execute("DELETE FROM activity_profiles")
+
+    rows = conn.execute(
+        "SELECT user_id, started_at, ended_at FROM online_sessions ORDER BY ended_at"
+    ).fetchall()
+    for user_id, s, e in rows:
+        record_session(
+            conn, user_id,
+            datetime.fromisoformat(s).timestamp(),
+            datetime.fromisoformat(e).timestamp(),
+            commit=False
+        )
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild hour-of-week activity profiles from online_sessions")
+    parser.add_argument("--db", default=os.getenv("DB_FILE", "shared/vitm.db"))
+    args = parser.parse_args()
+
+    n = rebuild(args.db)
+    print(f"✅ Profiles rebuilt from {n} sessions")
+
+
+if __name__ == "__main__":
+    main()
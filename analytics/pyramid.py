@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from analytics.bitmaps import BITMAP_DIR, DAY, BitmapStore, day_name, split_days
+
+# Пирамида долей онлайна поверх битовых карт (analytics.bitmaps).
+#
+# Уровень 1 с — сами битовые карты. Над ними 10 с, 1 мин, 10 мин и 1 ч:
+# в каждой ячейке — процент секунд онлайна (int8, 0..100). Все уровни
+# суток пользователя — один файл рядом с его битовой картой:
+#
+#   shared/bitmaps/<user_id>/<YYYY-MM-DD>.pyr
+#       8640 ячеек по 10 с | 1440 по 1 мин | 144 по 10 мин | 24 по 1 ч
+#
+# Пирамида ведётся вместе с битовыми картами: после записи сессии
+# пересчитываются только часы, которые она задела (add_intervals), —
+# каждый уровень прямо из бит, без накопления ошибок округления.
+#
+# Для окна и шага отображения берётся самый грубый уровень, ячейка
+# которого не больше шага (level_for): месяц читается по 24 байта
+# на сутки, минута — из бит.
+
+LEVELS = (1, 10, 60, 600, 3600)
+# смещения уровней в файле суток; уровень 1 в файле не хранится
+OFFSETS = {10: 0, 60: 8640, 600: 10080, 3600: 10224}
+PYR_BYTES = 10248
+
+READY_MARKER = "_pyramid.json"
+
+
+def level_for(step):
+    """Самый грубый уровень, ячейка которого не больше step."""
+    return max(level for level in LEVELS if level <= max(int(step), 1))
+
+
+def grid(lo, hi, step):
+    """(level, lo, step, n): окно выровнено по ячейкам уровня, шаг кратен ячейке."""
+    level = level_for(step)
+    step = -(-int(step) // level) * level
+    lo = int(lo) - int(lo) % level
+    n = max(1, -(-(int(hi) - lo) // step))
+    return level, lo, step, n
+
+
+class PyramidStore:
+
+    def __init__(self, root=BITMAP_DIR, bitmaps=None):
+        self.root = root
+        self.bitmaps = bitmaps or BitmapStore(root)
+
+    def path(self, user_id, day):
+        return os.path.join(self.root, str(user_id), f"{day_name(day)}.pyr")
+
+    def ready(self):
+        return os.path.exists(os.path.join(self.root, READY_MARKER)) and self.bitmaps.ready()
+
+    def mark_ready(self, info):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, READY_MARKER), "w") as f:
+            json.dump(info, f)
+
+    def day(self, user_id, day):
+        path = self.path(user_id, day)
+        if not os.path.exists(path):
+            return None
+        return np.memmap(path, dtype=np.int8, mode="r", shape=(PYR_BYTES,))
+
+    def _day_rw(self, user_id, day):
+        path = self.path(user_id, day)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.truncate(PYR_BYTES)
+        return np.memmap(path, dtype=np.int8, mode="r+", shape=(PYR_BYTES,))
+
+    # --------------------------------------------------
+    # Запись
+    # --------------------------------------------------
+    def _rebuild(self, user_id, day, hours):
+        # пересчитать часы hours суток из битовой карты
+        bits = self.bitmaps.day(user_id, day)
+        if bits is None:
+            return
+        buf = self._day_rw(user_id, day)
+        for a, b in hours:
+            # час — 450 байт битовой карты, границы совпадают с байтами
+            seconds = np.unpackbits(np.asarray(bits[a // 8:b // 8])).astype(np.int32)
+            for level, offset in OFFSETS.items():
+                counts = seconds.reshape(-1, level).sum(axis=1)
+                buf[offset + a // level:offset + b // level] = (counts * 100 + level // 2) // level
+        buf.flush()
+
+    def add_intervals(self, user_id, starts, ends):
+        """Обновить часы, задетые интервалами; битовая карта уже записана."""
+        by_day = {}
+        for s, e in zip(starts, ends):
+            for day, a, b in split_days(s, e):
+                by_day.setdefault(day, set()).update(range(a // 3600, -(-b // 3600)))
+        for day, hours in by_day.items():
+            self._rebuild(user_id, day, [(h * 3600, (h + 1) * 3600) for h in sorted(hours)])
+
+    def add_interval(self, user_id, start, end):
+        self.add_intervals(user_id, [start], [end])
+
+    # --------------------------------------------------
+    # Запросы
+    # --------------------------------------------------
+    def fractions(self, user_id, lo, step, n):
+        """Доля онлайна (float32, 0..1) в n интервалах step секунд с lo; lo и step — из grid."""
+        level = level_for(step)
+        hi = lo + n * step
+        if level == 1:
+            bits = self.bitmaps.bits(user_id, lo, hi)
+            return bits.reshape(n, step).mean(axis=1, dtype=np.float32)
+
+        offset = OFFSETS[level]
+        parts = []
+        for day, a, b in split_days(lo, hi):
+            buf = self.day(user_id, day)
+            if buf is None:
+                parts.append(np.zeros((b - a) // level, dtype=np.int8))
+            else:
+                parts.append(buf[offset + a // level:offset + b // level])
+        cells = np.concatenate(parts).astype(np.float32) if parts else np.zeros(0, dtype=np.float32)
+        return cells.reshape(n, step // level).mean(axis=1) / 100
+
+# --------------------------------------------------
+# Backfill
+# --------------------------------------------------
+def backfill(store):
+    """Построить пирамиду по всем готовым битовым картам."""
+    if not store.bitmaps.ready():
+        raise SystemExit("Bitmaps are not ready, run python -m analytics.bitmaps first")
+
+    days = 0
+    for name in sorted(os.listdir(store.root)):
+        if not name.isdigit():
+            continue
+        user_id = int(name)
+        for file in sorted(os.listdir(os.path.join(store.root, name))):
+            if not file.endswith(".bin"):
+                continue
+            date = datetime.strptime(file[:-4], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            store._rebuild(user_id, int(date.timestamp()) // DAY, [(h * 3600, (h + 1) * 3600) for h in range(24)])
+            days += 1
+
+    store.mark_ready({"days": days, "at": datetime.now(timezone.utc).isoformat()})
+    return days
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the online-fraction pyramid from bitmaps")
+    parser.add_argument("--dir", default=BITMAP_DIR)
+    args = parser.parse_args()
+
+    days = backfill(PyramidStore(args.dir))
+    print(f"✅ Pyramid built for {days} user-days → {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
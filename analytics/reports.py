@@ -0,0 +1,292 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timedelta, timezone
+from functools import partial
+
+import pytz
+
+# Плановые отчёты: сутки и недели по группам пользователей.
+#
+#   python -m analytics.reports            — фоновый цикл, раз в REPORT_INTERVAL
+#   python -m analytics.reports --once     — один проход и выход
+#
+# Отчёт — те же файлы, что у python -m analytics (csv + два png), считанные
+# тем же пулом процессов по кускам (пользователь, сутки). Если выгрузка
+# analytics.export покрывает период, читается она, а не живая база.
+#
+#   shared/reports/<group>/<daily|weekly>/<2026-10-18|2026-W42>/v3/
+#       manifest.json   входы, границы, время сборки
+#       percentage.csv uptime.csv ... online_statuses_heatmap_timeline.png online_hours_share.png
+#
+# Перед сборкой считается отпечаток входов (число и max rowid строк за
+# период, суммарная длительность сессий). Совпал с последней версией —
+# период пропускается; иначе собирается новая версия, старые сверх
+# KEEP_VERSIONS удаляются. UI только читает готовые файлы.
+#
+# Группы — в REPORTS_CONFIG (JSON), по умолчанию одна группа "all":
+#   {"groups": {"team": ["@a", "@b"], "all": null}, "daily": 7, "weekly": 4, "step": 60}
+
+REPORTS_DIR = os.getenv("REPORTS_DIR", "shared/reports")
+REPORTS_CONFIG = os.getenv("REPORTS_CONFIG", "shared/reports.json")
+REPORT_INTERVAL = int(os.getenv("REPORT_INTERVAL", "900"))
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_TZ = pytz.timezone(os.getenv("REPORT_TZ", os.getenv("DISPLAY_TZ", "Europe/Kiev")))
+
+DAY = 86400
+KINDS = ("daily", "weekly")
+KEEP_VERSIONS = 3
+MANIFEST = "manifest.json"
+# меняется вместе с набором и форматом файлов отчёта — старые версии пересобираются
+LAYOUT = 2
+
+DEFAULTS = {"groups": {"all": None}, "daily": 7, "weekly": 4, "step": 60}
+
+
+def load_config(path=REPORTS_CONFIG):
+    config = dict(DEFAULTS)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            config.update(json.load(f))
+    return config
+
+# --------------------------------------------------
+# Periods
+# --------------------------------------------------
+def _local_midnight(day, tz):
+    return tz.localize(datetime.combine(day, datetime.min.time()))
+
+
+def periods(kind, count, tz, now=None):
+    """
+    Последние count периодов, новые первыми: (label, lo, hi, complete).
+
+    Границы — локальная полночь зоны tz, поэтому сутки перевода часов
+    длятся 23 или 25 часов. Текущий период обрезан по now.
+    """
+    now = time.time() if now is None else now
+    today = datetime.fromtimestamp(now, tz).date()
+    if kind == "weekly":
+        first = today - timedelta(days=today.weekday())
+        span = timedelta(days=7)
+    else:
+        first = today
+        span = timedelta(days=1)
+
+    out = []
+    for i in range(count):
+        start = first - i * span
+        lo = int(_local_midnight(start, tz).timestamp())
+        hi = int(_local_midnight(start + span, tz).timestamp())
+        if kind == "weekly":
+            year, week, _ = start.isocalendar()
+            label = f"{year}-W{week:02d}"
+        else:
+            label = start.isoformat()
+        out.append((label, lo, min(hi, int(now)), hi <= now))
+    return out
+
+# --------------------------------------------------
+# Inputs
+# --------------------------------------------------
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def fingerprint(conn, user_ids, lo, hi, step, reach=DAY):
+    """Дешёвый отпечаток входов периода — по индексам, без чтения строк."""
+    marks = ",".join("?" * len(user_ids))
+    statuses = conn.execute(
+        f"""
+        SELECT COUNT(*), MAX(id) FROM online_statuses
+        WHERE user_id IN ({marks}) AND date >= ? AND date < ?
+        """,
+        (*user_ids, _iso(lo), _iso(hi))
+    ).fetchone()
+    # started_at снизу ограничен на reach раньше, как в analytics.cli.analyze_chunk
+    sessions = conn.execute(
+        f"""
+        SELECT COUNT(*), MAX(id), TOTAL(strftime('%s', ended_at) - strftime('%s', started_at))
+        FROM online_sessions
+        WHERE user_id IN ({marks}) AND started_at >= ? AND started_at < ? AND ended_at > ?
+        """,
+        (*user_ids, _iso(lo - reach), _iso(hi), _iso(lo))
+    ).fetchone()
+    return {
+        "layout": LAYOUT,
+        "users": sorted(user_ids),
+        "step": step,
+        "statuses": list(statuses),
+        "sessions": list(sessions),
+    }
+
+
+def _history_covers(history, inputs):
+    # выгрузка годится, если в ней уже есть все строки периода
+    from analytics.export import load_watermark
+
+    if not history or not os.path.isdir(history):
+        return False
+    marks = load_watermark(history)
+    return (
+        marks.get("statuses", 0) >= (inputs["statuses"][1] or 0)
+        and marks.get("sessions", 0) >= (inputs["sessions"][1] or 0)
+    )
+
+# --------------------------------------------------
+# Artifacts
+# --------------------------------------------------
+def period_dir(root, group, kind, label):
+    return os.path.join(root, group, kind, label)
+
+
+def versions(path):
+    if not os.path.isdir(path):
+        return []
+    return sorted(int(name[1:]) for name in os.listdir(path) if name.startswith("v") and name[1:].isdigit())
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def latest(root, group, kind, label):
+    """(папка, manifest) последней версии или None."""
+    base = period_dir(root, group, kind, label)
+    for v in reversed(versions(base)):
+        path = os.path.join(base, f"v{v}")
+        if os.path.exists(os.path.join(path, MANIFEST)):
+            return path, read_manifest(path)
+    return None
+
+
+def catalog(root=REPORTS_DIR):
+    """{group: {kind: [label, ...]}}, периоды — новые первыми."""
+    out = {}
+    if not os.path.isdir(root):
+        return out
+    for group in sorted(os.listdir(root)):
+        for kind in KINDS:
+            base = os.path.join(root, group, kind)
+            if os.path.isdir(base):
+                labels = sorted((l for l in os.listdir(base) if versions(os.path.join(base, l))), reverse=True)
+                if labels:
+                    out.setdefault(group, {})[kind] = labels
+    return out
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    return (rows[0], rows[1:]) if rows else ([], [])
+
+
+def _prune(base):
+    for v in versions(base)[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(base, f"v{v}"), ignore_errors=True)
+
+# --------------------------------------------------
+# Build
+# --------------------------------------------------
+def build(db_file, user_map, lo, hi, step, out_dir, tz, history=None, workers=REPORT_WORKERS, reach=DAY):
+    # расчёт — только здесь: UI импортирует модуль ради catalog/latest
+    from analytics.cli import Report, analyze_chunk, analyze_chunk_history, build_reports, run_chunks, split_chunks
+
+    source, fn = (history, analyze_chunk_history) if history else (db_file, partial(analyze_chunk, reach=reach))
+    report = Report(user_map)
+    for result in run_chunks(source, split_chunks(list(user_map), lo, hi), workers, fn):
+        report.add(result)
+    build_reports(report, user_map, lo, hi, step, out_dir, tz)
+
+
+def refresh(db_file, root=REPORTS_DIR, config=None, tz=REPORT_TZ, history=None, now=None, workers=REPORT_WORKERS):
+    """Один проход: пересобрать периоды, у которых изменились входы. Возвращает (собрано, пропущено)."""
+    from analytics.cli import longest_session, resolve_users
+    from collector.db import connect_readonly
+
+    config = config or load_config()
+    history = history if history is not None else os.getenv("HISTORY_DIR", "shared/history")
+    step = int(config["step"])
+    built = skipped = 0
+
+    conn = connect_readonly(db_file)
+    try:
+        reach = longest_session(conn)
+        for group, names in config["groups"].items():
+            user_map = resolve_users(db_file, names, strict=False)
+            if not user_map:
+                continue
+            for kind in KINDS:
+                for label, lo, hi, complete in periods(kind, int(config.get(kind, 0)), tz, now):
+                    inputs = fingerprint(conn, list(user_map), lo, hi, step, reach)
+                    base = period_dir(root, group, kind, label)
+                    prev = latest(root, group, kind, label)
+                    if prev is not None and prev[1]["inputs"] == inputs:
+                        skipped += 1
+                        continue
+
+                    version = (versions(base) or [0])[-1] + 1
+                    tmp = os.path.join(base, f".v{version}.tmp")
+                    shutil.rmtree(tmp, ignore_errors=True)
+
+                    t0 = time.perf_counter()
+                    use_history = _history_covers(history, inputs)
+                    build(db_file, user_map, lo, hi, step, tmp, tz, history if use_history else None, workers, reach)
+                    with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+                        json.dump({
+                            "group": group,
+                            "kind": kind,
+                            "label": label,
+                            "version": version,
+                            "lo": lo,
+                            "hi": hi,
+                            "complete": complete,
+                            "tz": tz.zone,
+                            "users": {str(uid): name for uid, name in user_map.items()},
+                            "source": "history" if use_history else "db",
+                            "inputs": inputs,
+                            "built_at": datetime.now(timezone.utc).isoformat(),
+                            "seconds": round(time.perf_counter() - t0, 3),
+                        }, f, ensure_ascii=False, indent=1)
+                    # читатель видит только готовую версию
+                    os.replace(tmp, os.path.join(base, f"v{version}"))
+                    _prune(base)
+                    built += 1
+                    print(f"📄 {group}/{kind}/{label} v{version} ({time.perf_counter() - t0:.1f}s)")
+    finally:
+        conn.close()
+    return built, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scheduled daily/weekly reports")
+    parser.add_argument("--db", default=os.getenv("DB_FILE", "shared/vitm.db"))
+    parser.add_argument("--dir", default=REPORTS_DIR)
+    parser.add_argument("--config", default=REPORTS_CONFIG)
+    parser.add_argument("--interval", type=int, default=REPORT_INTERVAL, help="seconds between passes")
+    parser.add_argument("--once", action="store_true", help="run one pass and exit")
+    args = parser.parse_args()
+
+    # фоновая работа не должна отнимать CPU у коллектора и UI
+    os.nice(10)
+    while True:
+        try:
+            built, skipped = refresh(args.db, args.dir, load_config(args.config))
+            print(f"✅ Reports: {built} built, {skipped} unchanged → {args.dir}")
+        except Exception as e:
+            # один неудачный проход не должен ронять планировщик — супервизор
+            # перезапускал бы его по кругу
+            if args.once:
+                raise
+            print(f"⚠️ Reports pass failed: {e!r}")
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from collector.db import connect, init_db
+
+# Синтетическая база в схеме collector.db — для бенчмарков, без Telegram.
+#
+# Для каждого пользователя:
+#   * входы — пуассоновский поток с суточным профилем (ночью редко,
+#     вечером чаще), у каждого пользователя свой сдвиг и активность;
+#   * длительность сессии — логнормальная: медиана ~2 минуты, длинный
+#     хвост до часа;
+#   * online_statuses — как пишет коллектор: online-строка на каждый
+#     опрос (шаг CHECK_INTERVAL) внутри сессии и одна offline-строка
+#     с was_online на её конце;
+#   * online_sessions — сама сессия.
+
+CHECK_INTERVAL = 5
+SESSION_MEDIAN = 120
+SESSION_SIGMA = 1.1
+SESSION_MAX = 3600
+
+# относительная частота входов по часам суток (локальное время ~UTC+2)
+HOURLY = np.array([
+    0.2, 0.1, 0.05, 0.05, 0.05, 0.1, 0.4, 0.9, 1.2, 1.1, 1.0, 1.0,
+    1.1, 1.0, 0.9, 0.9, 1.0, 1.1, 1.3, 1.5, 1.6, 1.4, 1.0, 0.5,
+])
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(int(ts), timezone.utc).isoformat()
+
+
+def user_sessions(rng, lo, hi, sessions_per_day):
+    """Непересекающиеся (starts, ends) одного пользователя в [lo, hi)."""
+    shift = int(rng.integers(-3, 4))
+    rate = np.roll(HOURLY, shift) / HOURLY.mean() * sessions_per_day / 86400
+
+    # прореживание: кандидаты с максимальной частотой, принимаем по профилю
+    n = rng.poisson(rate.max() * (hi - lo))
+    starts = np.sort(rng.integers(lo, hi, n))
+    hours = (starts // 3600 + 2) % 24
+    starts = starts[rng.random(n) < rate[hours] / rate.max()]
+
+    lengths = np.minimum(rng.lognormal(np.log(SESSION_MEDIAN), SESSION_SIGMA, len(starts)), SESSION_MAX)
+    ends = starts + np.maximum(CHECK_INTERVAL, lengths.astype(np.int64))
+
+    # следующая сессия не раньше, чем через опрос после конца предыдущей
+    keep = np.ones(len(starts), dtype=bool)
+    last_end = lo - CHECK_INTERVAL
+    for i in range(len(starts)):
+        if starts[i] < last_end + CHECK_INTERVAL:
+            keep[i] = False
+        else:
+            last_end = ends[i]
+    starts, ends = starts[keep], np.minimum(ends[keep], hi)
+    return starts, ends
+
+
+def status_rows(user_id, starts, ends):
+    # online на каждом опросе внутри сессии + offline в момент ухода
+    lengths = (ends - starts) // CHECK_INTERVAL + 1
+    idx = np.repeat(np.arange(len(starts)), lengths)
+    offsets = np.arange(len(idx)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    online_ts = starts[idx] + offsets * CHECK_INTERVAL
+    online_ts = online_ts[online_ts < ends[idx]]
+
+    rows = [(user_id, _iso(ts), "online") for ts in online_ts]
+    rows += [(user_id, _iso(ts), "offline") for ts in ends]
+    rows.sort(key=lambda r: r[1])
+    return rows
+
+
+def generate(db_file, users=10, days=30, sessions_per_day=40, end=None, seed=0):
+    """Создаёт db_file заново. Возвращает (statuses, sessions)."""
+    if os.path.exists(db_file):
+        os.remove(db_file)
+
+    rng = np.random.default_rng(seed)
+    hi = int(end or time.time())
+    lo = hi - days * 86400
+
+    conn = connect(db_file)
+    init_db(conn)
+    cur = conn.cursor()
+    cur.executemany("INSERT INTO users(username) VALUES (?)", [(f"@user{i:03d}",) for i in range(1, users + 1)])
+
+    n_statuses = n_sessions = 0
+    for user_id in range(1, users + 1):
+        starts, ends = user_sessions(rng, lo, hi, sessions_per_day * rng.uniform(0.3, 1.7))
+        statuses = status_rows(user_id, starts, ends)
+        cur.executemany("INSERT OR IGNORE INTO online_statuses(user_id, date, status) VALUES (?, ?, ?)", statuses)
+        cur.executemany(
+            "INSERT INTO online_sessions(user_id, started_at, ended_at, duration) VALUES (?, ?, ?, ?)",
+            [(user_id, _iso(s), _iso(e), int(e - s)) for s, e in zip(starts, ends)]
+        )
+        n_statuses += len(statuses)
+        n_sessions += len(starts)
+
+    conn.commit()
+    conn.close()
+    return n_statuses, n_sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic vitm database")
+    parser.add_argument("--db", default="shared/bench.db")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--sessions-per-day", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    n_statuses, n_sessions = generate(args.db, args.users, args.days, args.sessions_per_day, seed=args.seed)
+    print(f"✅ {n_statuses} statuses, {n_sessions} sessions in {time.perf_counter() - t0:.1f}s → {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+from bench.run import _git_rev
+
+# Нагрузочный тест дашборда: много одновременных вкладок с Auto-refresh.
+#
+#   python -m bench.loadtest --clients 1,4,8,16 --duration 60
+#
+# Поднимает python -m ui.app на синтетической базе (или бьёт в --url),
+# и на каждом уровне держит N клиентов gradio_client, которые раз в
+# --interval секунд (как gr.Timer(5)) зовут /build_heatmap со случайным
+# пресетом и шагом. --interval 0 — замкнутый цикл, предельная пропускная
+# способность.
+#
+# Для UI-процесса и его воркеров отрисовки (дерево процессов по /proc)
+# считаются CPU и пиковый RSS. Ёмкость — наибольший уровень, на котором
+# p95 задержки укладывается в интервал таймера.
+
+STEPS = (1, 5, 15, 60)
+PRESETS = (
+    "Последний 1 час",
+    "Последние 3 часа",
+    "Последние 10 часов",
+    "Текущий день",
+    "Прошлый день",
+)
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE = os.sysconf("SC_PAGE_SIZE")
+
+# --------------------------------------------------
+# /proc
+# --------------------------------------------------
+def _stat(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        # comm может содержать пробелы — режем после последней скобки
+        fields = f.read().rsplit(")", 1)[1].split()
+    ppid, utime, stime = int(fields[1]), int(fields[11]), int(fields[12])
+    return ppid, utime + stime
+
+
+def _rss(pid):
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * PAGE
+
+
+def process_tree(root):
+    parents = {}
+    for name in os.listdir("/proc"):
+        if name.isdigit():
+            try:
+                parents[int(name)] = _stat(int(name))[0]
+            except (OSError, IndexError):
+                continue
+    tree, frontier = {root}, [root]
+    while frontier:
+        pid = frontier.pop()
+        for child, parent in parents.items():
+            if parent == pid and child not in tree:
+                tree.add(child)
+                frontier.append(child)
+    return tree
+
+
+class ProcessMonitor:
+    """CPU-секунды и пиковый суммарный RSS дерева процессов root."""
+
+    def __init__(self, root, interval=0.5):
+        self.root = root
+        self.interval = interval
+        self.peak_rss = 0
+        self._cpu = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def cpu_seconds(self):
+        return sum(self._cpu.values()) / CLK_TCK
+
+    def sample(self):
+        rss = 0
+        for pid in process_tree(self.root):
+            try:
+                # CPU завершившихся воркеров сохраняется в последнем значении
+                self._cpu[pid] = _stat(pid)[1]
+                rss += _rss(pid)
+            except (OSError, IndexError):
+                continue
+        self.peak_rss = max(self.peak_rss, rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+# --------------------------------------------------
+# Server
+# --------------------------------------------------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_file, tmp, workers=None):
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DB_FILE": db_file,
+        "UI_HOST": "127.0.0.1",
+        "UI_PORT": str(port),
+        "LIVE_SOCKET": os.path.join(tmp, "live.sock"),
+        "BITMAP_DIR": os.path.join(tmp, "bitmaps"),
+        "SNAPSHOT_FILE": os.path.join(tmp, "status.snap"),
+    }
+    if workers:
+        env["RENDER_WORKERS"] = str(workers)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "ui.app"], env=env,
+        stdout=subprocess.DEVNULL, stderr=open(os.path.join(tmp, "ui.log"), "w")
+    )
+    url = f"http://127.0.0.1:{port}/"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"UI exited with {proc.returncode}, see {tmp}/ui.log")
+        try:
+            urllib.request.urlopen(url + "api/users", timeout=2)
+            return proc, url
+        except OSError:
+            time.sleep(0.5)
+    proc.kill()
+    raise SystemExit("UI did not start in 120s")
+
+# --------------------------------------------------
+# Clients
+# --------------------------------------------------
+def client_loop(url, interval, stop, latencies, errors, seed):
+    from gradio_client import Client
+    from ui.ranges import calc_range
+
+    rng = random.Random(seed)
+    client = Client(url, verbose=False)
+    # вкладки открываются не одновременно
+    time.sleep(rng.random() * (interval or 0.5))
+
+    while not stop.is_set():
+        start_time, end_time = calc_range(rng.choice(PRESETS))
+        step = rng.choice(STEPS)
+        t0 = time.perf_counter()
+        try:
+            client.predict(start_time, end_time, step, api_name="/build_heatmap")
+            latencies.append(time.perf_counter() - t0)
+        except Exception as e:
+            errors.append(repr(e))
+        elapsed = time.perf_counter() - t0
+        if interval and elapsed < interval:
+            stop.wait(interval - elapsed)
+
+
+def warmup(url):
+    # первый запрос поднимает пул воркеров отрисовки — в замеры он не идёт
+    from gradio_client import Client
+    from ui.ranges import calc_range
+
+    client = Client(url, verbose=False)
+    for step in STEPS:
+        client.predict(*calc_range(PRESETS[0]), step, api_name="/build_heatmap")
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+def run_level(url, clients, duration, interval, monitor_pid):
+    stop = threading.Event()
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(target=client_loop, args=(url, interval, stop, latencies, errors, i), daemon=True)
+        for i in range(clients)
+    ]
+
+    monitor = ProcessMonitor(monitor_pid) if monitor_pid else None
+    if monitor:
+        monitor.__enter__()
+    cpu0 = monitor.cpu_seconds() if monitor else None
+
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    stop.wait(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    if monitor:
+        monitor.__exit__()
+
+    ordered = sorted(latencies)
+    result = {
+        "clients": clients,
+        "duration": round(wall, 2),
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput": round(len(latencies) / wall, 3),
+        "p50": _percentile(ordered, 0.5),
+        "p95": _percentile(ordered, 0.95),
+        "p99": _percentile(ordered, 0.99),
+        "max": ordered[-1] if ordered else None,
+        "over_interval": sum(x > interval for x in ordered) if interval else None,
+    }
+    if monitor:
+        result["cpu_percent"] = round((monitor.cpu_seconds() - cpu0) / wall * 100, 1)
+        result["peak_rss_mb"] = round(monitor.peak_rss / 2**20, 1)
+    if errors:
+        result["error_sample"] = errors[:3]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.loadtest", description="Concurrent-viewer load test")
+    parser.add_argument("--url", help="running UI; by default one is started on a synthetic DB")
+    parser.add_argument("--pid", type=int, help="UI process to monitor when --url is given")
+    parser.add_argument("--db", help="database for the started UI; by default a synthetic one")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--workers", type=int, help="RENDER_WORKERS for the started UI")
+    parser.add_argument("--clients", default="1,2,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per level")
+    parser.add_argument("--interval", type=float, default=5, help="seconds between requests per client; 0 = closed loop")
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    meta = {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "git": _git_rev(),
+        "cpus": os.cpu_count(),
+        "interval": args.interval,
+        "duration": args.duration,
+    }
+
+    tmp = tempfile.mkdtemp(prefix="vitm-load-")
+    proc = None
+    try:
+        if args.url:
+            url, pid = args.url, args.pid
+        else:
+            db_file = args.db
+            if not db_file:
+                from bench.generate import generate
+                db_file = os.path.join(tmp, "bench.db")
+                n_statuses, n_sessions = generate(db_file, args.users, args.days)
+                meta["generated"] = {"users": args.users, "days": args.days,
+                                     "statuses": n_statuses, "sessions": n_sessions}
+            proc, url = start_server(db_file, tmp, args.workers)
+            pid = proc.pid
+            print(f"🚀 UI pid {pid} at {url}")
+
+        warmup(url)
+        results = []
+        for clients in [int(x) for x in args.clients.split(",")]:
+            r = run_level(url, clients, args.duration, args.interval, pid)
+            results.append(r)
+            fmt = lambda v: "—" if v is None else f"{v:.2f}s"
+            print(
+                f"   {clients:>3} clients: {r['throughput']:.2f} req/s, "
+                f"p50 {fmt(r['p50'])}, p95 {fmt(r['p95'])}, p99 {fmt(r['p99'])}, "
+                f"errors {r['errors']}"
+                + (f", CPU {r['cpu_percent']}%, peak RSS {r['peak_rss_mb']} MB" if "cpu_percent" in r else "")
+            )
+    finally:
+        if proc:
+            proc.terminate()
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    capacity = None
+    if args.interval:
+        ok = [r["clients"] for r in results if r["p95"] is not None and r["p95"] <= args.interval and not r["errors"]]
+        capacity = max(ok) if ok else 0
+        print(f"✅ Capacity: {capacity} auto-refreshing viewers (p95 ≤ {args.interval:g}s)")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "capacity": capacity, "results": results}, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    main()
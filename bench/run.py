@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Сквозной бенчмарк: загрузка данных, построение heatmap (ui.heatmap)
+# и Plotly-таймлайна (main.plotly_timeline) для каждого пресета
+# calc_range и шага, плюс пропускная способность записи коллектора.
+#
+#   python -m bench --users 10 --days 30 --out before.json
+#   python -m bench --users 10 --days 30 --out after.json --compare before.json
+#
+# Всё офлайн: база генерируется (bench.generate) с концом в «сейчас»,
+# чтобы пресеты вроде «Последние 3 часа» попадали в данные.
+
+STEPS = (1, 5, 15, 60)
+
+
+def timed(fn, *args, repeat=3):
+    # первый прогон не считается: ленивые импорты, индекс сессий, кэши
+    result = fn(*args)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - t0)
+    return times, result
+
+
+def summary(name, params, times, **extra):
+    ordered = sorted(times)
+    return {
+        "name": name,
+        "params": params,
+        "runs": len(times),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+        **extra,
+    }
+
+
+def _git_rev():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# --------------------------------------------------
+# Scenarios
+# --------------------------------------------------
+def read_scenarios(presets, steps, repeat, plotly=True):
+    # импорт после выставления DB_FILE: модули читают его при загрузке
+    from ui.data import load_sessions, load_statuses
+    from ui.heatmap import build_heatmap, encode_figure
+    from ui.ranges import PRESETS, calc_range, parse_range
+    from collector.users import UserDirectory
+
+    users = UserDirectory(os.environ["DB_FILE"])
+    users.refresh()
+    user_map = dict(users.by_id)
+
+    build_plotly = None
+    if plotly:
+        from main.plotly_timeline import build_plotly_timeline as build_plotly
+
+    results = []
+    for preset in presets or PRESETS:
+        start_time, end_time = calc_range(preset)
+        lo, hi = parse_range(start_time, end_time)
+        base = {"preset": preset, "start": start_time, "end": end_time}
+
+        times, df = timed(load_statuses, lo, hi, user_map.keys(), repeat=repeat)
+        results.append(summary("load_statuses", base, times, rows=len(df)))
+
+        times, df = timed(load_sessions, lo, hi, user_map.keys(), repeat=repeat)
+        results.append(summary("load_sessions", base, times, rows=len(df)))
+
+        for step in steps:
+            params = {**base, "step": step}
+
+            times, fig = timed(build_heatmap, start_time, end_time, step, user_map, repeat=repeat)
+            results.append(summary("build_heatmap", params, times))
+
+            if fig is not None:
+                times, uri = timed(encode_figure, fig, repeat=repeat)
+                results.append(summary("encode_heatmap", params, times, bytes=len(uri)))
+
+            if build_plotly:
+                times, _ = timed(build_plotly, start_time, end_time, step, repeat=repeat)
+                results.append(summary("build_plotly_timeline", params, times))
+
+            print(f"   {preset} / {step}s")
+
+    return results
+
+
+def write_scenario(db_file, users, polls):
+    # копия базы и отдельный процесс — коллектор открывает базу при импорте
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = os.path.join(tmp, "writes.db")
+        shutil.copy(db_file, copy)
+        env = {
+            **os.environ,
+            "DB_FILE": copy,
+            "BITMAP_DIR": os.path.join(tmp, "bitmaps"),
+            "LIVE_SOCKET": os.path.join(tmp, "live.sock"),
+            # collector.collector при импорте пересоздаёт снимок — не боевой
+            "SNAPSHOT_FILE": os.path.join(tmp, "status.snap"),
+            "ANOMALY_HOOK": "",
+        }
+        out = subprocess.run(
+            [sys.executable, "-m", "bench.writes", str(users), str(polls)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+# --------------------------------------------------
+# Compare
+# --------------------------------------------------
+def _key(r):
+    return r["name"], json.dumps({k: v for k, v in r["params"].items() if k not in ("start", "end")}, sort_keys=True)
+
+
+def compare(results, baseline, threshold):
+    """
+    Печатает отношение минимумов к baseline (минимум меньше всего шумит);
+    возвращает число регрессий.
+    """
+    old = {_key(r): r for r in baseline["results"] if "min" in r}
+    regressions = 0
+    for r in results:
+        prev = old.get(_key(r))
+        if "min" not in r or prev is None or not prev["min"]:
+            continue
+        ratio = r["min"] / prev["min"]
+        mark = "⚠️" if ratio > threshold else "  "
+        regressions += ratio > threshold
+        print(f"{mark} {ratio:6.2f}x  {r['name']:<22} {json.dumps(r['params'], ensure_ascii=False)}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="End-to-end vitm benchmarks")
+    parser.add_argument("--db", help="existing database; by default a synthetic one is generated")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--sessions-per-day", type=int, default=40)
+    parser.add_argument("--preset", dest="presets", action="append", help="calc_range preset, repeatable")
+    parser.add_argument("--step", dest="steps", type=int, action="append", help=f"seconds, repeatable (default {STEPS})")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--polls", type=int, default=200, help="collector polls per user for the write scenario")
+    parser.add_argument("--no-plotly", action="store_true")
+    parser.add_argument("--no-writes", action="store_true")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from a previous run")
+    parser.add_argument("--threshold", type=float, default=1.2, help="min-time ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    # всё временное — здесь, включая путь снимка: живой край рабочего
+    # коллектора в замеры чтения попадать не должен
+    tmp = tempfile.mkdtemp(prefix="vitm-bench-")
+    os.environ["SNAPSHOT_FILE"] = os.path.join(tmp, "status.snap")
+    meta = {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "git": _git_rev(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+    if args.db:
+        db_file = args.db
+    else:
+        from bench.generate import generate
+        db_file = os.path.join(tmp, "bench.db")
+        n_statuses, n_sessions = generate(db_file, args.users, args.days, args.sessions_per_day)
+        meta["generated"] = {
+            "users": args.users, "days": args.days, "sessions_per_day": args.sessions_per_day,
+            "statuses": n_statuses, "sessions": n_sessions,
+        }
+        print(f"📦 {n_statuses} statuses, {n_sessions} sessions → {db_file}")
+
+    os.environ["DB_FILE"] = db_file
+    try:
+        results = read_scenarios(args.presets, args.steps or STEPS, args.repeat, plotly=not args.no_plotly)
+        if not args.no_writes:
+            results.append(write_scenario(db_file, args.users, args.polls))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {"meta": meta, "results": results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"✅ {len(results)} results → {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            raise SystemExit(f"{regressions} regressions above {args.threshold}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# Пропускная способность записи коллектора: save_status + save_session,
+# как в check_user, без Telegram. Запускается отдельным процессом из
+# bench.run — collector.collector открывает базу из DB_FILE при импорте.
+#
+#   DB_FILE=/tmp/copy.db python -m bench.writes <users> <polls>
+
+os.environ.setdefault("API_ID", "0")
+os.environ.setdefault("API_HASH", "bench")
+
+
+def run(users, polls, online_share=0.3, seed=0):
+    import numpy as np
+    from collector import collector
+
+    rng = np.random.default_rng(seed)
+    names = [f"@user{i:03d}" for i in range(1, users + 1)]
+    t = datetime.now(timezone.utc)
+    online = dict.fromkeys(names, False)
+
+    writes = 0
+    t0 = time.perf_counter()
+    for _ in range(polls):
+        t += timedelta(seconds=collector.CHECK_INTERVAL)
+        for name in names:
+            # смена статуса с вероятностью, дающей ~online_share онлайна
+            p = 0.1 * (online_share if not online[name] else 1 - online_share)
+            if rng.random() < p:
+                online[name] = not online[name]
+            status = "online" if online[name] else "offline"
+            collector.save_status(name, status, t)
+            collector.save_session(name, status, t)
+            writes += 1
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "name": "collector_writes",
+        "params": {"users": users, "polls": polls},
+        "writes": writes,
+        "seconds": elapsed,
+        "writes_per_sec": writes / elapsed if elapsed else None,
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(int(sys.argv[1]), int(sys.argv[2]))))
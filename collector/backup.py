@@ -0,0 +1,196 @@
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from collector.db import connect_readonly
+
+# Горячий бэкап базы коллектора, не останавливая запись.
+#
+#   python -m collector.backup                 — фоновый цикл, раз в BACKUP_INTERVAL
+#   python -m collector.backup --once --gzip   — один бэкап и выход
+#   python -m collector.backup --verify FILE   — проверить готовый бэкап
+#
+# Копия снимается онлайн-бэкапом SQLite (Connection.backup) по BACKUP_PAGES
+# страниц за шаг с паузой между шагами — диск делится с коллектором.
+# База в режиме WAL (collector.db.connect), и на время копирования
+# источник держит транзакцию чтения: копия — один согласованный снимок,
+# а коммиты коллектора идут мимо, в WAL, не дожидаясь бэкапа. Без
+# снимка SQLite начинал бы копирование заново после каждого коммита.
+#
+# Копия пишется во временный файл, переводится в rollback-журнал (один
+# самодостаточный файл), проверяется PRAGMA integrity_check, при --gzip
+# сжимается и только потом переименовывается в
+#
+#   shared/backups/vitm-20261019-031500.db[.gz]
+#
+# Старые копии сверх BACKUP_KEEP удаляются.
+
+DB_FILE = os.getenv("DB_FILE", "shared/vitm.db")
+BACKUP_DIR = os.getenv("BACKUP_DIR", "shared/backups")
+BACKUP_INTERVAL = int(os.getenv("BACKUP_INTERVAL", str(6 * 3600)))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+BACKUP_GZIP = os.getenv("BACKUP_GZIP", "0") == "1"
+BACKUP_PAGES = int(os.getenv("BACKUP_PAGES", "256"))
+BACKUP_PAUSE = float(os.getenv("BACKUP_PAUSE", "0.01"))
+
+PREFIX = "vitm-"
+# без WAL снимок не удержать: копирование перезапускается на каждом коммите
+MAX_RESTARTS = 10
+
+
+class BackupError(Exception):
+    pass
+
+# --------------------------------------------------
+# Copy
+# --------------------------------------------------
+def copy(db_file, target, pages=BACKUP_PAGES, pause=BACKUP_PAUSE):
+    """Скопировать базу в target (обычный файл SQLite). Возвращает число страниц."""
+    src = connect_readonly(db_file, isolation_level=None)
+    dst = sqlite3.connect(target)
+    try:
+        wal = src.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        if wal:
+            # снимок на всё время копирования; писателя в WAL он не держит
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+        restarts, last, total = 0, None, 0
+
+        def progress(status, remaining, count):
+            nonlocal restarts, last, total
+            if last is not None and remaining > last:
+                restarts += 1
+                if restarts > MAX_RESTARTS:
+                    raise BackupError(f"{db_file} keeps changing and is not in WAL mode")
+            last, total = remaining, count
+            # уступаем диск коллектору между шагами
+            if remaining and pause:
+                time.sleep(pause)
+
+        src.backup(dst, pages=pages, progress=progress)
+        # страница 1 скопирована вместе с флагом WAL — копия должна быть одним файлом
+        dst.execute("PRAGMA journal_mode=DELETE")
+        if wal:
+            src.execute("COMMIT")
+        return total
+    finally:
+        dst.close()
+        src.close()
+
+
+def verify(path):
+    """PRAGMA integrity_check копии (.db или .db.gz). Возвращает число строк по таблицам."""
+    if path.endswith(".gz"):
+        with tempfile.TemporaryDirectory() as tmp:
+            plain = os.path.join(tmp, "backup.db")
+            with gzip.open(path, "rb") as f_in, open(plain, "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            return verify(plain)
+
+    conn = connect_readonly(path)
+    try:
+        result = [r[0] for r in conn.execute("PRAGMA integrity_check")]
+        if result != ["ok"]:
+            raise BackupError(f"{path}: integrity_check failed: {'; '.join(result[:5])}")
+        tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        return {t: conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in tables}
+    finally:
+        conn.close()
+
+# --------------------------------------------------
+# Backups
+# --------------------------------------------------
+def backups(root=BACKUP_DIR):
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if name.startswith(PREFIX) and name.endswith((".db", ".db.gz"))
+    )
+
+
+def _prune(root, keep):
+    for name in backups(root)[:-keep] if keep > 0 else []:
+        os.remove(os.path.join(root, name))
+
+
+def backup(db_file=DB_FILE, root=BACKUP_DIR, compress=BACKUP_GZIP, keep=BACKUP_KEEP,
+           pages=BACKUP_PAGES, pause=BACKUP_PAUSE):
+    """Один проверенный бэкап в root. Возвращает (путь, сведения)."""
+    os.makedirs(root, exist_ok=True)
+    name = PREFIX + datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S") + ".db"
+    final = os.path.join(root, name + (".gz" if compress else ""))
+    # точка в начале — backups() недописанные файлы не видит
+    tmp = os.path.join(root, f".{name}.tmp")
+
+    t0 = time.perf_counter()
+    try:
+        page_count = copy(db_file, tmp, pages, pause)
+        copied = time.perf_counter() - t0
+        rows = verify(tmp)
+
+        if compress:
+            with open(tmp, "rb") as f_in, gzip.open(tmp + ".gz", "wb", compresslevel=6) as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            os.remove(tmp)
+            tmp += ".gz"
+        os.replace(tmp, final)
+    finally:
+        for leftover in (tmp, tmp + ".gz"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    _prune(root, keep)
+    return final, {
+        "pages": page_count,
+        "bytes": os.path.getsize(final),
+        "rows": rows,
+        "copy_seconds": round(copied, 3),
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online SQLite backup that does not block the collector")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("--dir", default=BACKUP_DIR)
+    parser.add_argument("--gzip", action="store_true", default=BACKUP_GZIP, help="compress backups")
+    parser.add_argument("--keep", type=int, default=BACKUP_KEEP, help="backups to keep")
+    parser.add_argument("--pages", type=int, default=BACKUP_PAGES, help="pages per backup step")
+    parser.add_argument("--pause", type=float, default=BACKUP_PAUSE, help="seconds between steps")
+    parser.add_argument("--interval", type=int, default=BACKUP_INTERVAL, help="seconds between backups")
+    parser.add_argument("--once", action="store_true", help="make one backup and exit")
+    parser.add_argument("--verify", metavar="FILE", help="check an existing backup and exit")
+    args = parser.parse_args()
+
+    if args.verify:
+        rows = verify(args.verify)
+        print(f"✅ {args.verify}: ok, " + ", ".join(f"{t} {n}" for t, n in rows.items()))
+        return
+
+    # фоновая работа не должна отнимать CPU у коллектора и UI
+    os.nice(10)
+    while True:
+        try:
+            path, info = backup(args.db, args.dir, args.gzip, args.keep, args.pages, args.pause)
+            print(
+                f"💾 Backup {path}: {info['bytes'] / 2**20:.1f} MB, {info['pages']} pages, "
+                f"copy {info['copy_seconds']:.1f}s, total {info['seconds']:.1f}s"
+            )
+        except (BackupError, sqlite3.Error, OSError) as e:
+            if args.once:
+                raise
+            print(f"⚠️ Backup failed: {e}")
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,15 +4,29 @@ from datetime import datetime
 from telethon import TelegramClient
 from telethon.tl.types import UserStatusOnline, UserStatusOffline
 
-from collector.config import API_ID, API_HASH, CHECK_INTERVAL, DB_FILE, LOCAL_TZ, UTC
-from collector.db import connect, init_db
+from collector.config import API_ID, API_HASH, CHECK_INTERVAL, DB_FILE, LIVE_SOCKET, LOCAL_TZ, SNAPSHOT_FILE, UTC
+from collector.live import LiveFeed
+from collector.snapshot import SnapshotWriter
+from analytics import profiles
+from analytics.anomaly import Detector, default_hooks
+from analytics.bitmaps import BitmapStore
+from analytics.pyramid import PyramidStore
+from storage import open_storage
 
 stop_event = asyncio.Event()
 active_sessions = {}
+feed = LiveFeed(LIVE_SOCKET)
+bitmaps = BitmapStore()
+pyramid = PyramidStore(bitmaps.root, bitmaps)
+snapshot = SnapshotWriter(SNAPSHOT_FILE)
+# collector.recent.RecentBuffer, если UI работает в этом же процессе (ui.combined)
+recent = None
 
-conn = connect(DB_FILE)
-init_db(conn)
-cur = conn.cursor()
+# пишем всегда в SQLite; DuckDB открывает только UI (ui.store) — файл
+# DuckDB может держать лишь один процесс
+store = open_storage(DB_FILE, backend="sqlite")
+# профили и детектор пишут в свои таблицы той же базы
+detector = Detector(store.conn, default_hooks())
 
 
 def shutdown():
@@ -21,40 +35,29 @@ def shutdown():
 
 
 def get_users():
-    cur.execute("SELECT username FROM users WHERE active = 1")
-    return [r[0] for r in cur.fetchall()]
+    return [name for _, name in store.users()]
 
 
 def get_user_id(username):
-    cur.execute("SELECT id FROM users WHERE username=?", (username,))
-    row = cur.fetchone()
-    if row:
-        return row[0]
-
-    cur.execute("INSERT INTO users(username) VALUES (?)", (username,))
-    conn.commit()
-    return cur.lastrowid
+    return store.user_id(username)
 
 
 def save_status(username, status, ts):
     user_id = get_user_id(username)
-
-    cur.execute("""
-        INSERT OR IGNORE INTO online_statuses(user_id, date, status)
-        VALUES (?, ?, ?)
-    """, (
-        user_id,
-        ts.replace(microsecond=0).astimezone(UTC).isoformat(),
-        status
-    ))
-    conn.commit()
+    store.record_status(user_id, status, ts.timestamp())
+    if recent is not None:
+        recent.add_status(user_id, ts.timestamp(), status == "online")
 
 
 def save_session(username, status, ts):
     user_id = get_user_id(username)
 
     if status == "online":
-        active_sessions.setdefault(username, ts)
+        if username not in active_sessions:
+            active_sessions[username] = ts
+            detector.on_online(user_id, ts.timestamp())
+        else:
+            detector.on_tick(user_id, active_sessions[username].timestamp(), ts.timestamp())
         return
 
     if status == "offline" and username in active_sessions:
@@ -62,17 +65,18 @@ def save_session(username, status, ts):
         duration = int((ts - start).total_seconds())
 
         if duration > 0:
-            cur.execute("""
-                INSERT OR IGNORE INTO online_sessions
-                (user_id, started_at, ended_at, duration)
-                VALUES (?, ?, ?, ?)
-            """, (
-                user_id,
-                start.astimezone(UTC).isoformat(),
-                ts.astimezone(UTC).isoformat(),
-                duration
-            ))
-            conn.commit()
+            store.record_session(user_id, start.timestamp(), ts.timestamp())
+            if recent is not None:
+                recent.add_session(user_id, start.timestamp(), ts.timestamp())
+
+            try:
+                bitmaps.add_interval(user_id, start.timestamp(), ts.timestamp())
+                pyramid.add_interval(user_id, start.timestamp(), ts.timestamp())
+            except OSError as e:
+                print(f"⚠️ Bitmap update failed for {username}: {e}")
+
+            profiles.record_session(store.conn, user_id, start.timestamp(), ts.timestamp())
+            detector.on_session(user_id, start.timestamp(), ts.timestamp())
 
 
 async def check_user(client, username):
@@ -97,6 +101,9 @@ async def check_user(client, username):
 
         save_status(username, status, ts)
         save_session(username, status, ts)
+        was_online = ts if status == "offline" else None
+        feed.publish(get_user_id(username), username, status, now, was_online=was_online)
+        snapshot.update(get_user_id(username), status, now, was_online=was_online)
 
         try:
             await asyncio.wait_for(stop_event.wait(), timeout=CHECK_INTERVAL)
@@ -104,10 +111,16 @@ async def check_user(client, username):
             pass
 
 
-async def main():
+async def main(handle_signals=True):
     async with TelegramClient("collector", API_ID, API_HASH) as client:
-        loop = asyncio.get_running_loop()
-        loop.add_signal_handler(signal.SIGINT, shutdown)
+        if handle_signals:
+            loop = asyncio.get_running_loop()
+            loop.add_signal_handler(signal.SIGINT, shutdown)
+
+        try:
+            await feed.start()
+        except OSError as e:
+            print(f"⚠️ Live feed disabled ({LIVE_SOCKET}): {e}")
 
         users = get_users()
         print("👥 Monitoring users:", users)
@@ -128,7 +141,9 @@ async def main():
 
         await asyncio.gather(*tasks, return_exceptions=True)
 
-    conn.close()
+    await feed.stop()
+    snapshot.close()
+    store.close()
     print("✅ Collector stopped")
 
 
@@ -15,7 +15,9 @@ API_ID = int(required("API_ID"))
 API_HASH = required("API_HASH")
 
 CHECK_INTERVAL = 5  # секунд
-DB_FILE = "shared/vitm.db"
+DB_FILE = os.getenv("DB_FILE", "shared/vitm.db")
+LIVE_SOCKET = os.getenv("LIVE_SOCKET", "shared/live.sock")
+SNAPSHOT_FILE = os.getenv("SNAPSHOT_FILE", "shared/status.snap")
 
-LOCAL_TZ = pytz.timezone("Europe/Kiev")
+LOCAL_TZ = pytz.timezone(os.getenv("DISPLAY_TZ", "Europe/Kiev"))
 UTC = timezone.utc
@@ -1,7 +1,44 @@
+import os
 import sqlite3
 
+# DB_WAL=0 — обычный rollback-журнал: для узлов, где читатели не могут
+# создавать файлы рядом с базой, но должны видеть запись коллектора вживую
+DB_WAL = os.getenv("DB_WAL", "1") == "1"
+# DB_IMMUTABLE=1 — нода получает базу целиком копией и сама её не пишет,
+# см. connect_readonly
+DB_IMMUTABLE = os.getenv("DB_IMMUTABLE", "0") == "1"
+
 def connect(db_file):
     conn = sqlite3.connect(db_file)
+    # WAL: читатели (UI, бэкап) не блокируют запись коллектора, а бэкап
+    # держит согласованный снимок, пока копирует (collector.backup).
+    # Режим хранится в файле базы, повторный вызов ничего не меняет
+    conn.execute(f"PRAGMA journal_mode={'WAL' if DB_WAL else 'DELETE'}")
+    return conn
+
+def connect_readonly(db_file, **kwargs):
+    # mode=ro не создаёт файл и не требует прав на запись в него (UI на
+    # read-only нодах). Но базе в WAL читателю нужны -wal и -shm рядом с ней:
+    # пока коллектор пишет, они есть; если их нет, а каталог закрыт на
+    # запись, SQLite не может их создать, и открытие падает.
+    #
+    # Read-only нодам нужно одно из:
+    #   - право записи в каталог базы (сам файл может быть только для чтения);
+    #   - DB_WAL=0 у коллектора;
+    #   - DB_IMMUTABLE=1, если база приезжает на ноду копией целиком: тогда
+    #     открываем immutable=1 — снимок без отслеживания изменений. Такое
+    #     соединение не видит новых коммитов, а если файл всё же пишут,
+    #     SQLite может вернуть неверные данные или SQLITE_CORRUPT, поэтому
+    #     сам по себе этот режим не включается.
+    conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, **kwargs)
+    try:
+        conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+    except sqlite3.OperationalError as e:
+        conn.close()
+        if not DB_IMMUTABLE or e.sqlite_errorcode & 0xFF not in (sqlite3.SQLITE_READONLY, sqlite3.SQLITE_CANTOPEN):
+            raise
+        print(f"⚠️ {db_file}: cannot open WAL read-only ({e}), using an immutable snapshot (DB_IMMUTABLE=1)")
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro&immutable=1", uri=True, **kwargs)
     return conn
 
 def init_db(conn):
@@ -25,6 +62,9 @@ def init_db(conn):
     )
     """)
 
+    # выборки по времени без user_id: страницы /api/transitions, statuses()
+    cur.execute("CREATE INDEX IF NOT EXISTS online_statuses_date ON online_statuses(date)")
+
     cur.execute("""
     CREATE TABLE IF NOT EXISTS online_sessions (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -36,4 +76,76 @@ def init_db(conn):
     )
     """)
 
+    # профили по часам недели, см. analytics.profiles
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS activity_profiles (
+        user_id INTEGER,
+        variant TEXT,
+        first_ts INTEGER,
+        updated_at INTEGER,
+        data BLOB,
+        PRIMARY KEY(user_id, variant)
+    )
+    """)
+
+    # события и базовые линии детектора, см. analytics.anomaly
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS anomalies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        kind TEXT,
+        detected_at TEXT,
+        started_at TEXT,
+        value REAL,
+        threshold REAL,
+        details TEXT
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS anomalies_user_started ON anomalies(user_id, started_at)")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS anomaly_baselines (
+        user_id INTEGER PRIMARY KEY,
+        state TEXT
+    )
+    """)
+
+    # счётчик изменений users — читатели (UI) перечитывают пользователей
+    # только когда он поменялся
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cur.execute("INSERT OR IGNORE INTO users_version(id, version) VALUES (1, 0)")
+
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_version_{event.lower()}
+        AFTER {event} ON users
+        BEGIN
+            UPDATE users_version SET version = version + 1 WHERE id = 1;
+        END
+        """)
+
+    # счётчик правок online_sessions на месте (collector.rebuild): новые
+    # строки индекс сессий UI берёт по rowid, а правки и удаления — по нему
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sessions_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    cur.execute("INSERT OR IGNORE INTO sessions_version(id, version) VALUES (1, 0)")
+
+    for event in ("UPDATE", "DELETE"):
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS sessions_version_{event.lower()}
+        AFTER {event} ON online_sessions
+        BEGIN
+            UPDATE sessions_version SET version = version + 1 WHERE id = 1;
+        END
+        """)
+
     conn.commit()
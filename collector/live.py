@@ -0,0 +1,75 @@
+import asyncio
+import json
+import os
+
+
+class LiveFeed:
+    """
+    Рассылка переходов статусов подписчикам (UI) через Unix-сокет.
+
+    Формат — JSON по строке на событие. Новый подписчик сразу получает
+    текущий статус каждого пользователя, дальше — только переходы.
+    """
+
+    # сколько байт может накопиться у медленного подписчика до отключения
+    MAX_BUFFER = 256 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {}  # username -> последнее событие
+        self._writers = set()
+        self._server = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._on_connect, path=self.path)
+
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for w in list(self._writers):
+            w.close()
+        self._writers.clear()
+        await self._server.wait_closed()
+        self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _on_connect(self, reader, writer):
+        for event in self.state.values():
+            writer.write(self._encode(event))
+        self._writers.add(writer)
+        try:
+            # подписчик ничего не шлёт — ждём, пока он отключится
+            await reader.read()
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    @staticmethod
+    def _encode(event):
+        return (json.dumps(event, ensure_ascii=False) + "\n").encode()
+
+    def publish(self, user_id, username, status, ts, was_online=None):
+        prev = self.state.get(username)
+        if prev is not None and prev["status"] == status:
+            return
+
+        event = {
+            "user_id": user_id,
+            "username": username,
+            "status": status,
+            "ts": ts.isoformat(),
+            "was_online": was_online.isoformat() if was_online else None,
+        }
+        self.state[username] = event
+
+        data = self._encode(event)
+        for w in list(self._writers):
+            if w.transport.get_write_buffer_size() > self.MAX_BUFFER:
+                self._writers.discard(w)
+                w.close()
+                continue
+            w.write(data)
@@ -0,0 +1,190 @@
+import argparse
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from collector.db import connect, init_db
+
+# Восстановление online_sessions из online_statuses.
+#
+# Сессия — серия online-строк пользователя. Конец сессии — дата
+# следующей offline-строки: коллектор пишет туда was_online, то есть
+# точный момент ухода. Если между online-строками разрыв больше
+# max_gap (коллектор не работал), сессия закрывается последней
+# online-строкой. Незакрытые серии в конце данных пропускаются.
+
+DEFAULT_MAX_GAP = 300
+CHUNK = timedelta(days=7)
+MARGIN = timedelta(days=1)
+
+UPSERT_SQL = """
+    INSERT INTO online_sessions(user_id, started_at, ended_at, duration)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id, started_at) DO UPDATE SET
+        ended_at = excluded.ended_at,
+        duration = excluded.duration
+"""
+
+# старые строки коллектора писали started_at с микросекундами. Та же
+# секунда — диапазон [s[:19], s[:19] + "~"): '~' больше любого символа
+# хвоста ISO-строки, а диапазон идёт по UNIQUE(user_id, started_at)
+DEDUP_SQL = """
+    DELETE FROM online_sessions
+    WHERE user_id = ? AND started_at >= ? AND started_at < ? AND started_at != ?
+"""
+
+
+def detect_sessions(ts, online, max_gap=DEFAULT_MAX_GAP):
+    """
+    ts — int64 epoch, online — bool; строки одного пользователя по времени.
+
+    Возвращает индексы (start_idx, end_idx) и флаг by_offline: True —
+    конец взят из offline-строки end_idx, False — из последней online.
+    """
+    n = len(ts)
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=bool)
+
+    prev_online = np.zeros(n, dtype=bool)
+    prev_online[1:] = online[:-1]
+    gap = np.zeros(n, dtype=bool)
+    gap[1:] = np.diff(ts) > max_gap
+
+    starts = online & (~prev_online | gap)
+
+    # последняя online-строка серии: следующая строка не продолжает её
+    next_continues = np.zeros(n, dtype=bool)
+    next_continues[:-1] = online[1:] & ~starts[1:]
+    lasts = online & ~next_continues
+
+    start_idx = np.flatnonzero(starts)
+    last_idx = np.flatnonzero(lasts)
+
+    nxt = last_idx + 1
+    has_next = nxt < n
+    nxt_safe = np.minimum(nxt, n - 1)
+    by_offline = has_next & ~online[nxt_safe]
+    by_gap = has_next & online[nxt_safe]
+
+    closed = by_offline | by_gap
+    end_idx = np.where(by_offline, nxt_safe, last_idx)
+    return start_idx[closed], end_idx[closed], by_offline[closed]
+
+
+def load_statuses(conn, user_id, lo, hi):
+    # запрос по (user_id, date) идёт по индексу UNIQUE(user_id, date, status)
+    df = pd.read_sql_query(
+        """
+        SELECT date, status FROM online_statuses
+        WHERE user_id = ? AND date >= ? AND date < ?
+        """,
+        conn,
+        params=(user_id, lo.isoformat(), hi.isoformat())
+    )
+    if df.empty:
+        return df
+
+    delta = pd.to_datetime(df["date"], utc=True, format="ISO8601") - pd.Timestamp(0, tz="UTC")
+    df["ts"] = (delta // pd.Timedelta(seconds=1)).astype("int64")
+    df["online"] = df["status"] == "online"
+    # при равном времени online раньше offline: offline закрывает сессию
+    return df.sort_values(["ts", "online"], ascending=[True, False], kind="stable")
+
+
+def rebuild_user(conn, user_id, lo, hi, max_gap=DEFAULT_MAX_GAP):
+    df = load_statuses(conn, user_id, lo - MARGIN, hi + MARGIN)
+    if df.empty:
+        return []
+
+    ts = df["ts"].to_numpy()
+    dates = df["date"].to_numpy()
+    start_idx, end_idx, by_offline = detect_sessions(ts, df["online"].to_numpy(), max_gap)
+
+    start_ts = ts[start_idx]
+    # was_online может оказаться чуть раньше последнего online-опроса
+    end_ts = np.maximum(ts[end_idx], np.where(by_offline, ts[end_idx - 1], ts[end_idx]))
+    end_dates = np.where(ts[end_idx] >= end_ts, dates[end_idx], dates[np.maximum(end_idx - 1, 0)])
+
+    keep = (
+        (start_ts >= int(lo.timestamp())) &
+        (start_ts < int(hi.timestamp())) &
+        (end_ts > start_ts)
+    )
+
+    return list(zip(
+        [user_id] * int(keep.sum()),
+        dates[start_idx][keep].tolist(),
+        end_dates[keep].tolist(),
+        (end_ts - start_ts)[keep].tolist(),
+    ))
+
+
+def upsert(conn, rows):
+    cur = conn.cursor()
+    cur.executemany(DEDUP_SQL, [(uid, s[:19], s[:19] + "~", s) for uid, s, _, _ in rows])
+    cur.executemany(UPSERT_SQL, rows)
+    conn.commit()
+
+
+def update_bitmaps(db_file, lo, hi, user_ids):
+    # пересобранные сессии могли стать короче — переписываем диапазон целиком;
+    # последние сессии заканчиваются в пределах MARGIN после hi
+    from analytics.bitmaps import BitmapStore, backfill
+    store = BitmapStore()
+    if not store.ready():
+        return
+    backfill(db_file, store, int(lo.timestamp()), int((hi + MARGIN).timestamp()), user_ids)
+
+
+def rebuild(db_file, lo, hi, user_ids=None, max_gap=DEFAULT_MAX_GAP):
+    conn = connect(db_file)
+    init_db(conn)
+
+    if not user_ids:
+        user_ids = [r[0] for r in conn.execute("SELECT id FROM users ORDER BY id")]
+
+    total = 0
+    chunk_lo = lo
+    while chunk_lo < hi:
+        chunk_hi = min(chunk_lo + CHUNK, hi)
+        rows = []
+        for uid in user_ids:
+            rows += rebuild_user(conn, uid, chunk_lo, chunk_hi, max_gap)
+        upsert(conn, rows)
+        total += len(rows)
+        print(f"   {chunk_lo:%Y-%m-%d} — {chunk_hi:%Y-%m-%d}: {len(rows)} sessions")
+        chunk_lo = chunk_hi
+
+    conn.close()
+    update_bitmaps(db_file, lo, hi, user_ids)
+    return total
+
+
+def _parse_dt(value):
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    # границы сравниваются со строками UTC в базе — смещение только +00:00
+    return dt.astimezone(timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild online_sessions from online_statuses")
+    parser.add_argument("--db", default=os.getenv("DB_FILE", "shared/vitm.db"))
+    parser.add_argument("--from", dest="lo", required=True, type=_parse_dt, help="UTC, e.g. 2025-01-01")
+    parser.add_argument("--to", dest="hi", required=True, type=_parse_dt)
+    parser.add_argument("--user", dest="users", type=int, action="append", help="user id, repeatable")
+    parser.add_argument("--max-gap", type=int, default=DEFAULT_MAX_GAP, help="seconds")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    total = rebuild(args.db, args.lo, args.hi, args.users, args.max_gap)
+    print(f"✅ Rebuilt {total} sessions in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
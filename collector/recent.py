@@ -0,0 +1,140 @@
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+
+import numpy as np
+
+# Недавняя история в памяти процесса — для совмещённого режима
+# (python -m ui.combined), где коллектор и UI живут в одном процессе.
+#
+# На пользователя — переходы статуса (ts, online), отсортированные по
+# времени, и закрытые сессии (start, end). Храним HORIZON секунд назад
+# плюс последний переход до границы: он задаёт статус на её момент.
+# При старте буфер заполняется из базы, дальше его пополняет коллектор;
+# база остаётся долговременным хранилищем.
+#
+# window(lo, hi) отдаёт строки в формате statuses/sessions хранилища,
+# если окно целиком в буфере, иначе None — тогда читаем базу. Статусы —
+# только переходы плюс статус на момент lo: после ffill таймлайн тот же,
+# только начало окна известно сразу, а не с первой строки в нём.
+
+HORIZON = 48 * 3600
+
+
+class _Trail:
+
+    def __init__(self):
+        self.ts = []      # время переходов, по возрастанию
+        self.online = []  # статус после перехода
+        self.sessions = deque()  # (start, end) по времени закрытия
+
+    def add_status(self, ts, online):
+        i = bisect_right(self.ts, ts)
+        # не переход — статус тот же, что уже действует на этот момент
+        if i and self.online[i - 1] == online:
+            return
+        self.ts.insert(i, ts)
+        self.online.insert(i, online)
+
+    def evict(self, cutoff):
+        # оставляем один переход не позже cutoff — статус на границе
+        keep = bisect_right(self.ts, cutoff) - 1
+        if keep > 0:
+            del self.ts[:keep], self.online[:keep]
+        while self.sessions and self.sessions[0][1] < cutoff:
+            self.sessions.popleft()
+
+    def statuses(self, lo, hi):
+        a = bisect_right(self.ts, lo) - 1
+        b = bisect_right(self.ts, hi)
+        rows = []
+        if a >= 0:
+            # статус на начало окна — как будто строка записана в lo
+            rows.append((lo, self.online[a]))
+        rows.extend(zip(self.ts[a + 1:b], self.online[a + 1:b]))
+        return rows
+
+
+class RecentBuffer:
+
+    def __init__(self, horizon=HORIZON):
+        self.horizon = horizon
+        self.since = time.time()  # с какого момента буфер полный
+        self._users = {}
+        self._lock = threading.Lock()
+        self._evicted_at = 0
+
+    def _trail(self, user_id):
+        trail = self._users.get(user_id)
+        if trail is None:
+            trail = self._users[user_id] = _Trail()
+        return trail
+
+    def seed(self, store, now=None):
+        """Заполнить буфер из хранилища за последние horizon секунд."""
+        now = time.time() if now is None else now
+        lo = now - self.horizon
+
+        statuses = sorted(store.statuses(lo, now), key=lambda r: (r[0], r[1]))
+        sessions = sorted(store.sessions(lo, now), key=lambda r: r[3])
+        with self._lock:
+            for uid, ts, online in statuses:
+                self._trail(uid).add_status(int(ts), bool(online))
+            for _, uid, start, end in sessions:
+                self._trail(uid).sessions.append((int(start), int(end)))
+            self.since = lo
+        return len(statuses), len(sessions)
+
+    def add_status(self, user_id, ts, online):
+        with self._lock:
+            self._trail(user_id).add_status(int(ts), bool(online))
+            self._maybe_evict()
+
+    def add_session(self, user_id, start, end):
+        with self._lock:
+            self._trail(user_id).sessions.append((int(start), int(end)))
+            self._maybe_evict()
+
+    def _maybe_evict(self):
+        now = time.time()
+        if now - self._evicted_at < 60:
+            return
+        self._evicted_at = now
+        cutoff = now - self.horizon
+        for trail in self._users.values():
+            trail.evict(cutoff)
+        self.since = max(self.since, cutoff)
+
+    def covers(self, lo):
+        return lo >= self.since
+
+    def window(self, lo, hi, user_ids):
+        """
+        (statuses, sessions) для окна [lo, hi] или None, если окно старше буфера.
+
+        statuses — строки (user_id, ts, online), как Storage.statuses (переходы);
+        sessions — массивы (user_ids, starts, ends), как у ui.sessions_index.
+        """
+        with self._lock:
+            if not self.covers(lo):
+                return None
+
+            statuses, s_uid, s_start, s_end = [], [], [], []
+            for uid in user_ids:
+                trail = self._users.get(uid)
+                if trail is None:
+                    continue
+                statuses.extend((uid, ts, online) for ts, online in trail.statuses(lo, hi))
+
+                # сессии идут по времени закрытия — с конца до первой закончившейся раньше lo
+                for start, end in reversed(trail.sessions):
+                    if end < lo:
+                        break
+                    if start <= hi:
+                        s_uid.append(uid)
+                        s_start.append(start)
+                        s_end.append(end)
+
+        sessions = tuple(np.array(c, dtype=np.int64) for c in (s_uid, s_start, s_end))
+        return statuses, sessions
@@ -0,0 +1,174 @@
+import math
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+
+# Снимок текущих статусов: коллектор пишет, UI читает без запросов к базе.
+#
+# Файл фиксированного размера (обычно shared/status.snap), отображается
+# в память обоими процессами:
+#
+#   header  64 байта   magic, версия, capacity, seq, count, updated_at
+#   record  40 байт    user_id, online, changed_at, was_online, checked_at
+#
+# Обновление — seqlock: писатель делает seq нечётным, пишет запись,
+# делает seq чётным. Читатель копирует снимок и повторяет, если seq был
+# нечётным или изменился за время копирования. Писатель один (event loop
+# коллектора), читателей сколько угодно, блокировок нет.
+#
+# Время — float epoch; was_online = NaN, если Telegram его не сообщил.
+# Коллектор при старте создаёт файл заново (rename), читатель замечает
+# смену inode и переоткрывает его.
+
+MAGIC = b"VITMSNAP"
+LAYOUT = 1
+CAPACITY = 1024
+
+HEADER = struct.Struct("<8sIIQIId")  # magic, layout, capacity, seq, count, pad, updated_at
+HEADER_SIZE = 64
+SEQ_OFFSET = 16
+COUNT_OFFSET = 24
+UPDATED_OFFSET = 32
+RECORD = struct.Struct("<qB7xddd")
+
+RETRIES = 100
+
+Entry = namedtuple("Entry", "user_id online changed_at was_online checked_at")
+Snapshot = namedtuple("Snapshot", "seq updated_at entries")
+
+
+def _size(capacity):
+    return HEADER_SIZE + capacity * RECORD.size
+
+
+class SnapshotWriter:
+
+    def __init__(self, path, capacity=CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self._slots = {}  # user_id -> номер записи
+        self._state = {}  # user_id -> Entry
+        self._seq = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.truncate(_size(capacity))
+        self._file = open(tmp, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), _size(capacity))
+        HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT, capacity, 0, 0, 0, 0.0)
+        os.replace(tmp, path)
+
+    def update(self, user_id, status, ts, was_online=None):
+        """Записать статус после проверки в момент ts (datetime)."""
+        online = status == "online"
+        now = ts.timestamp()
+        prev = self._state.get(user_id)
+
+        if online:
+            changed_at = prev.changed_at if prev is not None and prev.online else now
+        elif was_online is not None:
+            changed_at = was_online.timestamp()
+        else:
+            changed_at = prev.changed_at if prev is not None and not prev.online else now
+
+        entry = Entry(
+            user_id, online, changed_at,
+            was_online.timestamp() if was_online is not None else math.nan, now
+        )
+        slot = self._slots.get(user_id)
+        if slot is None:
+            if len(self._slots) >= self.capacity:
+                raise RuntimeError(f"Snapshot is full ({self.capacity} users)")
+            slot = self._slots[user_id] = len(self._slots)
+
+        self._begin()
+        RECORD.pack_into(self._mm, HEADER_SIZE + slot * RECORD.size,
+                         user_id, online, entry.changed_at, entry.was_online, now)
+        struct.pack_into("<I", self._mm, COUNT_OFFSET, len(self._slots))
+        struct.pack_into("<d", self._mm, UPDATED_OFFSET, now)
+        self._end()
+        self._state[user_id] = entry
+
+    def _begin(self):
+        self._seq += 1
+        struct.pack_into("<Q", self._mm, SEQ_OFFSET, self._seq)
+
+    def _end(self):
+        self._seq += 1
+        struct.pack_into("<Q", self._mm, SEQ_OFFSET, self._seq)
+
+    def close(self):
+        # файл остаётся: по updated_at читатель увидит, что снимок устарел
+        self._mm.flush()
+        self._mm.close()
+        self._file.close()
+
+
+class SnapshotReader:
+
+    def __init__(self, path):
+        self.path = path
+        self._mm = None
+        self._inode = None
+        self._last = None
+
+    def _open(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._close()
+            return False
+        if self._mm is not None and st.st_ino == self._inode:
+            return True
+
+        self._close()
+        if st.st_size < HEADER_SIZE:
+            return False
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, layout, capacity = HEADER.unpack_from(mm, 0)[:3]
+        if magic != MAGIC or layout != LAYOUT or len(mm) < _size(capacity):
+            mm.close()
+            return False
+        self._mm, self._inode = mm, st.st_ino
+        return True
+
+    def _close(self):
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = self._inode = self._last = None
+
+    def read(self):
+        """Согласованный Snapshot или None, если коллектор ещё не создал файл."""
+        if not self._open():
+            return None
+        mm = self._mm
+
+        for attempt in range(RETRIES):
+            seq = struct.unpack_from("<Q", mm, SEQ_OFFSET)[0]
+            if self._last is not None and seq == self._last.seq:
+                return self._last
+            if seq % 2:
+                time.sleep(0 if attempt < 10 else 0.001)
+                continue
+
+            count = struct.unpack_from("<I", mm, COUNT_OFFSET)[0]
+            data = mm[:HEADER_SIZE + count * RECORD.size]
+            if struct.unpack_from("<Q", mm, SEQ_OFFSET)[0] != seq:
+                continue
+
+            updated_at = struct.unpack_from("<d", data, UPDATED_OFFSET)[0]
+            entries = [
+                Entry(uid, bool(online), changed_at, None if math.isnan(was) else was, checked_at)
+                for uid, online, changed_at, was, checked_at in RECORD.iter_unpack(data[HEADER_SIZE:])
+            ]
+            self._last = Snapshot(seq, updated_at, entries)
+            return self._last
+
+        return self._last
+
+    def close(self):
+        self._close()
@@ -0,0 +1,66 @@
+import threading
+
+from storage import open_storage
+
+
+class UserDirectory:
+    """
+    Кэш таблицы users с дешёвой проверкой изменений.
+
+    data_version хранилища меняется только если другое соединение что-то
+    закоммитило, а users_version (в SQLite — счётчик из триггеров init_db)
+    — только при изменении самой таблицы users. Полное чтение users
+    происходит лишь когда изменился счётчик.
+    """
+
+    def __init__(self, db_file, active_only=True):
+        self.db_file = db_file
+        self.active_only = active_only
+        self.by_id = {}
+        self.by_name = {}
+        self._store = None
+        self._data_version = None
+        self._users_version = None
+        self._lock = threading.Lock()
+
+    def _storage(self):
+        if self._store is None:
+            self._store = open_storage(self.db_file, readonly=True, backend="sqlite")
+        return self._store
+
+    def refresh(self):
+        with self._lock:
+            store = self._storage()
+
+            data_version = store.data_version()
+            if data_version is not None and data_version == self._data_version:
+                return False
+            self._data_version = data_version
+
+            users_version = store.users_version()
+            if users_version == self._users_version:
+                return False
+
+            rows = store.users(self.active_only)
+
+            self.by_id = dict(rows)
+            self.by_name = {name: uid for uid, name in rows}
+            self._users_version = users_version
+            return True
+
+    def ids(self):
+        return list(self.by_id)
+
+    def name(self, user_id, default=None):
+        if default is None:
+            default = f"User {user_id}"
+        return self.by_id.get(user_id, default)
+
+    def id_of(self, username):
+        return self.by_name.get(username)
+
+    def close(self):
+        with self._lock:
+            if self._store is not None:
+                self._store.close()
+                self._store = None
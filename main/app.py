@@ -1,8 +1,12 @@
 import asyncio
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from telethon import TelegramClient
 from telethon.errors import FloodWaitError
+from analytics.copresence import co_online, overlap_totals
+from analytics.correlation import correlation_matrix, rasterize
+from analytics.intervals import merge
 
 # === Настройки ===
 api_id = 29477438      # <-- вставь свой api_id из my.telegram.org
@@ -47,9 +51,14 @@ async def main():
         await asyncio.gather(*tasks)
 
     # === Анализ ===
-    df = pd.DataFrame()
+    # каждая онлайн-проба покрывает [t, t + CHECK_INTERVAL)
+    intervals = {}
     for user, records in status_history.items():
-        df[user] = pd.Series([int(s) for _, s in records])
+        online_ts = np.array([int(t.timestamp()) for t, s in records if s], dtype="int64")
+        intervals[user] = merge(online_ts, online_ts + CHECK_INTERVAL)
+
+    all_ts = [int(t.timestamp()) for records in status_history.values() for t, _ in records]
+    lo, hi = min(all_ts), max(all_ts) + CHECK_INTERVAL
 
     print("\n=== Статистика ===")
     for user in USERS:
@@ -58,14 +67,15 @@ async def main():
         print(f"{user}: онлайн {online_times}/{total} раз ({online_times / total * 100:.1f}%)")
 
     print("\n=== Корреляция онлайн-статусов ===")
-    print(df.corr())
+    corr_users, bits, n_bits = rasterize(intervals, lo, hi, CHECK_INTERVAL)
+    print(pd.DataFrame(correlation_matrix(bits, n_bits), index=corr_users, columns=corr_users))
 
     print("\n=== Совпадения во времени ===")
-    timestamps = [t for t, _ in status_history[USERS[0]]]
-    for i, t in enumerate(timestamps):
-        online_users = [u for u in USERS if status_history[u][i][1]]
-        if len(online_users) > 1:
-            print(f"{t.strftime('%H:%M:%S')} — одновременно онлайн: {', '.join(online_users)}")
+    overlaps = co_online(intervals, k=2)
+    for pair, total_seconds in overlap_totals(overlaps).items():
+        print(f"{', '.join(pair)} — вместе {total_seconds} сек")
+        for s, e in zip(*overlaps[pair]):
+            print(f"  {datetime.fromtimestamp(s).strftime('%H:%M:%S')} — {datetime.fromtimestamp(e).strftime('%H:%M:%S')}")
 
 
 if __name__ == "__main__":
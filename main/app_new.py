@@ -1,12 +1,12 @@
+import os
 import asyncio
-import sqlite3
-import pandas as pd
 from datetime import datetime, timezone
 import pytz
 from telethon import TelegramClient
 from telethon.errors import FloodWaitError
 from telethon.tl.types import UserStatusOffline, UserStatusOnline
 import signal
+from storage import open_storage
 
 # === Настройки ===
 api_id = 29477438
@@ -15,7 +15,7 @@ api_hash = "b35cd0b313143486e8ca98cbb275ee2f"
 CHECK_INTERVAL = 5
 
 DB_FILE = "online_statuses.db"
-LOCAL_TZ = pytz.timezone("Europe/Kiev")
+LOCAL_TZ = pytz.timezone(os.getenv("DISPLAY_TZ", "Europe/Kiev"))
 
 # === Цвета для консоли ===
 GREEN = "\033[92m"
@@ -26,43 +26,8 @@ RESET = "\033[0m"
 stop_event = asyncio.Event()
 active_sessions = {}  # user -> datetime
 
-# === Подключение к базе и создание таблиц ===
-conn = sqlite3.connect(DB_FILE)
-cur = conn.cursor()
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT UNIQUE,
-    name TEXT,
-    active INTEGER DEFAULT 1
-)
-""")
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS online_statuses (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    date TEXT,
-    status TEXT,
-    UNIQUE(user_id, date, status),
-    FOREIGN KEY(user_id) REFERENCES users(id)
-)
-""")
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS online_sessions (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    started_at TEXT,
-    ended_at TEXT,
-    duration INTEGER, -- секунды
-    UNIQUE(user_id, started_at),
-    FOREIGN KEY(user_id) REFERENCES users(id)
-);
-""")
-
-conn.commit()
+# === Хранилище (схема создаётся в collector.db.init_db) ===
+store = open_storage(DB_FILE, backend="sqlite")
 
 # === Функции ===
 def shutdown():
@@ -100,51 +65,25 @@ async def get_online_status(client, user):
         return "offline", datetime.now(timezone.utc)
 
 def get_active_user_ids():
-    conn = sqlite3.connect(DB_FILE)
-    # Выбираем только тех, у кого status или флаг активен
-    df_users = pd.read_sql_query(
-        "SELECT username FROM users WHERE active = 1",
-        conn
-    )
-    conn.close()
-    return df_users["username"].tolist()
+    # Выбираем только тех, у кого флаг активен
+    return [name for _, name in store.users(active_only=True)]
 
 def save_status(user, status, ts):
-    cur.execute("SELECT id FROM users WHERE username=?", (user,))
-    row = cur.fetchone()
-    if row:
-        user_id = row[0]
-    else:
-        cur.execute("INSERT INTO users(username) VALUES (?)", (user,))
-        user_id = cur.lastrowid
-        conn.commit()
+    user_id = store.user_id(user)
 
     # Если offline — сохраняем предыдущий online по last_seen
     now = datetime.now(timezone.utc)
     if status == "offline":
-        cur.execute("""
-            INSERT OR IGNORE INTO online_statuses(user_id, date, status) VALUES (?, ?, ?)
-        """, (user_id, ts.replace(microsecond=0).astimezone(timezone.utc).isoformat(), "online"))
+        store.record_status(user_id, "online", ts.timestamp())
 
     # Сохраняем текущий статус (online или offline)
-    cur.execute("""
-        INSERT OR IGNORE INTO online_statuses(user_id, date, status) VALUES (?, ?, ?)
-    """, (user_id, now.replace(microsecond=0).astimezone(timezone.utc).isoformat(), status))
-    conn.commit()
+    store.record_status(user_id, status, now.timestamp())
 
 def save_uptime(user, status, ts):
     """
         Сохраняет сессии online/offline для расчёта uptime.
         """
-    cur.execute("SELECT id FROM users WHERE username=?", (user,))
-    row = cur.fetchone()
-
-    if row:
-        user_id = row[0]
-    else:
-        cur.execute("INSERT INTO users(username) VALUES (?)", (user,))
-        user_id = cur.lastrowid
-        conn.commit()
+    user_id = store.user_id(user)
 
     # === ONLINE ===
     if status == "online":
@@ -160,17 +99,7 @@ def save_uptime(user, status, ts):
         if duration <= 0:
             return
 
-        cur.execute("""
-            INSERT OR IGNORE INTO online_sessions
-            (user_id, started_at, ended_at, duration)
-            VALUES (?, ?, ?, ?)
-        """, (
-            user_id,
-            started_at.replace(microsecond=0).astimezone(timezone.utc).isoformat(),
-            ts.replace(microsecond=0).astimezone(timezone.utc).isoformat(),
-            duration
-        ))
-        conn.commit()
+        store.record_session(user_id, started_at.timestamp(), ts.timestamp())
 
 def finalize_sessions():
     """
@@ -225,7 +154,7 @@ async def main():
 
     # финализируем активные сессии
     finalize_sessions()
-    conn.close()
+    store.close()
     print("✅ Мониторинг корректно остановлен")
 
 
@@ -1,4 +1,4 @@
-import sqlite3
+import os
 import pandas as pd
 import pytz
 import numpy as np
@@ -8,9 +8,11 @@ import matplotlib.pyplot as plt
 from matplotlib.patches import Rectangle
 from datetime import datetime, timedelta
 import gradio as gr
+from collector.users import UserDirectory
+from storage import open_storage
 
-DB_FILE = "online_statuses.db"
-LOCAL_TZ = pytz.timezone("Europe/Kiev")
+DB_FILE = os.getenv("DB_FILE", "online_statuses.db")
+LOCAL_TZ = pytz.timezone(os.getenv("DISPLAY_TZ", "Europe/Kiev"))
 
 # --------------------------------------------------
 # Utils
@@ -88,61 +90,30 @@ def calc_range(preset: str):
 # --------------------------------------------------
 # Data
 # --------------------------------------------------
-def load_users():
-    conn = sqlite3.connect(DB_FILE)
-    df = pd.read_sql_query("SELECT id, username FROM users WHERE active = 1", conn)
-    conn.close()
-    return dict(zip(df.id, df.username))
-
-USER_MAP = load_users()
+USERS = UserDirectory(DB_FILE)
+STORE = open_storage(DB_FILE, readonly=True)
 
 def load_statuses(start_dt, end_dt, active_user_ids):
-    conn = sqlite3.connect(DB_FILE)
-
-    ids_tuple = tuple(active_user_ids)
-
-    df = pd.read_sql_query(
-        f"SELECT user_id, date, status FROM online_statuses WHERE user_id IN {ids_tuple}",
-        conn
-    )
-    conn.close()
+    rows = STORE.statuses(start_dt.timestamp(), end_dt.timestamp(), active_user_ids)
+    df = pd.DataFrame(rows, columns=["user_id", "ts", "status_num"])
 
-    df["date"] = pd.to_datetime(df["date"], utc=True).dt.tz_convert(LOCAL_TZ)
-    df["status_num"] = df["status"].map({"online": 1, "offline": 0})
-    return df[(df.date >= start_dt) & (df.date <= end_dt)]
+    df["date"] = pd.to_datetime(df["ts"], unit="s", utc=True).dt.tz_convert(LOCAL_TZ)
+    df["status_num"] = df["status_num"].astype(int)
+    return df
 
 def load_sessions(start_dt, end_dt, active_user_ids):
-    conn = sqlite3.connect(DB_FILE)
-
-    ids_tuple = tuple(active_user_ids)
-
-    df = pd.read_sql_query(
-        f"""
-        SELECT user_id, started_at, ended_at, duration
-        FROM online_sessions
-        WHERE user_id IN {ids_tuple}
-        """,
-        conn
-    )
-
-    conn.close()
+    rows = STORE.sessions(start_dt.timestamp(), end_dt.timestamp(), active_user_ids)
+    df = pd.DataFrame(rows, columns=["id", "user_id", "started_at", "ended_at"])
 
     if df.empty:
         return df
 
-    # даты → datetime UTC → LOCAL_TZ
-    df["started_at"] = pd.to_datetime(df["started_at"], utc=True).dt.tz_convert(LOCAL_TZ)
-    df["ended_at"] = pd.to_datetime(df["ended_at"], utc=True).dt.tz_convert(LOCAL_TZ)
-
-    # оставляем только сессии, пересекающие период
-    df = df[
-        (df["ended_at"] >= start_dt) &
-        (df["started_at"] <= end_dt)
-    ]
-
+    # epoch → datetime UTC → LOCAL_TZ
+    df["duration"] = df["ended_at"] - df["started_at"]
+    df["started_at"] = pd.to_datetime(df["started_at"], unit="s", utc=True).dt.tz_convert(LOCAL_TZ)
+    df["ended_at"] = pd.to_datetime(df["ended_at"], unit="s", utc=True).dt.tz_convert(LOCAL_TZ)
     return df
 
-
 # --------------------------------------------------
 # Plot
 # --------------------------------------------------
@@ -153,11 +124,13 @@ def build_heatmap(start_time, end_time, step_sec):
         now_local()
     )
 
-    df = load_statuses(start_dt, end_dt, USER_MAP.keys())
+    USERS.refresh()
+
+    df = load_statuses(start_dt, end_dt, USERS.ids())
     if df.empty:
         return None
 
-    df_sessions = load_sessions(start_dt, end_dt, USER_MAP.keys())
+    df_sessions = load_sessions(start_dt, end_dt, USERS.ids())
 
     time_index = pd.date_range(
         start=start_dt,
@@ -175,7 +148,7 @@ def build_heatmap(start_time, end_time, step_sec):
             .drop_duplicates(subset=["date"], keep="last")
             .set_index("date")
         )
-        label = USER_MAP.get(uid, f"User {uid}")
+        label = USERS.name(uid)
         timeline[label] = events.status_num.reindex(time_index, method="ffill")
 
     fig, ax = plt.subplots(figsize=(15, len(timeline.columns)*0.5 + 2))
@@ -185,7 +158,7 @@ def build_heatmap(start_time, end_time, step_sec):
     user_ypos = {user: i for i, user in enumerate(timeline.columns)}
 
     for _, row in df_sessions.iterrows():
-        user_label = USER_MAP.get(row["user_id"])
+        user_label = USERS.by_id.get(row["user_id"])
         if user_label not in user_ypos:
             continue
 
@@ -217,7 +190,7 @@ def build_heatmap(start_time, end_time, step_sec):
     user_labels = []
 
     for user_label in timeline.columns:
-        user_id = {v: k for k, v in USER_MAP.items()}.get(user_label)
+        user_id = USERS.id_of(user_label)
 
         if df_sessions.empty or user_id not in df_sessions["user_id"].values:
             label_text = f"{user_label}"
@@ -340,4 +313,5 @@ with gr.Blocks(title="Telegram Online Timeline") as demo:
         outputs=plot
     )
 
-demo.launch()
+if __name__ == "__main__":
+    demo.launch()
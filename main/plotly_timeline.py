@@ -1,13 +1,16 @@
-import sqlite3
-import pandas as pd
+import os
 import pytz
 import numpy as np
 from datetime import datetime, timedelta
 import gradio as gr
 import plotly.graph_objects as go
+from collector.users import UserDirectory
+from storage import open_storage
+from ui.data import sessions_frame, statuses_frame
+from ui.plotly_view import bucket_step, timeline_figure
 
-DB_FILE = "online_statuses.db"
-LOCAL_TZ = pytz.timezone("Europe/Kiev")
+DB_FILE = os.getenv("DB_FILE", "online_statuses.db")
+LOCAL_TZ = pytz.timezone(os.getenv("DISPLAY_TZ", "Europe/Kiev"))
 
 # --------------------------------------------------
 # Utils
@@ -85,122 +88,34 @@ def calc_range(preset: str):
 # --------------------------------------------------
 # Data
 # --------------------------------------------------
-def load_users():
-    conn = sqlite3.connect(DB_FILE)
-    df = pd.read_sql_query("SELECT id, username FROM users WHERE active = 1", conn)
-    conn.close()
-    return dict(zip(df.id, df.username))
+USERS = UserDirectory(DB_FILE)
+STORE = open_storage(DB_FILE, readonly=True)
 
-USER_MAP = load_users()
-
-def load_statuses(start_dt, end_dt, active_user_ids):
-    conn = sqlite3.connect(DB_FILE)
-
-    ids_tuple = tuple(active_user_ids)
-
-    df = pd.read_sql_query(
-        f"SELECT user_id, date, status FROM online_statuses WHERE user_id IN {ids_tuple}",
-        conn
-    )
-    conn.close()
-
-    df["date"] = pd.to_datetime(df["date"], utc=True).dt.tz_convert(LOCAL_TZ)
-    df["status_num"] = df["status"].map({"online": 1, "offline": 0})
-    return df[(df.date >= start_dt) & (df.date <= end_dt)]
-
-def load_sessions(start_dt, end_dt, active_user_ids):
-    conn = sqlite3.connect(DB_FILE)
-
-    ids_tuple = tuple(active_user_ids)
-
-    df = pd.read_sql_query(
-        f"""
-        SELECT user_id, started_at, ended_at, duration
-        FROM online_sessions
-        WHERE user_id IN {ids_tuple}
-        """,
-        conn
-    )
-
-    conn.close()
-
-    if df.empty:
-        return df
-
-    # даты → datetime UTC → LOCAL_TZ
-    df["started_at"] = pd.to_datetime(df["started_at"], utc=True).dt.tz_convert(LOCAL_TZ)
-    df["ended_at"] = pd.to_datetime(df["ended_at"], utc=True).dt.tz_convert(LOCAL_TZ)
-
-    # оставляем только сессии, пересекающие период
-    df = df[
-        (df["ended_at"] >= start_dt) &
-        (df["started_at"] <= end_dt)
-    ]
-
-    return df
+def load_window(lo, hi, active_user_ids):
+    df = statuses_frame(STORE.statuses(lo, hi, active_user_ids))
+    rows = np.array([r[1:] for r in STORE.sessions(lo, hi, active_user_ids)], dtype=np.int64).reshape(-1, 3)
+    return df, sessions_frame(rows[:, 0], rows[:, 1], rows[:, 2])
 
 # --------------------------------------------------
 # Plotly heatmap timeline
 # --------------------------------------------------
+# фигура — как в интерактивном режиме ui.app (ui.plotly_view): один
+# Scattergl на пользователя, heatmap компактной int8-матрицей
 def build_plotly_timeline(start_time, end_time, step_sec):
     start_dt = LOCAL_TZ.localize(datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S"))
     end_dt = min(LOCAL_TZ.localize(datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")), now_local())
+    lo, hi = int(start_dt.timestamp()), int(end_dt.timestamp())
 
-    df = load_statuses(start_dt, end_dt, USER_MAP.keys())
+    USERS.refresh()
+
+    df, df_sessions = load_window(lo, hi, USERS.ids())
     if df.empty:
         return go.Figure()
 
-    df_sessions = load_sessions(start_dt, end_dt, USER_MAP.keys())
-
-    time_index = pd.date_range(start=start_dt, end=end_dt, freq=f"{int(step_sec)}s", tz=LOCAL_TZ)
-    timeline = pd.DataFrame(index=time_index)
-
-    for uid in df.user_id.unique():
-        events = df[df.user_id == uid].sort_values("date").drop_duplicates(subset=["date"], keep="last").set_index("date")
-        label = USER_MAP.get(uid, f"User {uid}")
-        timeline[label] = events.status_num.reindex(time_index, method="ffill")
-
-    fig = go.Figure()
-
-    # Heatmap
-    fig.add_trace(go.Heatmap(
-        z=timeline.T.values,
-        x=timeline.index,
-        y=[USER_MAP.get(uid, f"User {uid}") for uid in df.user_id.unique()],
-        colorscale="Greens",
-        colorbar=dict(title="Online (1)/Offline (0)"),
-        hoverongaps=False
-    ))
-
-    # Overlay uptime from sessions
-    for _, row in df_sessions.iterrows():
-        user_label = USER_MAP.get(row.user_id)
-        if user_label not in timeline.columns:
-            continue
-        # clip to period
-        s = max(row.started_at, start_dt)
-        e = min(row.ended_at, end_dt)
-        if e <= s:
-            continue
-        fig.add_trace(go.Scatter(
-            x=[s, e],
-            y=[user_label, user_label],
-            mode="lines",
-            line=dict(color="lime", width=6),
-            hoverinfo="skip",
-            showlegend=False
-        ))
-
-    fig.update_layout(
-        yaxis=dict(title="User"),
-        xaxis=dict(title="Time"),
-        title=f"Telegram Online Timeline\n{start_dt.strftime('%Y-%m-%d %H:%M:%S')} — {end_dt.strftime('%Y-%m-%d %H:%M:%S')}",
-        height=400 + 40*len(timeline.columns),
-        template="plotly_white"
+    return timeline_figure(
+        df, df_sessions, {}, lo, hi, bucket_step(lo, hi, step_sec), dict(USERS.by_id), LOCAL_TZ
     )
 
-    return fig
-
 # --------------------------------------------------
 # Gradio UI
 # --------------------------------------------------
@@ -254,4 +169,5 @@ with gr.Blocks(title="Telegram Online Timeline") as demo:
         outputs=plot
     )
 
-demo.launch()
+if __name__ == "__main__":
+    demo.launch()
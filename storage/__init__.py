@@ -0,0 +1,21 @@
+import os
+
+from storage.base import Storage
+
+# Выбор реализации: STORAGE_BACKEND=sqlite (по умолчанию) | duckdb
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+
+
+def open_storage(db_file, readonly=False, backend=None):
+    backend = backend or STORAGE_BACKEND
+    if backend == "sqlite":
+        from storage.sqlite import SQLiteStorage
+        return SQLiteStorage(db_file, readonly)
+    if backend == "duckdb":
+        # duckdb — необязательная зависимость
+        from storage.columnar import DuckDBStorage
+        return DuckDBStorage(db_file, readonly)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+__all__ = ["Storage", "open_storage"]
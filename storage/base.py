@@ -0,0 +1,102 @@
+import abc
+
+
+class Storage(abc.ABC):
+    """
+    Хранилище онлайн-статусов.
+
+    Время на входе и выходе — int64 epoch (UTC), статус — 'online' /
+    'offline'. Реализации: storage.sqlite.SQLiteStorage (основная) и
+    storage.columnar.DuckDBStorage (агрегации в DuckDB).
+
+    Побочные таблицы модулей analytics (activity_profiles, anomalies)
+    живут в той же SQLite-базе и работают через `conn`.
+    """
+
+    conn = None
+
+    def close(self):
+        pass
+
+    # --------------------------------------------------
+    # Версии — дешёвые проверки «что-то изменилось»
+    # --------------------------------------------------
+    def data_version(self):
+        """Меняется после каждого коммита другого соединения; None — неизвестно."""
+        return None
+
+    @abc.abstractmethod
+    def users_version(self):
+        """Меняется только при изменении таблицы users."""
+
+    def sessions_version(self):
+        """Меняется при правке или удалении сессий (не при добавлении); None — неизвестно."""
+        return None
+
+    # --------------------------------------------------
+    # Users
+    # --------------------------------------------------
+    @abc.abstractmethod
+    def users(self, active_only=True):
+        """[(id, username)] по id."""
+
+    @abc.abstractmethod
+    def user_id(self, username, create=True):
+        ...
+
+    # --------------------------------------------------
+    # Запись
+    # --------------------------------------------------
+    @abc.abstractmethod
+    def record_status(self, user_id, status, ts):
+        ...
+
+    @abc.abstractmethod
+    def record_session(self, user_id, start, end):
+        """True, если сессия добавлена (повтор по (user_id, start) игнорируется)."""
+
+    # --------------------------------------------------
+    # Чтение
+    # --------------------------------------------------
+    @abc.abstractmethod
+    def statuses(self, lo, hi, user_ids=None):
+        """[(user_id, ts, online)] за [lo, hi] по времени."""
+
+    @abc.abstractmethod
+    def sessions(self, lo, hi, user_ids=None):
+        """[(id, user_id, start, end)] сессий, пересекающих [lo, hi]."""
+
+    @abc.abstractmethod
+    def sessions_since(self, rowid):
+        """[(id, user_id, start, end)] с id > rowid, по id — для хвоста."""
+
+    @abc.abstractmethod
+    def session_count(self):
+        ...
+
+    @abc.abstractmethod
+    def transitions_page(self, lo, hi, user_ids=None, after=None, limit=1000):
+        """
+        Смены статуса [(id, user_id, ts, status, key)] по (key, id).
+        key — время строки в том виде, как оно хранится; after — (key, id)
+        последней строки прошлой страницы.
+        """
+
+    @abc.abstractmethod
+    def sessions_page(self, lo, hi, user_ids=None, after=None, limit=1000):
+        """
+        Сессии, обрезанные по [lo, hi]: [(id, user_id, start, end, key)]
+        по (key, id). key — исходное начало сессии в том виде, как оно
+        хранится; after — (key, id).
+        """
+
+    @abc.abstractmethod
+    def uptime(self, lo, hi, user_ids=None):
+        """[(user_id, sessions, online_seconds)] за [lo, hi]."""
+
+    # --------------------------------------------------
+    # Побочные таблицы analytics
+    # --------------------------------------------------
+    @abc.abstractmethod
+    def activity_profile(self, user_id, variant="total", now=None):
+        """(seconds, share) профиля analytics.profiles или None, если не накоплен."""
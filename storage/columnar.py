@@ -0,0 +1,140 @@
+import os
+import threading
+
+import duckdb
+import pandas as pd
+
+from storage.sqlite import SQLiteStorage
+
+# SQLite остаётся источником истины: коллектор пишет туда, как раньше.
+# Колоночная копия statuses/sessions лежит в DuckDB и догоняет SQLite
+# по водяному знаку rowid перед каждым чтением (если data_version
+# изменился). Диапазонные выборки и агрегации идут в DuckDB, постраничные
+# и хвостовые запросы — в SQLite.
+#
+# Строки, переписанные на месте (python -m collector.rebuild), по rowid
+# не видны — после rebuild файл DuckDB нужно удалить.
+#
+# Файл DuckDB может открыть только один процесс, поэтому его открывает
+# один читатель — процесс UI (ui.store). Коллектор пишет в SQLiteStorage,
+# воркеры ui.render_pool получают строки окна от UI. Если файл всё же
+# занят или не открывается (узел только для чтения), процесс читает из
+# SQLite, как SQLiteStorage, — полную копию в памяти не строим.
+
+DUCKDB_FILE = os.getenv("DUCKDB_FILE", "shared/vitm.duckdb")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS statuses (id BIGINT, user_id BIGINT, ts BIGINT, online BOOLEAN);
+CREATE TABLE IF NOT EXISTS sessions (id BIGINT, user_id BIGINT, start_ts BIGINT, end_ts BIGINT);
+CREATE TABLE IF NOT EXISTS watermarks (name VARCHAR PRIMARY KEY, rowid BIGINT);
+"""
+
+SYNC = {
+    "statuses": (
+        "SELECT id, user_id, CAST(strftime('%s', date) AS INTEGER), status = 'online' "
+        "FROM online_statuses WHERE id > ? ORDER BY id LIMIT ?",
+        ["id", "user_id", "ts", "online"],
+    ),
+    "sessions": (
+        "SELECT id, user_id, CAST(strftime('%s', started_at) AS INTEGER), CAST(strftime('%s', ended_at) AS INTEGER) "
+        "FROM online_sessions WHERE id > ? ORDER BY id LIMIT ?",
+        ["id", "user_id", "start_ts", "end_ts"],
+    ),
+}
+BATCH = 200_000
+
+
+def _in(user_ids, column="user_id"):
+    if not user_ids:
+        return "", []
+    user_ids = list(user_ids)
+    return f" AND {column} IN ({','.join('?' * len(user_ids))})", user_ids
+
+
+class DuckDBStorage(SQLiteStorage):
+
+    def __init__(self, db_file, readonly=False, duckdb_file=DUCKDB_FILE):
+        super().__init__(db_file, readonly)
+        self._duck_lock = threading.Lock()
+        self._synced_version = None
+        try:
+            self.duck = duckdb.connect(duckdb_file)
+            self.duck.execute(SCHEMA)
+        except duckdb.Error as e:
+            # занят другим процессом (IOException) или каталог только для чтения
+            print(f"⚠️ {duckdb_file} is unavailable ({e}), reading from SQLite")
+            self.duck = None
+
+    def close(self):
+        if self.duck is not None:
+            with self._duck_lock:
+                self.duck.close()
+        super().close()
+
+    def sync(self):
+        """Догнать SQLite. Возвращает число перенесённых строк."""
+        if self.duck is None:
+            return 0
+        version = self.data_version()
+        with self._duck_lock:
+            if version == self._synced_version:
+                return 0
+
+            total = 0
+            for name, (sql, columns) in SYNC.items():
+                row = self.duck.execute("SELECT rowid FROM watermarks WHERE name = ?", [name]).fetchone()
+                after = row[0] if row else 0
+                while True:
+                    rows = self._all(sql, (after, BATCH))
+                    if not rows:
+                        break
+                    self.duck.register("batch", pd.DataFrame(rows, columns=columns))
+                    self.duck.execute(f"INSERT INTO {name} SELECT * FROM batch")
+                    self.duck.unregister("batch")
+                    after = rows[-1][0]
+                    total += len(rows)
+                self.duck.execute(
+                    "INSERT OR REPLACE INTO watermarks VALUES (?, ?)", [name, after]
+                )
+
+            self._synced_version = version
+            return total
+
+    def _duck_all(self, sql, params):
+        self.sync()
+        with self._duck_lock:
+            return self.duck.execute(sql, params).fetchall()
+
+    # --------------------------------------------------
+    # Чтение через DuckDB
+    # --------------------------------------------------
+    def statuses(self, lo, hi, user_ids=None):
+        if self.duck is None:
+            return super().statuses(lo, hi, user_ids)
+        users_sql, users_params = _in(user_ids)
+        return self._duck_all(f"""
+            SELECT user_id, ts, online FROM statuses
+            WHERE ts >= ? AND ts <= ?{users_sql}
+            ORDER BY ts, id
+        """, [int(lo), int(hi), *users_params])
+
+    def sessions(self, lo, hi, user_ids=None):
+        if self.duck is None:
+            return super().sessions(lo, hi, user_ids)
+        users_sql, users_params = _in(user_ids)
+        return self._duck_all(f"""
+            SELECT id, user_id, start_ts, end_ts FROM sessions
+            WHERE end_ts >= ? AND start_ts <= ?{users_sql}
+        """, [int(lo), int(hi), *users_params])
+
+    def uptime(self, lo, hi, user_ids=None):
+        if self.duck is None:
+            return super().uptime(lo, hi, user_ids)
+        users_sql, users_params = _in(user_ids)
+        return self._duck_all(f"""
+            SELECT user_id, COUNT(*), SUM(LEAST(end_ts, ?) - GREATEST(start_ts, ?))
+            FROM sessions
+            WHERE end_ts >= ? AND start_ts <= ?{users_sql}
+            GROUP BY user_id
+            ORDER BY user_id
+        """, [int(hi), int(lo), int(lo), int(hi), *users_params])
@@ -0,0 +1,212 @@
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from collector.db import connect, connect_readonly, init_db
+from storage.base import Storage
+
+# В базе время хранится ISO-строками UTC без микросекунд — сравнение
+# строк совпадает с сравнением времени и идёт по индексам. В epoch
+# переводит сам SQLite: strftime('%s') понимает смещение +00:00.
+EPOCH = "CAST(strftime('%s', {}) AS INTEGER)"
+
+
+def iso(ts):
+    return datetime.fromtimestamp(int(ts), timezone.utc).isoformat()
+
+
+def _in(user_ids, column="user_id"):
+    if not user_ids:
+        return "", []
+    user_ids = list(user_ids)
+    return f" AND {column} IN ({','.join('?' * len(user_ids))})", user_ids
+
+
+class SQLiteStorage(Storage):
+
+    def __init__(self, db_file, readonly=False):
+        self.db_file = db_file
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        if readonly:
+            # один объект на процесс UI — им пользуются потоки gradio
+            self.conn = connect_readonly(db_file, check_same_thread=False)
+        else:
+            self.conn = connect(db_file)
+            init_db(self.conn)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _all(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _one(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    # --------------------------------------------------
+    # Версии
+    # --------------------------------------------------
+    def data_version(self):
+        return self._one("PRAGMA data_version")[0]
+
+    def users_version(self):
+        try:
+            row = self._one("SELECT version FROM users_version WHERE id = 1")
+            return ("v", row[0] if row else 0)
+        except sqlite3.OperationalError:
+            # старая база без триггеров — сравниваем по отпечатку таблицы
+            return ("fp",) + tuple(self._one("SELECT COUNT(*), MAX(id), TOTAL(active) FROM users"))
+
+    def sessions_version(self):
+        try:
+            row = self._one("SELECT version FROM sessions_version WHERE id = 1")
+            return row[0] if row else 0
+        except sqlite3.OperationalError:
+            # старая база без триггеров
+            return None
+
+    # --------------------------------------------------
+    # Users
+    # --------------------------------------------------
+    def users(self, active_only=True):
+        sql = "SELECT id, username FROM users"
+        if active_only:
+            sql += " WHERE active = 1"
+        return self._all(sql + " ORDER BY id")
+
+    def user_id(self, username, create=True):
+        with self._lock:
+            row = self.conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+            if row or not create:
+                return row[0] if row else None
+            cur = self.conn.execute("INSERT INTO users(username) VALUES (?)", (username,))
+            self.conn.commit()
+            return cur.lastrowid
+
+    # --------------------------------------------------
+    # Запись
+    # --------------------------------------------------
+    def record_status(self, user_id, status, ts):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO online_statuses(user_id, date, status) VALUES (?, ?, ?)",
+                (user_id, iso(ts), status)
+            )
+            self.conn.commit()
+
+    def record_session(self, user_id, start, end):
+        with self._lock:
+            cur = self.conn.execute(
+                """
+                INSERT OR IGNORE INTO online_sessions(user_id, started_at, ended_at, duration)
+                VALUES (?, ?, ?, ?)
+                """,
+                (user_id, iso(start), iso(end), int(end - start))
+            )
+            self.conn.commit()
+            return cur.rowcount > 0
+
+    # --------------------------------------------------
+    # Чтение
+    # --------------------------------------------------
+    def statuses(self, lo, hi, user_ids=None):
+        users_sql, users_params = _in(user_ids)
+        return self._all(f"""
+            SELECT user_id, {EPOCH.format("date")}, status = 'online'
+            FROM online_statuses
+            WHERE date >= ? AND date <= ?{users_sql}
+        """, [iso(lo), iso(hi), *users_params])
+
+    def sessions(self, lo, hi, user_ids=None):
+        users_sql, users_params = _in(user_ids)
+        return self._all(f"""
+            SELECT id, user_id, {EPOCH.format("started_at")}, {EPOCH.format("ended_at")}
+            FROM online_sessions
+            WHERE ended_at >= ? AND started_at <= ?{users_sql}
+        """, [iso(lo), iso(hi), *users_params])
+
+    def sessions_since(self, rowid):
+        return self._all(f"""
+            SELECT id, user_id, {EPOCH.format("started_at")}, {EPOCH.format("ended_at")}
+            FROM online_sessions WHERE id > ? ORDER BY id
+        """, (rowid,))
+
+    def session_count(self):
+        return self._one("SELECT COUNT(*) FROM online_sessions")[0]
+
+    def transitions_page(self, lo, hi, user_ids=None, after=None, limit=1000):
+        users_sql, users_params = _in(user_ids, "o.user_id")
+
+        # ключ курсора — date как хранится: у старых строк есть микросекунды,
+        # и сравнение с обрезанным iso(ts) вернуло бы последнюю строку снова
+        page_sql, page_params = "", []
+        if after:
+            date, row_id = after
+            page_sql = " AND (o.date > ? OR (o.date = ? AND o.id > ?))"
+            page_params = [date, date, row_id]
+
+        # переход — строка, статус которой отличается от предыдущей строки
+        # того же пользователя, в том числе до lo. Предыдущая ищется по
+        # UNIQUE(user_id, date, status) для каждой строки страницы, а сама
+        # страница читается по индексу online_statuses_date с курсора —
+        # страница стоит O(limit), а не O(строк в диапазоне)
+        return self._all(f"""
+            SELECT o.id, o.user_id, {EPOCH.format("o.date")}, o.status, o.date
+            FROM online_statuses o
+            WHERE o.date >= ? AND o.date <= ?{users_sql}{page_sql}
+              AND o.status IS NOT (
+                  SELECT p.status FROM online_statuses p
+                  WHERE p.user_id = o.user_id
+                    AND p.date <= o.date AND NOT (p.date = o.date AND p.id >= o.id)
+                  ORDER BY p.date DESC, p.id DESC
+                  LIMIT 1
+              )
+            ORDER BY o.date, o.id
+            LIMIT ?
+        """, [iso(lo), iso(hi), *users_params, *page_params, limit])
+
+    def sessions_page(self, lo, hi, user_ids=None, after=None, limit=1000):
+        users_sql, users_params = _in(user_ids, "s.user_id")
+
+        # ключ курсора — started_at как хранится, см. transitions_page
+        page_sql, page_params = "", []
+        if after:
+            started_at, row_id = after
+            page_sql = " AND (s.started_at > ? OR (s.started_at = ? AND s.id > ?))"
+            page_params = [started_at, started_at, row_id]
+
+        # сессии обрезаются по границам периода
+        return self._all(f"""
+            SELECT s.id, s.user_id,
+                   MAX({EPOCH.format("s.started_at")}, ?),
+                   MIN({EPOCH.format("s.ended_at")}, ?),
+                   s.started_at
+            FROM online_sessions s
+            WHERE s.ended_at >= ? AND s.started_at <= ?{users_sql}{page_sql}
+            ORDER BY s.started_at, s.id
+            LIMIT ?
+        """, [int(lo), int(hi), iso(lo), iso(hi), *users_params, *page_params, limit])
+
+    def uptime(self, lo, hi, user_ids=None):
+        users_sql, users_params = _in(user_ids)
+        return self._all(f"""
+            SELECT user_id,
+                   COUNT(*),
+                   SUM(MIN({EPOCH.format("ended_at")}, ?) - MAX({EPOCH.format("started_at")}, ?))
+            FROM online_sessions
+            WHERE ended_at >= ? AND started_at <= ?{users_sql}
+            GROUP BY user_id
+            ORDER BY user_id
+        """, [int(hi), int(lo), iso(lo), iso(hi), *users_params])
+
+    # --------------------------------------------------
+    # Побочные таблицы analytics
+    # --------------------------------------------------
+    def activity_profile(self, user_id, variant="total", now=None):
+        from analytics import profiles
+        with self._lock:
+            return profiles.load_profile(self.conn, user_id, variant, now)
@@ -0,0 +1,105 @@
+import base64
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from collector.db import connect, init_db
+from storage.sqlite import SQLiteStorage
+from ui import api, store
+
+# Старые базы хранят время с микросекундами ("2026-10-18T10:00:00.123456+00:00"),
+# новые — без. Курсор должен проходить обе без повторов и пропусков.
+
+T0 = datetime(2026, 10, 18, tzinfo=timezone.utc)
+
+
+def _stamp(dt, legacy):
+    return dt.isoformat() if legacy else dt.replace(microsecond=0).isoformat()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    db_file = str(tmp_path / "legacy.db")
+    conn = connect(db_file)
+    init_db(conn)
+    rng = random.Random(1)
+
+    for uid in (1, 2, 3):
+        conn.execute("INSERT INTO users (id, username) VALUES (?, ?)", (uid, f"@u{uid}"))
+        t, online = T0, False
+        for i in range(40):
+            t += timedelta(seconds=rng.randint(5, 300), microseconds=rng.randint(1, 999999))
+            online = not online if rng.random() < 0.7 else online
+            conn.execute(
+                "INSERT INTO online_statuses (user_id, date, status) VALUES (?, ?, ?)",
+                (uid, _stamp(t, i % 2 == 0), "online" if online else "offline"),
+            )
+            if online:
+                end = t + timedelta(seconds=rng.randint(1, 120))
+                conn.execute(
+                    "INSERT OR IGNORE INTO online_sessions (user_id, started_at, ended_at, duration) VALUES (?, ?, ?, ?)",
+                    (uid, _stamp(t, i % 2 == 0), _stamp(end, True), int((end - t).total_seconds())),
+                )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(store, "_store", SQLiteStorage(db_file, readonly=True))
+    app = FastAPI()
+    app.include_router(api.router)
+    return TestClient(app)
+
+
+def _walk(client, path, limit):
+    params = {"start": "2026-10-17T00:00:00+00:00", "end": "2026-10-20T00:00:00+00:00", "limit": limit}
+    ids = []
+    for _ in range(1000):
+        page = client.get(path, params=params).json()
+        ids += [item["id"] for item in page["items"]]
+        if not page["next_cursor"]:
+            return ids
+        params["cursor"] = page["next_cursor"]
+    raise AssertionError(f"{path} did not finish paging: {ids[-10:]}")
+
+
+@pytest.mark.parametrize("path", ["/api/sessions", "/api/transitions"])
+@pytest.mark.parametrize("limit", [1, 7, 50])
+def test_pages_cover_legacy_rows_once(client, path, limit):
+    everything = _walk(client, path, 10000)
+    assert everything
+
+    ids = _walk(client, path, limit)
+    assert len(ids) == len(set(ids))
+    assert ids == everything
+
+
+def _transitions(client, start):
+    params = {"start": start, "end": "2026-10-20T00:00:00+00:00", "limit": 10000}
+    return {item["id"] for item in client.get("/api/transitions", params=params).json()["items"]}
+
+
+def test_transitions_look_before_the_range(client):
+    # переход — смена статуса относительно предыдущей строки пользователя,
+    # даже если она раньше начала диапазона
+    conn = store._store.conn
+    rows = conn.execute("SELECT id, user_id, date, status FROM online_statuses ORDER BY date, id").fetchall()
+    last, expected = {}, []
+    for row_id, uid, date, status in rows:
+        if last.get(uid) != status:
+            expected.append((row_id, date))
+        last[uid] = status
+
+    assert _transitions(client, "2026-10-17T00:00:00+00:00") == {i for i, _ in expected}
+
+    middle = rows[len(rows) // 2][2]
+    assert _transitions(client, middle) == {i for i, date in expected if date >= middle}
+
+
+@pytest.mark.parametrize("raw", [b"5", b'"x"', b"[1]", b'["2026-10-18", "1"]', b"{}", b"not json"])
+def test_malformed_cursor_is_400(client, raw):
+    cursor = base64.urlsafe_b64encode(raw).decode()
+    params = {"start": "2026-10-17T00:00:00+00:00", "end": "2026-10-20T00:00:00+00:00", "cursor": cursor}
+    for path in ("/api/sessions", "/api/transitions"):
+        assert client.get(path, params=params).status_code == 400
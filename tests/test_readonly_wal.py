@@ -0,0 +1,98 @@
+import os
+import pickle
+import shutil
+import tempfile
+
+import pytest
+
+from collector import db
+from collector.db import connect, connect_readonly, init_db
+
+# Read-only нода: процесс UI читает базу коллектора (WAL), но создавать
+# файлы в её каталоге не может. Под root права на запись не проверяются,
+# поэтому читатель работает в дочернем процессе от nobody.
+
+NOBODY = 65534
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+
+
+@pytest.fixture
+def db_dir():
+    # не tmp_path: его родитель закрыт для nobody
+    path = tempfile.mkdtemp(prefix="vitm-ro-")
+    os.chmod(path, 0o755)
+    yield path
+    os.chmod(path, 0o755)
+    shutil.rmtree(path)
+
+
+def _write(db_file, users):
+    conn = connect(db_file)
+    init_db(conn)
+    conn.executemany("INSERT INTO users (username) VALUES (?)", [(u,) for u in users])
+    conn.commit()
+    return conn
+
+
+def _read_as_reader(db_file):
+    # количество пользователей глазами процесса без права записи в каталог
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        try:
+            if os.geteuid() == 0:
+                os.setgid(NOBODY)
+                os.setuid(NOBODY)
+            conn = connect_readonly(db_file)
+            result = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        except Exception as e:
+            result = repr(e)
+        with os.fdopen(w, "wb") as f:
+            pickle.dump(result, f)
+        os._exit(0)
+
+    os.close(w)
+    with os.fdopen(r, "rb") as f:
+        result = pickle.load(f)
+    os.waitpid(pid, 0)
+    return result
+
+
+def _closed_copy(db_dir):
+    db_file = os.path.join(db_dir, "vitm.db")
+    _write(db_file, ["@a", "@b"]).close()
+    # коллектор закрылся — -wal и -shm удалены, создать их читатель не может
+    assert sorted(os.listdir(db_dir)) == ["vitm.db"]
+    os.chmod(db_file, 0o644)
+    os.chmod(db_dir, 0o555)
+    return db_file
+
+
+def test_readonly_dir_without_wal_files_fails_by_default(db_dir, monkeypatch):
+    monkeypatch.setattr(db, "DB_IMMUTABLE", False)
+    result = _read_as_reader(_closed_copy(db_dir))
+    assert isinstance(result, str) and "OperationalError" in result
+
+
+def test_readonly_dir_without_wal_files_immutable(db_dir, monkeypatch):
+    monkeypatch.setattr(db, "DB_IMMUTABLE", True)
+    assert _read_as_reader(_closed_copy(db_dir)) == 2
+
+
+def test_readonly_dir_sees_live_wal(db_dir):
+    db_file = os.path.join(db_dir, "vitm.db")
+    writer = _write(db_file, ["@a"])
+    try:
+        writer.execute("INSERT INTO users (username) VALUES ('@b')")
+        writer.commit()
+        # коммит пока только в -wal: immutable=1 его бы не увидел
+        for name in os.listdir(db_dir):
+            os.chmod(os.path.join(db_dir, name), 0o644)
+        os.chmod(db_dir, 0o555)
+
+        assert _read_as_reader(db_file) == 2
+    finally:
+        writer.close()
+
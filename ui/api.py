@@ -0,0 +1,180 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query, Response
+
+from ui.config import LOCAL_TZ, UTC
+from ui.store import get_store
+from ui import timing
+
+router = APIRouter(prefix="/api")
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+MAX_LIMIT = 50000
+
+# --------------------------------------------------
+# Params
+# --------------------------------------------------
+def parse_ts(value):
+    # без смещения — локальное время, как в полях Start/End в UI
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(400, f"Bad datetime: {value}")
+    if dt.tzinfo is None:
+        dt = LOCAL_TZ.localize(dt)
+    return int(dt.timestamp())
+
+def to_iso(ts):
+    return datetime.fromtimestamp(ts, UTC).isoformat()
+
+def encode_cursor(*key):
+    raw = json.dumps(key).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise HTTPException(400, "Bad cursor")
+    # курсор приходит от клиента: годится только [время как хранится, id]
+    if not (isinstance(key, list) and len(key) == 2 and isinstance(key[0], str)
+            and isinstance(key[1], int) and not isinstance(key[1], bool)):
+        raise HTTPException(400, "Bad cursor")
+    return key
+
+# --------------------------------------------------
+# Output
+# --------------------------------------------------
+def to_arrow(columns, rows):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(406, "Arrow output requires pyarrow")
+
+    table = pa.table({
+        name: [r[i] for r in rows]
+        for i, name in enumerate(columns)
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def respond(columns, rows, fmt, next_cursor=None):
+    if fmt == "arrow":
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return Response(to_arrow(columns, rows), media_type=ARROW_MIME, headers=headers)
+
+    return {
+        "items": [dict(zip(columns, r)) for r in rows],
+        "next_cursor": next_cursor,
+    }
+
+# --------------------------------------------------
+# Endpoints
+# --------------------------------------------------
+@router.get("/users")
+def users():
+    store = get_store()
+    active = {uid for uid, _ in store.users(active_only=True)}
+    rows = store.users(active_only=False)
+    return {"items": [{"id": uid, "username": name, "active": int(uid in active)} for uid, name in rows]}
+
+
+@router.get("/transitions")
+def transitions(
+    start: str,
+    end: str,
+    user_id: list[int] = Query(default=[]),
+    cursor: str | None = None,
+    limit: int = Query(default=1000, ge=1, le=MAX_LIMIT),
+    format: str = Query(default="json", pattern="^(json|arrow)$"),
+):
+    lo, hi = parse_ts(start), parse_ts(end)
+    after = decode_cursor(cursor) if cursor else None
+
+    rows = get_store().transitions_page(lo, hi, user_id, after, limit + 1)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][4], rows[-1][0])
+
+    rows = [(i, u, to_iso(ts), status) for i, u, ts, status, _ in rows]
+    return respond(("id", "user_id", "date", "status"), rows, format, next_cursor)
+
+
+@router.get("/sessions")
+def sessions(
+    start: str,
+    end: str,
+    user_id: list[int] = Query(default=[]),
+    cursor: str | None = None,
+    limit: int = Query(default=1000, ge=1, le=MAX_LIMIT),
+    format: str = Query(default="json", pattern="^(json|arrow)$"),
+):
+    lo, hi = parse_ts(start), parse_ts(end)
+    after = decode_cursor(cursor) if cursor else None
+
+    # сессии обрезаются по границам периода, duration пересчитывается
+    rows = get_store().sessions_page(lo, hi, user_id, after, limit + 1)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][4], rows[-1][0])
+
+    rows = [(i, u, to_iso(s), to_iso(e), e - s) for i, u, s, e, _ in rows]
+    return respond(("id", "user_id", "started_at", "ended_at", "duration"), rows, format, next_cursor)
+
+
+@router.get("/uptime")
+def uptime(
+    start: str,
+    end: str,
+    user_id: list[int] = Query(default=[]),
+    format: str = Query(default="json", pattern="^(json|arrow)$"),
+):
+    rows = get_store().uptime(parse_ts(start), parse_ts(end), user_id)
+    return respond(("user_id", "sessions", "online_seconds"), rows, format)
+
+
+@router.get("/timings")
+def timings():
+    # перцентили этапов отрисовки за последние ui.timing.WINDOW запросов
+    return timing.percentiles()
+
+
+@router.get("/profile/{user_id}")
+def profile(
+    user_id: int,
+    variant: str = Query(default="total", pattern="^(total|decay|rolling)$"),
+    resolution: int = Query(default=60, description="minutes per cell: 5 or 60"),
+    threshold: float = Query(default=0.3, ge=0, le=1),
+):
+    from analytics import profiles
+
+    if resolution not in (5, 60):
+        raise HTTPException(400, "resolution must be 5 or 60")
+
+    result = get_store().activity_profile(user_id, variant)
+    if result is None:
+        raise HTTPException(404, f"No profile for user {user_id}")
+
+    seconds, share = result
+    usual = profiles.usual_hours(share, threshold)
+    if resolution == 60:
+        seconds, share = profiles.to_hours(seconds) * 12, profiles.to_hours(share)
+
+    # строки — дни недели (0 = понедельник), столбцы — ячейки суток
+    return {
+        "user_id": user_id,
+        "variant": variant,
+        "resolution": resolution,
+        "timezone": str(profiles.PROFILE_TZ),
+        "seconds": seconds.round(1).tolist(),
+        "share": share.round(4).tolist(),
+        "usual_hours": [{"weekday": d, "hour": h, "share": round(v, 4)} for d, h, v in usual],
+    }
@@ -1,346 +1,450 @@
-import sqlite3
-import pandas as pd
-import numpy as np
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
-from datetime import datetime, timedelta
+from ui import startup
+
+import time
+from contextlib import asynccontextmanager
+
 import gradio as gr
-from collector.config import DB_FILE, LOCAL_TZ
+import uvicorn
+from fastapi import FastAPI
+from gradio.components.plot import PlotData
+from collector.users import UserDirectory
+from ui import api, live, render_pool, timing
+from ui.config import DB_FILE, DIAGNOSTICS, DISPLAY_ZONES, LOCAL_TZ, SERVER_NAME, SERVER_PORT
+from ui.ranges import PRESETS, calc_range, parse_range, parse_zoom
+from ui.store import columnar, get_store, window as store_window
 
-# --------------------------------------------------
-# Utils
-# --------------------------------------------------
-def round_down_5min(dt: datetime):
-    return dt - timedelta(
-        minutes=dt.minute % 5,
-        seconds=dt.second,
-        microseconds=dt.microsecond
-    )
+startup.mark("import gradio")
 
-def round_up_5min(dt: datetime):
-    if dt.minute % 5 == 0 and dt.second == 0:
-        return dt.replace(second=0, microsecond=0)
-    return round_down_5min(dt + timedelta(minutes=5))
+USERS = UserDirectory(DB_FILE)
 
-def now_local():
-    return datetime.now(LOCAL_TZ)
+# буфер недавней истории коллектора (collector.recent.RecentBuffer);
+# есть только в совмещённом режиме, см. ui.combined
+RECENT = None
 
 # --------------------------------------------------
-# Fast ranges
+# Render
 # --------------------------------------------------
-def calc_range(preset: str):
-    now = now_local()
-
-    if preset == "Текущий час":
-        start = now.replace(minute=0, second=0, microsecond=0)
-        end = now.replace(hour=23, minute=55, second=0)
-
-    elif preset == "Рабочий день":
-        start = now.replace(hour=7, minute=0, second=0)
-        end = now.replace(hour=19, minute=0, second=0)
-
-    elif preset == "Последний 1 час":
-        start = now - timedelta(hours=1)
-        end = now.replace(hour=23, minute=55, second=0)
-
-    elif preset == "Последние 3 часа":
-        start = now - timedelta(hours=3)
-        end = now.replace(hour=23, minute=55, second=0)
-
-    elif preset == "Последние 5 часов":
-        start = now - timedelta(hours=5)
-        end = now.replace(hour=23, minute=55, second=0)
-
-    elif preset == "Последние 10 часов":
-        start = now - timedelta(hours=10)
-        end = now.replace(hour=23, minute=55, second=0)
-
-    elif preset == "Текущий день":
-        start = now.replace(hour=0, minute=0, second=0)
-        end = now.replace(hour=23, minute=55, second=0)
-
-    elif preset == "Прошлый день":
-        yesterday = now.date() - timedelta(days=1)
-        start = LOCAL_TZ.localize(datetime.combine(yesterday, datetime.min.time()))
-        end = start.replace(hour=23, minute=55)
-
-    elif preset == "Текущая неделя":
-        start = now - timedelta(days=now.weekday())
-        start = start.replace(hour=0, minute=0, second=0)
-        end = start + timedelta(days=6, hours=23, minutes=55)
-
+VIEWS = [("Картинка", "image"), ("Интерактивный", "plotly")]
+
+def _render(start_time, end_time, step_sec, tz_name, request, drop_if_busy, view="image", zoom=None):
+    t0 = time.perf_counter()
+    USERS.refresh()
+    user_map = dict(USERS.by_id)
+    plotly = view == "plotly"
+
+    lo, hi = parse_range(start_time, end_time, tz_name)
+    # в интерактивном режиме окно задаёт зум браузера, если он есть
+    if plotly and zoom:
+        lo, hi = parse_zoom(zoom) or (lo, hi)
+
+    # окно в пределах буфера собираем здесь — воркер базу не читает;
+    # колоночное хранилище тоже есть только в этом процессе (ui.store)
+    data, fetched = None, 0.0
+    if RECENT is not None:
+        data = RECENT.window(lo, hi, user_map.keys())
+    if data is None and columnar():
+        data = store_window(lo, hi, list(user_map))
+    if data is not None:
+        fetched = time.perf_counter() - t0
+
+    users = tuple(sorted(user_map.items()))
+    if plotly:
+        key = ("plotly", lo, hi, int(step_sec), tz_name, users)
+        task, args = render_pool.plotly_task, (lo, hi, step_sec, user_map, tz_name, data)
     else:
-        return gr.update(), gr.update()
+        key = (start_time, end_time, int(step_sec), tz_name, users)
+        task, args = render_pool.heatmap_task, (start_time, end_time, step_sec, user_map, tz_name, data)
 
-    start = round_down_5min(start)
-    end = round_up_5min(end)
+    result = render_pool.run(
+        key, task, *args,
+        client=request.session_hash if request else None,
+        drop_if_busy=drop_if_busy
+    )
 
-    return (
-        start.strftime("%Y-%m-%d %H:%M:%S"),
-        end.strftime("%Y-%m-%d %H:%M:%S"),
+    if result is render_pool.SKIPPED:
+        return gr.update()
+
+    image, timings = result
+    # результат общий для запросов, слитых в render_pool.submit, — правим копию
+    timings = {**timings, "stages": dict(timings["stages"])}
+    # всё, что не этапы воркера, — ожидание в очереди пула и пересылка
+    wall = time.perf_counter() - t0
+    timings["stages"]["queue"] = max(0.0, wall - timings["total"] - fetched)
+    if fetched:
+        timings["stages"]["query"] = timings["stages"].get("query", 0.0) + fetched
+    timing.record(
+        view if plotly else "heatmap", timings,
+        wall=round(wall, 4), start=start_time, end=end_time, step=int(step_sec),
+        users=len(user_map), tz=tz_name, memory=data is not None, tick=drop_if_busy,
+        **({"lo": lo, "hi": hi} if plotly else {})
     )
 
+    if image is None:
+        return None
+    # JSON фигуры уже собран воркером, gr.Plot отдаёт его как есть
+    return PlotData(type="plotly" if plotly else "matplotlib", plot=image)
+
+def render(start_time, end_time, step_sec, tz_name=None, view="image", request: gr.Request = None):
+    return _render(start_time, end_time, step_sec, tz_name, request, drop_if_busy=False, view=view)
+
+def render_tick(start_time, end_time, step_sec, tz_name, auto, view, zoom, request: gr.Request):
+    if not auto:
+        return gr.update()
+    # тик таймера не ставим в очередь, если прошлая отрисовка ещё идёт
+    return _render(start_time, end_time, step_sec, tz_name, request, drop_if_busy=True, view=view, zoom=zoom)
+
+def zoom_timeline(zoom, start_time, end_time, step_sec, tz_name, request: gr.Request):
+    # зум/сдвиг в интерактивном режиме: новое окно с шагом под него;
+    # пустой zoom (двойной клик, autorange) — снова окно Start/End
+    return _render(start_time, end_time, step_sec, tz_name, request, drop_if_busy=False, view="plotly", zoom=zoom)
+
+# зум и сдвиг интерактивного графика → окно "lo,hi" в скрытое поле
+# #timeline-zoom; на его input сервер пересобирает фигуру (zoom_timeline).
+# Двойной клик (autorange) шлёт пустое окно — вернуться к Start/End.
+ZOOM_JS = """
+<script>
+(() => {
+  let timer = null;
+
+  function send(value) {
+    const box = document.querySelector("#timeline-zoom textarea, #timeline-zoom input");
+    if (!box || box.value === value) return;
+    box.value = value;
+    box.dispatchEvent(new Event("input", {bubbles: true}));
+  }
+
+  function onRelayout(e) {
+    let range;
+    if (e["xaxis.autorange"]) range = null;
+    else if ("xaxis.range[0]" in e) range = [e["xaxis.range[0]"], e["xaxis.range[1]"]];
+    else if (e["xaxis.range"]) range = e["xaxis.range"];
+    else return;  // resize, hover и прочее — не зум
+    clearTimeout(timer);
+    timer = setTimeout(() => send(range ? range.map(Math.round).join(",") : ""), 250);
+  }
+
+  function attach() {
+    const gd = document.querySelector("#timeline-plot .js-plotly-plot");
+    if (gd && gd.on && !gd.__zoomBound) {
+      gd.__zoomBound = true;
+      gd.on("plotly_relayout", onRelayout);
+    }
+  }
+
+  new MutationObserver(attach).observe(document.documentElement, {childList: true, subtree: true});
+})();
+</script>
+"""
+
 # --------------------------------------------------
-# Data
+# Live
 # --------------------------------------------------
-def load_users():
-    conn = sqlite3.connect(DB_FILE)
-    df = pd.read_sql_query("SELECT id, username FROM users WHERE active = 1", conn)
-    conn.close()
-    return dict(zip(df.id, df.username))
+async def stream_online(request: gr.Request):
+    async for text in live.stream_online(request):
+        yield text
 
-USER_MAP = load_users()
+def change_zone(preset, tz_name, request: gr.Request):
+    # поля Start/End — стеночное время, в новой зоне пересчитываем пресет
+    live.set_zone(tz_name, request)
+    return calc_range(preset, tz_name)
 
-def load_statuses(start_dt, end_dt, active_user_ids):
-    conn = sqlite3.connect(DB_FILE)
+def forget_zone(request: gr.Request):
+    live.forget_zone(request)
 
-    ids_tuple = tuple(active_user_ids)
-
-    df = pd.read_sql_query(
-        f"SELECT user_id, date, status FROM online_statuses WHERE user_id IN {ids_tuple}",
-        conn
-    )
-    conn.close()
-
-    df["date"] = pd.to_datetime(df["date"], utc=True).dt.tz_convert(LOCAL_TZ)
-    df["status_num"] = df["status"].map({"online": 1, "offline": 0})
-    return df[(df.date >= start_dt) & (df.date <= end_dt)]
-
-def load_sessions(start_dt, end_dt, active_user_ids):
-    conn = sqlite3.connect(DB_FILE)
-
-    ids_tuple = tuple(active_user_ids)
-
-    df = pd.read_sql_query(
-        f"""
-        SELECT user_id, started_at, ended_at, duration
-        FROM online_sessions
-        WHERE user_id IN {ids_tuple}
-        """,
-        conn
+# --------------------------------------------------
+# Profile
+# --------------------------------------------------
+def user_choices():
+    USERS.refresh()
+    return [(USERS.name(uid), uid) for uid in USERS.ids()]
+
+def describe_usual(user_id, variant):
+    from analytics import profiles
+
+    result = get_store().activity_profile(user_id, variant)
+    if result is None:
+        return ""
+
+    hours = profiles.usual_hours(result[1])
+    if not hours:
+        return "Обычных часов онлайна нет (доля ниже 30%)."
+    by_day = {}
+    for d, h, _ in hours:
+        by_day.setdefault(d, []).append(f"{h:02d}")
+    return "**Обычно онлайн:** " + "; ".join(f"{profiles.WEEKDAYS[d]} {', '.join(hs)}" for d, hs in sorted(by_day.items()))
+
+def render_profile(user_id, variant, resolution):
+    if user_id is None:
+        return None, ""
+    user_id = int(user_id)
+    hourly = resolution == "hour"
+
+    result = render_pool.run(
+        ("profile", user_id, variant, hourly), render_pool.profile_task,
+        user_id, USERS.name(user_id), variant, hourly
     )
-
-    conn.close()
-
-    if df.empty:
-        return df
-
-    # даты → datetime UTC → LOCAL_TZ
-    df["started_at"] = pd.to_datetime(df["started_at"], utc=True).dt.tz_convert(LOCAL_TZ)
-    df["ended_at"] = pd.to_datetime(df["ended_at"], utc=True).dt.tz_convert(LOCAL_TZ)
-
-    # оставляем только сессии, пересекающие период
-    df = df[
-        (df["ended_at"] >= start_dt) &
-        (df["started_at"] <= end_dt)
-    ]
-
-    return df
-
+    if result is None:
+        return None, "Профиль ещё не накоплен — нет закрытых сессий."
+    return PlotData(type="matplotlib", plot=result), describe_usual(user_id, variant)
 
 # --------------------------------------------------
-# Plot
+# Reports
 # --------------------------------------------------
-def build_heatmap(start_time, end_time, step_sec):
-    start_dt = LOCAL_TZ.localize(datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S"))
-    end_dt = min(
-        LOCAL_TZ.localize(datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")),
-        now_local()
+# отчёты собирает python -m analytics.reports, здесь — только чтение файлов
+REPORT_KINDS = [("Сутки", "daily"), ("Неделя", "weekly")]
+
+def report_groups():
+    from analytics.reports import catalog
+    groups = list(catalog())
+    return gr.update(choices=groups, value=groups[0] if groups else None)
+
+def report_periods(group, kind):
+    from analytics.reports import catalog
+    labels = catalog().get(group, {}).get(kind, [])
+    return gr.update(choices=labels, value=labels[0] if labels else None)
+
+def show_report(group, kind, label):
+    import os
+    from datetime import datetime
+    from analytics.reports import KINDS, REPORTS_DIR, catalog, latest, read_csv
+
+    # значения приходят и через публичный API (/show_report) и идут в пути
+    # файлов — принимаем только периоды из каталога
+    known = kind in KINDS and label in catalog().get(group, {}).get(kind, [])
+    found = latest(REPORTS_DIR, group, kind, label) if known else None
+    if found is None:
+        return "_Отчёт ещё не собран._", None, None, None, None
+    path, manifest = found
+
+    def image(name):
+        file = os.path.join(path, name)
+        return file if os.path.exists(file) else None
+
+    header, rows = read_csv(os.path.join(path, "percentage.csv"))
+    _, uptime = read_csv(os.path.join(path, "uptime.csv"))
+    hours = {r[0]: r[3] for r in uptime}
+    table = {
+        "headers": ["Пользователь", "Онлайн, % записей", "Часов онлайн"],
+        "data": [[r[1], r[4], hours.get(r[0], "0")] for r in rows],
+    }
+
+    built = datetime.fromisoformat(manifest["built_at"]).astimezone(LOCAL_TZ).strftime("%Y-%m-%d %H:%M")
+    info = (
+        f"**{group} · {label}** — версия {manifest['version']}, собрана {built}"
+        + ("" if manifest["complete"] else " (период ещё идёт)")
     )
+    files = sorted(os.path.join(path, f) for f in os.listdir(path))
+    return info, image("online_statuses_heatmap_timeline.png"), image("online_hours_share.png"), table, files
 
-    df = load_statuses(start_dt, end_dt, USER_MAP.keys())
-    if df.empty:
-        return None
-
-    df_sessions = load_sessions(start_dt, end_dt, USER_MAP.keys())
+# --------------------------------------------------
+# Gradio UI
+# --------------------------------------------------
+def build_ui():
+    with gr.Blocks(title="Telegram Online Timeline") as demo:
+        gr.Markdown("## 📊 Telegram Online Timeline")
 
-    time_index = pd.date_range(
-        start=start_dt,
-        end=end_dt,
-        freq=f"{int(step_sec)}s",
-        tz=LOCAL_TZ
-    )
+        # полоска статусов — из снимка коллектора (ui.live), без запросов к базе
+        online = gr.Markdown()
 
-    timeline = pd.DataFrame(index=time_index)
+        with gr.Tab("Таймлайн"):
+            with gr.Row():
+                with gr.Column():
+                    preset = gr.Dropdown(
+                        label="Быстрый выбор диапазона",
+                        choices=PRESETS,
+                        value="Последние 3 часа"
+                    )
+
+                with gr.Column():
+                    with gr.Row():
+                        start_time = gr.Textbox(label="Start time")
+                        end_time = gr.Textbox(label="End time")
+
+                with gr.Column():
+                    tz = gr.Dropdown(
+                        label="Часовой пояс",
+                        choices=DISPLAY_ZONES,
+                        value=DISPLAY_ZONES[0]
+                    )
 
-    for uid in df.user_id.unique():
-        events = (
-            df[df.user_id == uid]
-            .sort_values("date")
-            .drop_duplicates(subset=["date"], keep="last")
-            .set_index("date")
+            with gr.Row():
+                with gr.Column():
+                    step = gr.Slider(
+                        minimum=1,
+                        maximum=60,
+                        value=5,
+                        step=1,
+                        label="Шаг (секунды)"
+                    )
+                    auto = gr.Checkbox(label="Auto-refresh", value=False)
+
+                with gr.Column():
+                    view = gr.Radio(label="Вид", choices=VIEWS, value="image")
+
+            plot = gr.Plot(elem_id="timeline-plot")
+            # окно зума интерактивного графика, пишет ZOOM_JS
+            zoom = gr.Textbox(elem_id="timeline-zoom", visible="hidden")
+            btn = gr.Button("Обновить")
+
+            if DIAGNOSTICS:
+                with gr.Accordion("Диагностика", open=False):
+                    diagnostics = gr.Markdown(timing.render_table)
+
+        with gr.Tab("Профиль активности"):
+            with gr.Row():
+                profile_user = gr.Dropdown(label="Пользователь", choices=[])
+                variant = gr.Radio(
+                    label="Период",
+                    choices=[("Всё время", "total"), ("С затуханием", "decay"), ("Последние недели", "rolling")],
+                    value="total"
+                )
+                resolution = gr.Radio(
+                    label="Ячейка",
+                    choices=[("1 час", "hour"), ("5 минут", "5min")],
+                    value="hour"
+                )
+
+            profile_plot = gr.Plot()
+            profile_usual = gr.Markdown()
+            profile_btn = gr.Button("Показать")
+
+        with gr.Tab("Отчёты"):
+            with gr.Row():
+                report_group = gr.Dropdown(label="Группа")
+                report_kind = gr.Radio(label="Период", choices=REPORT_KINDS, value="daily")
+                report_period = gr.Dropdown(label="Дата / неделя")
+
+            report_info = gr.Markdown()
+            report_timeline = gr.Image(label="Таймлайн", type="filepath", interactive=False)
+            report_hours = gr.Image(label="По часам суток", type="filepath", interactive=False)
+            report_table = gr.Dataframe(interactive=False)
+            report_files = gr.File(label="Файлы отчёта", file_count="multiple", interactive=False)
+
+        preset.change(
+            fn=calc_range,
+            inputs=[preset, tz],
+            outputs=[start_time, end_time]
         )
-        label = USER_MAP.get(uid, f"User {uid}")
-        timeline[label] = events.status_num.reindex(time_index, method="ffill")
-
-    fig, ax = plt.subplots(figsize=(15, len(timeline.columns)*0.5 + 2))
-    im = ax.imshow(timeline.T, aspect="auto", cmap="Greens", interpolation="nearest")
-
-    # === OVERLAY ONLINE SESSIONS ===
-    user_ypos = {user: i for i, user in enumerate(timeline.columns)}
-
-    for _, row in df_sessions.iterrows():
-        user_label = USER_MAP.get(row["user_id"])
-        if user_label not in user_ypos:
-            continue
 
-        y = user_ypos[user_label]
-
-        # обрезаем сессию по выбранному периоду
-        s = max(row["started_at"], start_dt)
-        e = min(row["ended_at"], end_dt)
+        tz.change(
+            fn=change_zone,
+            inputs=[preset, tz],
+            outputs=[start_time, end_time]
+        )
 
-        if e <= s:
-            continue
+        demo.load(
+            fn=calc_range,
+            inputs=[preset, tz],
+            outputs=[start_time, end_time]
+        )
 
-        # перевод времени в координаты heatmap
-        x_start = np.searchsorted(timeline.index, s)
-        x_end = np.searchsorted(timeline.index, e)
+        demo.load(
+            fn=lambda: gr.update(choices=user_choices()),
+            outputs=profile_user
+        )
 
-        rect = Rectangle(
-            (x_start, y - 0.2),  # x, y
-            x_end - x_start,  # width
-            0.4,  # height
-            facecolor="lime",
-            alpha=0.35,
-            edgecolor=None
+        demo.load(
+            fn=stream_online,
+            outputs=online,
+            concurrency_limit=None,
+            show_progress="hidden"
         )
 
-        ax.add_patch(rect)
+        btn.click(
+            fn=render,
+            inputs=[start_time, end_time, step, tz, view],
+            outputs=plot,
+            api_name="build_heatmap"
+        )
 
-    # Uptime for Users
-    user_labels = []
+        view.change(
+            fn=render,
+            inputs=[start_time, end_time, step, tz, view],
+            outputs=plot
+        )
 
-    for user_label in timeline.columns:
-        user_id = {v: k for k, v in USER_MAP.items()}.get(user_label)
+        # новое окно Start/End или вид — зум сбрасывается
+        for trigger in (btn.click, view.change, start_time.change, end_time.change):
+            trigger(fn=lambda: "", outputs=zoom, show_progress="hidden")
 
-        if df_sessions.empty or user_id not in df_sessions["user_id"].values:
-            label_text = f"{user_label}"
-            user_labels.append(label_text)
-            continue
+        zoom.input(
+            fn=zoom_timeline,
+            inputs=[zoom, start_time, end_time, step, tz],
+            outputs=plot,
+            api_name="zoom_timeline",
+            trigger_mode="always_last"
+        )
 
-        user_sess = df_sessions[df_sessions["user_id"] == user_id]
+        profile_btn.click(
+            fn=render_profile,
+            inputs=[profile_user, variant, resolution],
+            outputs=[profile_plot, profile_usual],
+            api_name="build_profile"
+        )
 
-        # корректируем сессии по границам периода
-        total_online_seconds = 0
-        for _, r in user_sess.iterrows():
-            s = max(r["started_at"], start_dt)
-            e = min(r["ended_at"], end_dt)
-            delta = (e - s).total_seconds()
-            if delta > 0:
-                total_online_seconds += delta
+        report_outputs = [report_info, report_timeline, report_hours, report_table, report_files]
 
-        hours = int(total_online_seconds // 3600)
-        minutes = int((total_online_seconds % 3600) // 60)
+        demo.load(fn=report_groups, outputs=report_group)
 
-        label_text = f"{user_label}\n{hours}ч {minutes}мин"
-        user_labels.append(label_text)
+        for control in (report_group, report_kind):
+            control.change(
+                fn=report_periods,
+                inputs=[report_group, report_kind],
+                outputs=report_period
+            )
 
-    # Используем подписи на оси Y
-    plt.yticks(
-        ticks=np.arange(len(timeline.columns)),
-        labels=user_labels
-    )
+        report_period.change(
+            fn=show_report,
+            inputs=[report_group, report_kind, report_period],
+            outputs=report_outputs,
+            api_name="show_report"
+        )
 
-    # plt.colorbar(im, ax=ax, label="Online (1) / Offline (0)")
-    # ax.set_yticks(range(len(timeline.columns)))
-    # ax.set_yticklabels(timeline.columns)
+        timer = gr.Timer(5)
+        timer.tick(
+            fn=render_tick,
+            inputs=[start_time, end_time, step, tz, auto, view, zoom],
+            outputs=plot
+        )
 
-    xticks = np.arange(0, len(timeline), max(1, len(timeline)//20))
-    ax.set_xticks(xticks)
-    ax.set_xticklabels(
-        [timeline.index[i].strftime("%H:%M") for i in xticks],
-        rotation=45
-    )
+        if DIAGNOSTICS:
+            timer.tick(
+                fn=timing.render_table,
+                outputs=diagnostics,
+                show_progress="hidden"
+            )
 
-    ax.set_title(
-        f"Online Status Heatmap\n"
-        f"{start_dt.strftime('%Y-%m-%d %H:%M')} - {end_dt.strftime('%Y-%m-%d %H:%M')}"
-    )
-    # ax.set_xlabel("Time")
-    # ax.set_ylabel("User")
+        demo.unload(forget_zone)
 
-    plt.tight_layout()
-    plt.close(fig)
+    return demo
 
-    return fig
 
-# --------------------------------------------------
-# Gradio UI
-# --------------------------------------------------
-with gr.Blocks(title="Telegram Online Timeline") as demo:
-    gr.Markdown("## 📊 Telegram Online Timeline")
-
-
-
-    with gr.Row():
-        with gr.Column():
-            preset = gr.Dropdown(
-                label="Быстрый выбор диапазона",
-                choices=[
-                    "Текущий час",
-                    "Рабочий день",
-                    "Последний 1 час",
-                    "Последние 3 часа",
-                    "Последние 5 часов",
-                    "Последние 10 часов",
-                    "Текущий день",
-                    "Прошлый день",
-                    "Текущая неделя"
-                ],
-                value="Последние 3 часа"
-            )
+def create_app(recent=None):
+    global RECENT
+    RECENT = recent
+    demo = build_ui()
+    startup.mark("build ui")
 
-        with gr.Column():
-            with gr.Row():
-                start_time = gr.Textbox(label="Start time")
-                end_time = gr.Textbox(label="End time")
-
-    with gr.Row():
-        with gr.Column():
-            step = gr.Slider(
-                minimum=1,
-                maximum=60,
-                value=5,
-                step=1,
-                label="Шаг (секунды)"
-            )
-            auto = gr.Checkbox(label="Auto-refresh", value=False)
+    live.start(names=USERS.name)
 
-    plot = gr.Plot()
-    btn = gr.Button("Обновить")
+    @asynccontextmanager
+    async def lifespan(app):
+        startup.mark("launch")
+        startup.report()
+        yield
+        render_pool.shutdown()
 
-    preset.change(
-        fn=calc_range,
-        inputs=preset,
-        outputs=[start_time, end_time]
-    )
+    app = FastAPI(lifespan=lifespan)
+    # JSON/Arrow API рядом с интерфейсом: /api/...
+    app.include_router(api.router)
+    # картинки и файлы отчётов отдаются из REPORTS_DIR
+    from analytics.reports import REPORTS_DIR
+    return gr.mount_gradio_app(app, demo, path="/", allowed_paths=[REPORTS_DIR], head=ZOOM_JS)
 
-    demo.load(
-        fn=calc_range,
-        inputs=preset,
-        outputs=[start_time, end_time]
-    )
 
-    btn.click(
-        fn=build_heatmap,
-        inputs=[start_time, end_time, step],
-        outputs=plot
-    )
+def main():
+    uvicorn.run(create_app(), host=SERVER_NAME, port=SERVER_PORT)
 
-    timer = gr.Timer(5)
-    timer.tick(
-        fn=lambda s, e, st, a: build_heatmap(s, e, st) if a else gr.update(),
-        inputs=[start_time, end_time, step, auto],
-        outputs=plot
-    )
 
 if __name__ == "__main__":
-    demo.launch(
-        server_name="0.0.0.0",
-        server_port=7860,
-        share=False
-    )
-
+    main()
@@ -0,0 +1,72 @@
+import asyncio
+import signal
+from contextlib import contextmanager
+
+import uvicorn
+
+from ui.config import RECENT_HOURS, SERVER_NAME, SERVER_PORT
+
+# Коллектор и UI в одном процессе — для небольших установок:
+#
+#   python -m ui.combined
+#
+# Цикл asyncio коллектора и uvicorn работают в одном event loop.
+# Коллектор, как обычно, пишет в базу и дополнительно — в буфер недавней
+# истории (collector.recent); окна, которые в него укладываются
+# (последние RECENT_HOURS часов), UI рисует без чтения базы.
+# Отдельные python -m collector.collector и python -m ui.app
+# при этом не запускаются.
+#
+# Коллектор и UI импортируются внутри run(): воркеры отрисовки (spawn)
+# импортируют главный модуль заново, и на уровне модуля коллектор открыл
+# бы базу на запись и пересоздал снимок статусов в каждом воркере.
+
+
+class _Server(uvicorn.Server):
+    # сигналы обрабатывает run(): останавливаем и коллектор, и сервер
+
+    @contextmanager
+    def capture_signals(self):
+        yield
+
+    def install_signal_handlers(self):
+        pass
+
+
+async def run():
+    from ui import app as ui_app
+    from collector import collector
+    from collector.recent import RecentBuffer
+
+    recent = RecentBuffer(int(RECENT_HOURS * 3600))
+    statuses, sessions = recent.seed(collector.store)
+    print(f"🧠 Recent buffer: {RECENT_HOURS:g}h, {statuses} statuses, {sessions} sessions")
+    collector.recent = recent
+
+    server = _Server(uvicorn.Config(ui_app.create_app(recent), host=SERVER_NAME, port=SERVER_PORT))
+
+    def stop():
+        if not collector.stop_event.is_set():
+            collector.shutdown()
+        server.should_exit = True
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop)
+
+    # остановка одной половины (ошибка авторизации, сигнал) останавливает другую
+    tasks = [
+        asyncio.create_task(collector.main(handle_signals=False)),
+        asyncio.create_task(server.serve()),
+    ]
+    for t in tasks:
+        t.add_done_callback(lambda _: stop())
+    await asyncio.gather(*tasks)
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import os
+import pytz
+from dotenv import load_dotenv
+from datetime import timezone
+
+# UI не ходит в Telegram, поэтому API_ID/API_HASH здесь не нужны
+load_dotenv()
+
+DB_FILE = os.getenv("DB_FILE", "shared/vitm.db")
+LIVE_SOCKET = os.getenv("LIVE_SOCKET", "shared/live.sock")
+SNAPSHOT_FILE = os.getenv("SNAPSHOT_FILE", "shared/status.snap")
+
+SERVER_NAME = os.getenv("UI_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("UI_PORT", "7860"))
+
+# панель «Диагностика» с перцентилями этапов отрисовки (ui.timing)
+DIAGNOSTICS = os.getenv("UI_DIAGNOSTICS", "0") == "1"
+
+# совмещённый режим (ui.combined): сколько часов истории держать в памяти
+RECENT_HOURS = float(os.getenv("RECENT_HOURS", "48"))
+
+# зона по умолчанию для полей Start/End и подписей; зритель может
+# выбрать другую из DISPLAY_ZONES
+LOCAL_TZ = pytz.timezone(os.getenv("DISPLAY_TZ", "Europe/Kiev"))
+DISPLAY_ZONES = list(dict.fromkeys([
+    LOCAL_TZ.zone,
+    *os.getenv("DISPLAY_ZONES", "Europe/Kiev,Europe/Warsaw,Europe/London,UTC,America/New_York").split(","),
+]))
+UTC = timezone.utc
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from ui.sessions_index import get_index
+from ui.store import get_store
+from ui.timing import stage
+
+# --------------------------------------------------
+# Data
+# --------------------------------------------------
+# Окно [lo, hi] и все колонки времени — UTC epoch (int64). В зону зрителя
+# переводятся только подписи на графике (ui.heatmap), не колонки.
+def statuses_frame(rows):
+    data = np.array(rows, dtype=np.int64).reshape(-1, 3)
+    return pd.DataFrame({
+        "user_id": data[:, 0],
+        "ts": data[:, 1],
+        "status_num": data[:, 2],
+    })
+
+def sessions_frame(user_ids, starts, ends):
+    return pd.DataFrame({
+        "user_id": user_ids,
+        "started_at": starts,
+        "ended_at": ends,
+        "duration": ends - starts,
+    })
+
+def load_statuses(lo, hi, active_user_ids):
+    with stage("query"):
+        rows = get_store().statuses(lo, hi, active_user_ids)
+
+    with stage("parse"):
+        return statuses_frame(rows)
+
+def load_sessions(lo, hi, active_user_ids):
+    # сессии берутся из индекса в памяти процесса, см. ui.sessions_index
+    with stage("query"):
+        index = get_index()
+
+        parts = []
+        for uid in active_user_ids:
+            starts, ends = index.query(uid, lo, hi)
+            if len(starts):
+                parts.append((np.full(len(starts), uid, dtype=np.int64), starts, ends))
+
+    if not parts:
+        empty = np.empty(0, dtype=np.int64)
+        return sessions_frame(empty, empty, empty)
+
+    with stage("parse"):
+        return sessions_frame(*(np.concatenate(p) for p in zip(*parts)))
+
+def frames(data):
+    """DataFrame'ы из готовых строк (совмещённый режим, collector.recent)."""
+    statuses, sessions = data
+    with stage("parse"):
+        return statuses_frame(statuses), sessions_frame(*sessions)
@@ -0,0 +1,239 @@
+import pandas as pd
+import numpy as np
+import base64
+from datetime import datetime
+from io import BytesIO
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+from analytics.bitmaps import BitmapStore
+from ui import live
+from ui.data import frames, load_statuses, load_sessions
+from ui.ranges import parse_range, zone
+from ui.timing import Laps, stage
+
+# --------------------------------------------------
+# Plot
+# --------------------------------------------------
+# Только объектный API matplotlib: pyplot хранит глобальное состояние
+# и не потокобезопасен. Функции вызываются в процессах ui.render_pool.
+#
+# Сетка, фильтры и сессии — UTC epoch (int64): шаг сетки — физические
+# секунды, поэтому сутки перевода часов (23 или 25 часов) раскладываются
+# без дыр и повторов. В зону зрителя переводятся только ~20 подписей оси.
+def load_window(lo, hi, user_map, data=None):
+    """(статусы, сессии) окна с открытыми сессиями из снимка, либо None, если статусов нет."""
+    # data — строки окна, уже собранные в UI-процессе (ui.combined)
+    if data is not None:
+        df, df_sessions = frames(data)
+        if df.empty:
+            return None
+    else:
+        df = load_statuses(lo, hi, user_map.keys())
+        if df.empty:
+            return None
+        df_sessions = load_sessions(lo, hi, user_map.keys())
+
+    return (df, *with_live_edge(df_sessions, user_map, lo, hi))
+
+
+def with_live_edge(df_sessions, user_map, lo, hi):
+    """(сессии с открытыми, {uid: Entry}) — живой край из снимка коллектора, без запросов."""
+    current = {uid: e for uid, e in live.current().items() if uid in user_map}
+    return _with_open_sessions(df_sessions, current, lo, hi), current
+
+
+def sample_timeline(df, grid, current):
+    """(uids, матрица статусов на узлах grid; NaN — статус ещё не известен)."""
+    # группировка по пользователю одной сортировкой; внутри — по времени,
+    # stable: из одинаковых ts последним остаётся последний записанный
+    user_ids = df.user_id.to_numpy()
+    ts = df.ts.to_numpy()
+    status = df.status_num.to_numpy()
+    order = np.lexsort((ts, user_ids))
+    user_ids, ts, status = user_ids[order], ts[order], status[order]
+
+    # строки — в порядке появления пользователей в выборке, как раньше
+    uids = pd.unique(df.user_id.to_numpy())
+    bounds = np.searchsorted(user_ids, uids, "left"), np.searchsorted(user_ids, uids, "right")
+
+    timeline = np.full((len(uids), len(grid)), np.nan)
+    for row, (uid, a, b) in enumerate(zip(uids, *bounds)):
+        u_ts, u_status = ts[a:b], status[a:b]
+
+        # ffill: последнее событие не позже узла сетки
+        idx = np.searchsorted(u_ts, grid, "right") - 1
+        known = idx >= 0
+        timeline[row, known] = u_status[idx[known]]
+
+        # хвост после последней записи в базе — по снимку
+        e = current.get(uid)
+        if e is not None:
+            tail = (grid > u_ts[-1]) & (grid <= int(e.checked_at))
+            timeline[row, tail] = int(e.online)
+
+    return uids, timeline
+
+
+def clip_sessions(df_sessions, lo, hi):
+    """Сессии, обрезанные по окну: (user_ids, starts, ends)."""
+    s_uid = df_sessions["user_id"].to_numpy()
+    s = np.maximum(df_sessions["started_at"].to_numpy(), lo)
+    e = np.minimum(df_sessions["ended_at"].to_numpy(), hi)
+    return s_uid, s, e
+
+
+def uptime_labels(uids, labels, sessions, current, lo, hi, sep="\n"):
+    """Подписи строк с временем онлайна за окно."""
+    # если битовые карты готовы — uptime это popcount по килобайтам,
+    # иначе считаем по сессиям, как раньше
+    s_uid, s, e = sessions
+    bitmaps = BitmapStore()
+    use_bitmaps = bitmaps.ready()
+
+    if not use_bitmaps:
+        online = np.maximum(e - s, 0)
+        by_user = pd.Series(online).groupby(s_uid).sum() if len(online) else pd.Series(dtype=np.int64)
+
+    user_labels = []
+
+    for user_label, user_id in zip(labels, uids):
+        if use_bitmaps:
+            # открытая сессия в битовые карты ещё не записана
+            total_online_seconds = bitmaps.uptime(user_id, lo, hi) + _open_seconds(current.get(user_id), lo, hi)
+        else:
+            total_online_seconds = by_user.get(user_id, 0)
+
+        if not total_online_seconds:
+            user_labels.append(f"{user_label}")
+            continue
+
+        hours = int(total_online_seconds // 3600)
+        minutes = int((total_online_seconds % 3600) // 60)
+
+        user_labels.append(f"{user_label}{sep}{hours}ч {minutes}мин")
+
+    return user_labels
+
+
+def build_heatmap(start_time, end_time, step_sec, user_map, tz_name=None, data=None):
+    tz = zone(tz_name)
+    lo, hi = parse_range(start_time, end_time, tz_name)
+
+    window = load_window(lo, hi, user_map, data)
+    if window is None:
+        return None
+    df, df_sessions, current = window
+
+    lap = Laps()
+
+    grid = np.arange(lo, hi + 1, int(step_sec), dtype=np.int64)
+    uids, timeline = sample_timeline(df, grid, current)
+    labels = [user_map.get(uid, f"User {uid}") for uid in uids]
+
+    lap("timeline")
+
+    fig = Figure(figsize=(15, len(uids)*0.5 + 2))
+    ax = fig.subplots()
+    im = ax.imshow(timeline, aspect="auto", cmap="Greens", interpolation="nearest")
+
+    lap("render")
+
+    # === OVERLAY ONLINE SESSIONS ===
+    user_ypos = {uid: i for i, uid in enumerate(uids)}
+
+    # обрезаем сессии по выбранному периоду и переводим в координаты heatmap
+    sessions = clip_sessions(df_sessions, lo, hi)
+    s_uid, s, e = sessions
+    x_start = np.searchsorted(grid, s)
+    x_end = np.searchsorted(grid, e)
+
+    for uid, si, ei, xs, xe in zip(s_uid, s, e, x_start, x_end):
+        y = user_ypos.get(uid)
+        if y is None or ei <= si:
+            continue
+
+        rect = Rectangle(
+            (xs, y - 0.2),  # x, y
+            xe - xs,  # width
+            0.4,  # height
+            facecolor="lime",
+            alpha=0.35,
+            edgecolor=None
+        )
+
+        ax.add_patch(rect)
+
+    lap("overlay")
+
+    # Uptime for Users
+    user_labels = uptime_labels(uids, labels, sessions, current, lo, hi)
+
+    # Используем подписи на оси Y
+    ax.set_yticks(
+        ticks=np.arange(len(uids)),
+        labels=user_labels
+    )
+
+    lap("labels")
+
+    # plt.colorbar(im, ax=ax, label="Online (1) / Offline (0)")
+
+    # единственное место, где время переводится в зону зрителя
+    xticks = np.arange(0, len(grid), max(1, len(grid)//20))
+    ax.set_xticks(xticks)
+    ax.set_xticklabels(
+        [datetime.fromtimestamp(grid[i], tz).strftime("%H:%M") for i in xticks],
+        rotation=45
+    )
+
+    ax.set_title(
+        f"Online Status Heatmap\n"
+        f"{datetime.fromtimestamp(lo, tz).strftime('%Y-%m-%d %H:%M')} - "
+        f"{datetime.fromtimestamp(hi, tz).strftime('%Y-%m-%d %H:%M')}"
+    )
+    # ax.set_xlabel("Time")
+    # ax.set_ylabel("User")
+
+    fig.tight_layout()
+    lap("render")
+
+    return fig
+
+
+def _with_open_sessions(df_sessions, current, lo, hi):
+    # незакрытые сессии в online_sessions не попадают — дорисовываем по снимку
+    rows = [
+        (uid, int(e.changed_at), int(e.checked_at))
+        for uid, e in current.items()
+        if e.online and e.changed_at < hi and e.checked_at > lo
+    ]
+    if not rows:
+        return df_sessions
+
+    user_ids, starts, ends = (np.array(c, dtype=np.int64) for c in zip(*rows))
+    open_df = pd.DataFrame({
+        "user_id": user_ids,
+        "started_at": starts,
+        "ended_at": ends,
+        "duration": ends - starts,
+    })
+    return open_df if df_sessions.empty else pd.concat([df_sessions, open_df], ignore_index=True)
+
+
+def _open_seconds(e, lo, hi):
+    if e is None or not e.online:
+        return 0
+    return max(0.0, min(e.checked_at, hi) - max(e.changed_at, lo))
+
+
+def encode_figure(fig, fmt="webp"):
+    # кодируем прямо в воркере — в UI-процесс уходит готовая картинка
+    with stage("encode"), BytesIO() as buf:
+        fig.savefig(buf, format=fmt)
+        data = base64.b64encode(buf.getvalue()).decode()
+    return f"data:image/{fmt};base64,{data}"
+
+
+def render_heatmap(start_time, end_time, step_sec, user_map, tz_name=None, data=None, fmt="webp"):
+    fig = build_heatmap(start_time, end_time, step_sec, user_map, tz_name, data)
+    return None if fig is None else encode_figure(fig, fmt)
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+from datetime import datetime
+
+from collector.snapshot import SnapshotReader
+from ui.config import LIVE_SOCKET, LOCAL_TZ, SNAPSHOT_FILE
+from ui.ranges import zone
+
+# Текущие статусы без запросов к базе.
+#
+# Основной источник — снимок коллектора в памяти (collector.snapshot):
+# его читают и полоска статусов в UI-процессе, и воркеры отрисовки
+# (живой край таймлайна). Если снимка нет, полоска берётся из ленты
+# коллектора (collector.live.LiveFeed): фоновый поток читает Unix-сокет
+# и держит последний статус каждого пользователя в STATE.
+
+# снимок старше — коллектор, видимо, остановлен
+SNAPSHOT_STALE = 30
+
+STATE = {}  # username -> последнее событие
+version = 0
+connected = False
+
+_lock = threading.Lock()
+_thread = None
+_reader = SnapshotReader(SNAPSHOT_FILE)
+_names = None  # user_id -> имя, задаётся в start()
+
+
+def snapshot():
+    """Последний согласованный снимок или None."""
+    with _lock:
+        return _reader.read()
+
+
+def fresh(snap):
+    return snap is not None and time.time() - snap.updated_at < SNAPSHOT_STALE
+
+
+def current():
+    """{user_id: Entry} по свежему снимку; пусто, если снимка нет или он устарел."""
+    snap = snapshot()
+    return {e.user_id: e for e in snap.entries} if fresh(snap) else {}
+
+
+def _apply(event):
+    global version
+    with _lock:
+        STATE[event["username"]] = event
+        version += 1
+
+
+def _set_connected(value):
+    global connected, version
+    with _lock:
+        if connected != value:
+            connected = value
+            version += 1
+
+
+def _run(path):
+    delay = 1
+    while True:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(path)
+                _set_connected(True)
+                delay = 1
+                for line in sock.makefile("r", encoding="utf-8"):
+                    try:
+                        _apply(json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        # оборванная строка (коллектор убит посреди записи) — пропускаем
+                        continue
+        except OSError:
+            pass
+        finally:
+            _set_connected(False)
+        time.sleep(delay)
+        delay = min(delay * 2, 30)
+
+
+def start(path=LIVE_SOCKET, names=None):
+    global _thread, _names
+    _names = names
+    if _thread is None:
+        _thread = threading.Thread(target=_run, args=(path,), daemon=True, name="live-feed")
+        _thread.start()
+
+# --------------------------------------------------
+# Render
+# --------------------------------------------------
+def _fmt_ts(value, tz):
+    return datetime.fromisoformat(value).astimezone(tz).strftime("%H:%M:%S")
+
+
+def _fmt_epoch(ts, tz):
+    return datetime.fromtimestamp(ts, tz).strftime("%H:%M")
+
+
+def _fmt_ago(seconds):
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes} мин"
+    return f"{minutes // 60}ч {minutes % 60}мин"
+
+
+def render_strip(snap, tz=LOCAL_TZ):
+    now = time.time()
+    name = _names or (lambda uid: f"User {uid}")
+    items = []
+    for e in sorted(snap.entries, key=lambda e: (not e.online, name(e.user_id))):
+        if e.online:
+            items.append(f"🟢 **{name(e.user_id)}** {_fmt_ago(now - e.changed_at)}")
+        else:
+            items.append(f"⚫ {name(e.user_id)} {_fmt_epoch(e.was_online or e.changed_at, tz)}")
+
+    text = " · ".join(items) or "Нет данных"
+    if not fresh(snap):
+        text += f"\n\n⚠️ Коллектор не обновлял статусы с {_fmt_epoch(snap.updated_at, tz)}"
+    return text
+
+
+def render_online(tz=LOCAL_TZ):
+    snap = snapshot()
+    if snap is not None:
+        return render_strip(snap, tz)
+
+    with _lock:
+        events = sorted(STATE.values(), key=lambda e: e["username"])
+        is_connected = connected
+
+    if not is_connected and not events:
+        return "⚪ Нет связи с коллектором"
+
+    lines = []
+    for e in events:
+        if e["status"] == "online":
+            lines.append(f"🟢 **{e['username']}** — онлайн с {_fmt_ts(e['ts'], tz)}")
+        else:
+            seen = e["was_online"] or e["ts"]
+            lines.append(f"⚫ {e['username']} — был(а) в {_fmt_ts(seen, tz)}")
+
+    if not is_connected:
+        lines.append("\n⚠️ Лента коллектора недоступна, показан последний известный статус")
+
+    return "\n\n".join(lines) or "Нет данных"
+
+
+# зона, выбранная зрителем: session_hash -> имя зоны
+_zones = {}
+
+
+def set_zone(tz_name, request):
+    if request is not None:
+        _zones[request.session_hash] = tz_name
+
+
+def forget_zone(request):
+    if request is not None:
+        _zones.pop(request.session_hash, None)
+
+
+async def stream_online(request):
+    # генератор для demo.load: пушит клиенту новый текст при каждом изменении
+    # снимка, ленты или зоны зрителя; раз в 10 секунд — чтобы шли «онлайн N мин»
+    session = request.session_hash if request is not None else None
+    seen = None
+    while True:
+        snap = snapshot()
+        tz_name = _zones.get(session)
+        key = (snap and snap.seq, version, tz_name, int(time.time()) // 10)
+        if key != seen:
+            seen = key
+            yield render_online(zone(tz_name))
+        await asyncio.sleep(0.25)
@@ -0,0 +1,217 @@
+from datetime import datetime
+
+import numpy as np
+import plotly.graph_objects as go
+from analytics.pyramid import PyramidStore, grid as pyramid_grid
+from ui.data import frames, load_sessions
+from ui.heatmap import clip_sessions, load_window, sample_timeline, uptime_labels, with_live_edge
+from ui.ranges import zone
+from ui.timing import Laps, stage
+
+# --------------------------------------------------
+# Interactive timeline
+# --------------------------------------------------
+# Режим "Интерактивный" вкладки Таймлайн: та же сетка и те же сессии, что
+# у картинки (ui.heatmap), но фигура Plotly, которую браузер масштабирует
+# сам. Функции вызываются в процессах ui.render_pool.
+#
+# Объём ответа не зависит от длины окна:
+#   - heatmap — int8-матрица не шире MAX_COLUMNS столбцов; шаг сетки
+#     укрупняется под окно (bucket_step), ось задаётся x0/dx, а не массивом;
+#   - сессии — один Scattergl на пользователя, отрезки разделены NaN;
+#     разрывы короче шага сетки склеиваются, их всё равно не видно;
+#   - numpy-массивы plotly сериализует как типизированные (dtype + bdata);
+#   - если построена пирамида (analytics.pyramid), heatmap — доли онлайна
+#     с её самого грубого подходящего уровня, и статусы из базы не читаются:
+#     зум от месяца до минуты — десятки килобайт с диска.
+#
+# Ось X — UTC epoch в секундах; подписи в зоне зрителя считаются здесь,
+# как у картинки. При зуме браузер присылает новое окно (ui.app.zoom_timeline),
+# и фигура пересобирается с шагом под него.
+
+MAX_COLUMNS = 1500
+TICKS = 12
+# интервалы подписей оси X, секунды
+TICK_STEPS = (60, 300, 600, 900, 1800, 3600, 2 * 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400, 2 * 86400, 7 * 86400)
+
+UNKNOWN, OFFLINE, ONLINE = -1, 0, 1
+# -1 — статус ещё не известен (NaN у картинки), рисуется белым
+COLORSCALE = [[0, "#ffffff"], [0.5, "#ffffff"], [0.5, "#e5f5e0"], [0.75, "#e5f5e0"], [0.75, "#31a354"], [1, "#31a354"]]
+
+
+def bucket_step(lo, hi, step_sec, columns=MAX_COLUMNS):
+    """Шаг сетки: не мельче выбранного и не больше columns столбцов на окно."""
+    return max(int(step_sec), -(-(hi - lo) // columns))
+
+
+def session_lines(sessions, uids, step):
+    """{uid: x} — отрезки сессий пользователя через NaN, разрывы < step склеены."""
+    s_uid, s, e = sessions
+    keep = e > s
+    s_uid, s, e = s_uid[keep], s[keep], e[keep]
+    order = np.lexsort((s, s_uid))
+    s_uid, s, e = s_uid[order], s[order], e[order]
+
+    lines = {}
+    for uid in uids:
+        a, b = np.searchsorted(s_uid, uid, "left"), np.searchsorted(s_uid, uid, "right")
+        if a == b:
+            continue
+        starts, ends = s[a:b], np.maximum.accumulate(e[a:b])
+        # новый отрезок начинается, если разрыв с предыдущими не меньше шага
+        new = np.ones(len(starts), dtype=bool)
+        new[1:] = starts[1:] - ends[:-1] >= step
+        first = np.flatnonzero(new)
+        last = np.append(first[1:], len(starts)) - 1
+
+        x = np.full((len(first), 3), np.nan)
+        x[:, 0] = starts[first]
+        x[:, 1] = ends[last]
+        lines[uid] = x.ravel()
+    return lines
+
+
+def _ticks(lo, hi, tz):
+    span = max(hi - lo, 1)
+    interval = next((t for t in TICK_STEPS if span / t <= TICKS), TICK_STEPS[-1])
+    # кратные интервалу по стеночному времени на начало окна
+    offset = int(datetime.fromtimestamp(lo, tz).utcoffset().total_seconds())
+    first = lo - (lo + offset) % interval
+    values = [t for t in range(first, hi + 1, interval) if t >= lo]
+
+    fmt = "%H:%M" if span <= 86400 else ("%d.%m" if interval >= 86400 else "%d.%m %H:%M")
+    return values, [datetime.fromtimestamp(t, tz).strftime(fmt) for t in values]
+
+
+def timeline_figure(df, df_sessions, current, lo, hi, step, user_map, tz):
+    lap = Laps()
+
+    grid = np.arange(lo, hi + 1, int(step), dtype=np.int64)
+    uids, timeline = sample_timeline(df, grid, current)
+    z = np.where(np.isnan(timeline), UNKNOWN, timeline).astype(np.int8)
+
+    lap("timeline")
+
+    heatmap = go.Heatmap(
+        z=z,
+        x0=int(grid[0]),
+        dx=int(step),
+        zmin=UNKNOWN,
+        zmax=ONLINE,
+        colorscale=COLORSCALE,
+        hoverinfo="skip"
+    )
+    return _figure(heatmap, uids, df_sessions, current, lo, hi, step, user_map, tz, lap)
+
+
+def pyramid_figure(pyramid, df_sessions, current, lo, hi, step, user_map, tz):
+    """Доли онлайна из пирамиды (analytics.pyramid) — статусы из базы не читаются."""
+    lap = Laps()
+
+    level, start, step, n = pyramid_grid(lo, hi, step)
+    edges = start + np.arange(n + 1, dtype=np.int64) * step
+    uids = list(user_map)
+    frac = np.empty((len(uids), n), dtype=np.float32)
+    for row, uid in enumerate(uids):
+        frac[row] = pyramid.fractions(uid, start, step, n)
+
+        # открытая сессия в пирамиду ещё не записана — добавляем по снимку
+        e = current.get(uid)
+        if e is not None and e.online:
+            covered = np.minimum(edges[1:], e.checked_at) - np.maximum(edges[:-1], e.changed_at)
+            frac[row] += np.clip(covered, 0, None) / step
+
+    z = np.clip(np.rint(frac * 100), 0, 100).astype(np.int8)
+
+    lap("timeline")
+
+    heatmap = go.Heatmap(
+        z=z,
+        x0=start + step / 2,
+        dx=step,
+        zmin=0,
+        zmax=100,
+        colorscale="Greens",
+        hovertemplate="%{z}%<extra></extra>"
+    )
+    return _figure(heatmap, uids, df_sessions, current, lo, hi, step, user_map, tz, lap, level=level)
+
+
+def _figure(heatmap, uids, df_sessions, current, lo, hi, step, user_map, tz, lap, level=None):
+    labels = [user_map.get(uid, f"User {uid}") for uid in uids]
+
+    sessions = clip_sessions(df_sessions, lo, hi)
+    lines = session_lines(sessions, uids, step)
+
+    lap("overlay")
+
+    user_labels = uptime_labels(uids, labels, sessions, current, lo, hi, sep="<br>")
+    tickvals, ticktext = _ticks(lo, hi, tz)
+
+    lap("labels")
+
+    heatmap.update(y=np.arange(len(uids), dtype=np.int16), showscale=False)
+    fig = go.Figure(heatmap)
+
+    for row, uid in enumerate(uids):
+        x = lines.get(uid)
+        if x is None:
+            continue
+        fig.add_trace(go.Scattergl(
+            x=x,
+            y=np.full(len(x), row, dtype=np.int16),
+            mode="lines",
+            line=dict(color="lime", width=6),
+            opacity=0.6,
+            name=labels[row],
+            hoverinfo="name",
+            showlegend=False
+        ))
+
+    fig.update_layout(
+        title=(
+            f"Online Status Timeline<br>"
+            f"{datetime.fromtimestamp(lo, tz).strftime('%Y-%m-%d %H:%M')} - "
+            f"{datetime.fromtimestamp(hi, tz).strftime('%Y-%m-%d %H:%M')}"
+            + (f" · шаг {step} с, уровень {level} с" if level else "")
+        ),
+        xaxis=dict(range=[lo, hi], tickvals=tickvals, ticktext=ticktext, showgrid=False),
+        yaxis=dict(
+            tickvals=list(range(len(uids))), ticktext=user_labels,
+            autorange="reversed", fixedrange=True, showgrid=False
+        ),
+        height=200 + 40 * len(uids),
+        margin=dict(l=140, r=20, t=60, b=40),
+        # зум держится между перерисовками, пока не сменится окно
+        uirevision=f"{lo}-{hi}",
+        template="plotly_white"
+    )
+
+    lap("render")
+    return fig
+
+
+def build_figure(lo, hi, step_sec, user_map, tz_name=None, data=None):
+    step = bucket_step(lo, hi, step_sec)
+
+    # пирамида готова — нужны только сессии для полосок
+    pyramid = PyramidStore()
+    if pyramid.ready() and user_map:
+        df_sessions = frames(data)[1] if data is not None else load_sessions(lo, hi, user_map.keys())
+        df_sessions, current = with_live_edge(df_sessions, user_map, lo, hi)
+        return pyramid_figure(pyramid, df_sessions, current, lo, hi, step, user_map, zone(tz_name))
+
+    window = load_window(lo, hi, user_map, data)
+    if window is None:
+        return None
+    df, df_sessions, current = window
+    return timeline_figure(df, df_sessions, current, lo, hi, step, user_map, zone(tz_name))
+
+
+def render_figure(lo, hi, step_sec, user_map, tz_name=None, data=None):
+    # JSON собирается в воркере — UI-процесс отдаёт его как есть
+    fig = build_figure(lo, hi, step_sec, user_map, tz_name, data)
+    if fig is None:
+        return None
+    with stage("encode"):
+        return fig.to_json()
@@ -0,0 +1,42 @@
+import numpy as np
+from matplotlib.figure import Figure
+from analytics import profiles
+from ui.heatmap import encode_figure
+from ui.store import get_store
+
+VARIANT_TITLES = {
+    "total": "за всё время",
+    "decay": f"с затуханием (полураспад {profiles.DECAY_HALF_LIFE // 86400} дн.)",
+    "rolling": f"за последние {profiles.ROLLING_WEEKS} нед.",
+}
+
+# --------------------------------------------------
+# Profile (выполняется в процессах ui.render_pool)
+# --------------------------------------------------
+def build_profile(user_id, label, variant, hourly):
+    result = get_store().activity_profile(user_id, variant)
+    if result is None:
+        return None
+
+    _, share = result
+    if hourly:
+        share = profiles.to_hours(share)
+
+    fig = Figure(figsize=(15, 4))
+    ax = fig.subplots()
+    im = ax.imshow(share, aspect="auto", cmap="Greens", interpolation="nearest", vmin=0, vmax=1)
+    fig.colorbar(im, ax=ax, label="Доля онлайна")
+
+    ax.set_yticks(np.arange(7), labels=profiles.WEEKDAYS)
+    per_hour = share.shape[1] // 24
+    ax.set_xticks(np.arange(0, share.shape[1], per_hour), labels=[f"{h:02d}" for h in range(24)])
+    ax.set_xlabel("Час")
+    ax.set_title(f"{label}: активность по часам недели, {VARIANT_TITLES[variant]}")
+
+    fig.tight_layout()
+    return fig
+
+
+def render_profile(user_id, label, variant, hourly, fmt="webp"):
+    fig = build_profile(user_id, label, variant, hourly)
+    return None if fig is None else encode_figure(fig, fmt)
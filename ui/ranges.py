@@ -0,0 +1,139 @@
+import math
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import pytz
+
+from ui.config import LOCAL_TZ, UTC
+
+# Поля Start/End — стеночное время зоны зрителя. Всё, что дальше
+# parse_range, работает с UTC epoch (int); зона нужна только для подписей.
+
+# --------------------------------------------------
+# Utils
+# --------------------------------------------------
+@lru_cache(maxsize=None)
+def zone(name=None):
+    return pytz.timezone(name) if name else LOCAL_TZ
+
+def round_down_5min(dt: datetime):
+    return dt - timedelta(
+        minutes=dt.minute % 5,
+        seconds=dt.second,
+        microseconds=dt.microsecond
+    )
+
+def round_up_5min(dt: datetime):
+    if dt.minute % 5 == 0 and dt.second == 0:
+        return dt.replace(second=0, microsecond=0)
+    return round_down_5min(dt + timedelta(minutes=5))
+
+def now_local(tz=None):
+    return datetime.now(tz or LOCAL_TZ)
+
+def _ago(now, hours):
+    # «N часов назад» — физическое время, через UTC: в день перевода
+    # часов стеночное now - N часов ошибается на час
+    tz = now.tzinfo
+    return (now.astimezone(UTC) - timedelta(hours=hours)).astimezone(tz).replace(tzinfo=None)
+
+# --------------------------------------------------
+# Fast ranges
+# --------------------------------------------------
+PRESETS = [
+    "Текущий час",
+    "Рабочий день",
+    "Последний 1 час",
+    "Последние 3 часа",
+    "Последние 5 часов",
+    "Последние 10 часов",
+    "Текущий день",
+    "Прошлый день",
+    "Текущая неделя"
+]
+
+def calc_range(preset: str, tz_name=None):
+    now = now_local(zone(tz_name))
+    # replace() на aware-времени pytz оставляет старое смещение —
+    # границы суток считаем на стеночном времени без зоны
+    wall = now.replace(tzinfo=None)
+    midnight = datetime.combine(wall.date(), datetime.min.time())
+
+    if preset == "Текущий час":
+        start = wall.replace(minute=0, second=0, microsecond=0)
+        end = wall.replace(hour=23, minute=55, second=0)
+
+    elif preset == "Рабочий день":
+        start = wall.replace(hour=7, minute=0, second=0)
+        end = wall.replace(hour=19, minute=0, second=0)
+
+    elif preset == "Последний 1 час":
+        start = _ago(now, 1)
+        end = wall.replace(hour=23, minute=55, second=0)
+
+    elif preset == "Последние 3 часа":
+        start = _ago(now, 3)
+        end = wall.replace(hour=23, minute=55, second=0)
+
+    elif preset == "Последние 5 часов":
+        start = _ago(now, 5)
+        end = wall.replace(hour=23, minute=55, second=0)
+
+    elif preset == "Последние 10 часов":
+        start = _ago(now, 10)
+        end = wall.replace(hour=23, minute=55, second=0)
+
+    elif preset == "Текущий день":
+        start = midnight
+        end = wall.replace(hour=23, minute=55, second=0)
+
+    elif preset == "Прошлый день":
+        start = midnight - timedelta(days=1)
+        end = start.replace(hour=23, minute=55)
+
+    elif preset == "Текущая неделя":
+        start = midnight - timedelta(days=wall.weekday())
+        end = start + timedelta(days=6, hours=23, minutes=55)
+
+    else:
+        import gradio as gr
+        return gr.update(), gr.update()
+
+    start = round_down_5min(start)
+    end = round_up_5min(end)
+
+    return (
+        start.strftime("%Y-%m-%d %H:%M:%S"),
+        end.strftime("%Y-%m-%d %H:%M:%S"),
+    )
+
+def to_epoch(value, tz):
+    # несуществующее время (весенний перевод) normalize сдвигает вперёд
+    dt = tz.normalize(tz.localize(datetime.strptime(value, "%Y-%m-%d %H:%M:%S")))
+    return int(dt.timestamp())
+
+def parse_range(start_time, end_time, tz_name=None):
+    """Поля Start/End в зоне tz_name → (lo, hi) UTC epoch; hi не позже текущего момента."""
+    tz = zone(tz_name)
+    lo = to_epoch(start_time, tz)
+    hi = min(to_epoch(end_time, tz), int(time.time()))
+    return lo, hi
+
+# самое узкое окно зума — меньше шаг сетки всё равно не покажет
+MIN_ZOOM = 60
+
+def parse_zoom(value):
+    """
+    Окно зума интерактивного графика "lo,hi" (UTC epoch) → (lo, hi); hi не
+    позже текущего момента. Значение приходит и через публичный API
+    (/zoom_timeline), поэтому на мусор — None: окно Start/End.
+    """
+    try:
+        lo, hi = (float(v) for v in str(value).split(","))
+    except ValueError:
+        return None
+    if not (math.isfinite(lo) and math.isfinite(hi) and 0 <= lo < hi):
+        return None
+    hi = min(int(hi), int(time.time()))
+    return min(int(lo), hi - MIN_ZOOM), hi
@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+MAX_WORKERS = int(os.getenv("RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# маркер: тик таймера пропущен, предыдущая отрисовка клиента ещё идёт
+SKIPPED = object()
+
+_executor = None
+_inflight = {}  # key -> Future, одинаковые запросы ждут один и тот же результат
+_clients = {}   # session_hash -> Future последней отрисовки клиента
+_lock = threading.Lock()
+
+
+def _warmup():
+    # грузим pandas/matplotlib в воркере заранее, а не на первом запросе
+    import ui.heatmap  # noqa: F401
+    import ui.plotly_view  # noqa: F401
+    from ui import store
+    from ui.sessions_index import get_index
+    # DuckDB держит UI-процесс, см. ui.store
+    store.use_sqlite()
+    try:
+        get_index()
+    except sqlite3.Error as e:
+        # ошибка в initializer ломает весь пул — индекс соберётся на первом запросе
+        print(f"⚠️ Session index warmup failed: {e}")
+
+
+def heatmap_task(*args):
+    # ссылка на ui.heatmap только внутри воркера: UI-процесс pandas не грузит.
+    # Возвращает (картинка, тайминги этапов) — см. ui.timing
+    from ui.heatmap import render_heatmap
+    from ui.timing import traced
+    return traced(render_heatmap, *args, label="heatmap")
+
+
+def plotly_task(*args):
+    # интерактивный режим: JSON фигуры Plotly и тайминги, см. ui.plotly_view
+    from ui.plotly_view import render_figure
+    from ui.timing import traced
+    return traced(render_figure, *args, label="plotly")
+
+
+def profile_task(*args):
+    from ui.profile import render_profile
+    return render_profile(*args)
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        # spawn: fork из процесса с потоками gradio небезопасен
+        _executor = ProcessPoolExecutor(
+            max_workers=MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warmup
+        )
+    return _executor
+
+
+def _restart(pool):
+    # воркер умер (OOM killer, segfault) — такой пул отвечает BrokenProcessPool
+    # на всё, что в него отправят, поэтому заменяем его новым
+    global _executor
+    with _lock:
+        if _executor is pool:
+            _executor = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _forget(key, fut):
+    with _lock:
+        if _inflight.get(key) is fut:
+            del _inflight[key]
+
+
+def submit(key, fn, *args):
+    with _lock:
+        fut = _inflight.get(key)
+        if fut is not None:
+            return fut
+        fut = _pool().submit(fn, *args)
+        _inflight[key] = fut
+    # уже готовый future вызывает callback сразу — под _lock это взаимоблокировка
+    fut.add_done_callback(lambda f: _forget(key, f))
+    return fut
+
+
+def run(key, fn, *args, client=None, drop_if_busy=False):
+    with _lock:
+        prev = _clients.get(client) if client is not None else None
+        if drop_if_busy and prev is not None and not prev.done():
+            return SKIPPED
+
+    for attempt in range(2):
+        with _lock:
+            pool = _pool()
+        try:
+            fut = submit(key, fn, *args)
+
+            if client is not None:
+                with _lock:
+                    _clients[client] = fut
+                fut.add_done_callback(lambda f: _release(client, f))
+
+            return fut.result()
+        except BrokenProcessPool:
+            if attempt:
+                raise
+            print("⚠️ Render worker died, restarting the pool")
+            _restart(pool)
+
+
+def _release(client, fut):
+    with _lock:
+        if _clients.get(client) is fut:
+            del _clients[client]
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import numpy as np
+
+from ui.store import get_store
+
+# Индекс сессий в памяти процесса отрисовки.
+#
+# На пользователя — starts/ends (int64 epoch), отсортированные по началу,
+# и prefix_max[i] = max(ends[:i + 1]). Сессии, пересекающие [a, b]:
+#
+#   hi = searchsorted(starts, b, "right")       — начались не позже b
+#   lo = searchsorted(prefix_max, a, "left")    — до lo все закончились раньше a
+#
+# и фильтр ends[lo:hi] >= a — O(log n + k), сессии почти не вложены.
+#
+# Новые строки подтягиваются по водяному знаку rowid; пока data_version
+# хранилища не изменился, к базе вообще не обращаемся. Правки и удаления
+# существующих строк (python -m collector.rebuild) видны по счётчику
+# sessions_version (триггеры, collector.db) — тогда индекс читается
+# заново; на старой базе без счётчика — раз в RELOAD_EVERY секунд.
+
+RELOAD_EVERY = 3600
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+class _UserSessions:
+
+    def __init__(self):
+        self.starts = _EMPTY
+        self.ends = _EMPTY
+        self.prefix_max = _EMPTY
+
+    def extend(self, starts, ends):
+        starts = np.concatenate([self.starts, starts])
+        ends = np.concatenate([self.ends, ends])
+        # строки обычно приходят по порядку — сортируем только если нужно
+        if len(starts) > 1 and (np.diff(starts) < 0).any():
+            order = np.argsort(starts, kind="stable")
+            starts, ends = starts[order], ends[order]
+        self.starts, self.ends = starts, ends
+        self.prefix_max = np.maximum.accumulate(ends) if len(ends) else _EMPTY
+
+    def query(self, a, b):
+        hi = np.searchsorted(self.starts, b, "right")
+        lo = np.searchsorted(self.prefix_max[:hi], a, "left")
+        s, e = self.starts[lo:hi], self.ends[lo:hi]
+        keep = e >= a
+        return s[keep], e[keep]
+
+
+class SessionIndex:
+
+    def __init__(self, store=None):
+        self.store = store or get_store()
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.users = {}
+        self.watermark = 0
+        self._sessions_version = None
+        self._data_version = None
+        self._loaded_at = time.monotonic()
+
+    def refresh(self):
+        """Подтянуть новые сессии. Возвращает число добавленных строк."""
+        with self._lock:
+            if time.monotonic() - self._loaded_at > RELOAD_EVERY:
+                self._reset()
+
+            data_version = self.store.data_version()
+            if data_version is not None and data_version == self._data_version:
+                return 0
+
+            # одна строка по первичному ключу вместо COUNT(*) по таблице
+            sessions_version = self.store.sessions_version()
+            if sessions_version != self._sessions_version:
+                if self._sessions_version is not None:
+                    self._reset()
+                self._sessions_version = sessions_version
+
+            rows = self.store.sessions_since(self.watermark)
+            self._data_version = data_version
+            if not rows:
+                return 0
+
+            ids, user_ids, starts, ends = zip(*rows)
+            user_ids = np.array(user_ids, dtype=np.int64)
+            starts, ends = np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+            for uid in np.unique(user_ids):
+                mask = user_ids == uid
+                self.users.setdefault(int(uid), _UserSessions()).extend(starts[mask], ends[mask])
+
+            self.watermark = max(ids)
+            return len(rows)
+
+    def query(self, user_id, a, b):
+        """(starts, ends) сессий user_id, пересекающих [a, b] (epoch)."""
+        sessions = self.users.get(user_id)
+        if sessions is None:
+            return _EMPTY, _EMPTY
+        return sessions.query(int(a), int(b))
+
+
+_index = None
+
+
+def get_index():
+    # один индекс на процесс; каждый вызов подтягивает новые строки
+    global _index
+    if _index is None:
+        _index = SessionIndex()
+    _index.refresh()
+    return _index
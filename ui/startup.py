@@ -0,0 +1,18 @@
+import time
+
+# импортируется первым в ui.app — отсчёт идёт от старта процесса UI
+_T0 = time.perf_counter()
+_marks = []
+
+
+def mark(name):
+    _marks.append((name, time.perf_counter()))
+
+
+def report():
+    print("⏱ UI startup:")
+    prev = _T0
+    for name, ts in _marks:
+        print(f"   {name:<24} {ts - prev:7.3f}s")
+        prev = ts
+    print(f"   {'total':<24} {prev - _T0:7.3f}s")
@@ -0,0 +1,41 @@
+import threading
+
+from storage import open_storage
+from ui.config import DB_FILE
+
+# Файл DuckDB (STORAGE_BACKEND=duckdb) держит один процесс — UI. Воркеры
+# ui.render_pool и коллектор работают с SQLite; окно для воркеров при
+# колоночном хранилище собирает UI-процесс (window) и передаёт им строки.
+
+_store = None
+_backend = None
+_lock = threading.Lock()
+
+
+def use_sqlite():
+    # вызывается в воркере до первого get_store()
+    global _backend
+    _backend = "sqlite"
+
+
+def get_store():
+    # одно хранилище на процесс (UI или воркер отрисовки), только чтение
+    global _store
+    with _lock:
+        if _store is None:
+            _store = open_storage(DB_FILE, readonly=True, backend=_backend)
+        return _store
+
+
+def columnar():
+    return getattr(get_store(), "duck", None) is not None
+
+
+def window(lo, hi, user_ids):
+    """(statuses, sessions) окна в формате collector.recent.RecentBuffer.window."""
+    import numpy as np
+
+    store = get_store()
+    statuses = store.statuses(lo, hi, user_ids)
+    rows = np.array(store.sessions(lo, hi, user_ids), dtype=np.int64).reshape(-1, 4)
+    return statuses, (rows[:, 1], rows[:, 2], rows[:, 3])
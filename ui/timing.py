@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+# Тайминги этапов отрисовки.
+#
+# В воркере (ui.render_pool) build_heatmap и загрузчики размечают этапы
+# через stage(); трасса возвращается в UI-процесс вместе с картинкой,
+# там копится в скользящем окне (percentiles) и пишется в лог JSON-строкой.
+#
+#   TIMING_LOG=path     — все запросы в файл (ротация по 5 МБ)
+#   SLOW_REQUEST=2.0    — без TIMING_LOG в stderr пишутся только медленные
+#   PROFILE_SLOW=1.0    — сэмплирующий профайлер в воркере; стеки запросов
+#                         дольше порога сохраняются в PROFILE_DIR
+#                         (collapsed stacks: flamegraph.pl, speedscope)
+
+STAGES = ("queue", "query", "parse", "timeline", "overlay", "labels", "render", "encode")
+WINDOW = 500
+
+TIMING_LOG = os.getenv("TIMING_LOG")
+SLOW_REQUEST = float(os.getenv("SLOW_REQUEST", "2.0"))
+PROFILE_SLOW = float(os.getenv("PROFILE_SLOW", "0")) or None
+PROFILE_DIR = os.getenv("PROFILE_DIR", "shared/profiles")
+SAMPLE_INTERVAL = 0.005
+
+# --------------------------------------------------
+# Trace (воркер)
+# --------------------------------------------------
+_current = None
+
+
+class Trace:
+
+    def __init__(self):
+        self.stages = {}
+        self.started = time.perf_counter()
+        self.total = None
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+        return {"total": self.total, "stages": self.stages}
+
+
+@contextmanager
+def trace():
+    global _current
+    prev, _current = _current, Trace()
+    try:
+        yield _current
+    finally:
+        _current = prev
+
+
+@contextmanager
+def stage(name):
+    # вне trace() ничего не меряем — функции можно звать откуда угодно
+    if _current is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current.add(name, time.perf_counter() - t0)
+
+
+class Laps:
+    """Последовательные этапы без вложенности: lap(name) — время с прошлой отметки."""
+
+    def __init__(self):
+        self.t = time.perf_counter()
+
+    def __call__(self, name):
+        now = time.perf_counter()
+        if _current is not None:
+            _current.add(name, now - self.t)
+        self.t = now
+
+
+class Sampler:
+    """
+    Сэмплирующий профайлер: фоновый поток раз в interval снимает стек
+    целевого потока через sys._current_frames(). Накладные расходы не
+    зависят от числа вызовов, в отличие от cProfile.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def traced(fn, *args, label="render"):
+    """
+    Выполнить fn в трассе. Возвращает (result, timings); при PROFILE_SLOW
+    стеки медленных вызовов сохраняются, путь — в timings["profile"].
+    """
+    sampler = None
+    with trace() as t:
+        if PROFILE_SLOW:
+            with Sampler() as sampler:
+                result = fn(*args)
+        else:
+            result = fn(*args)
+        timings = t.finish()
+
+    if sampler is not None and timings["total"] >= PROFILE_SLOW:
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{os.getpid()}.txt")
+        sampler.dump(path)
+        timings["profile"] = path
+    return result, timings
+
+# --------------------------------------------------
+# Aggregation (UI-процесс)
+# --------------------------------------------------
+_lock = threading.Lock()
+_window = {}  # stage -> deque секунд
+
+
+def _logger():
+    logger = logging.getLogger("vitm.timing")
+    if not logger.handlers:
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if TIMING_LOG:
+            os.makedirs(os.path.dirname(TIMING_LOG) or ".", exist_ok=True)
+            handler = RotatingFileHandler(TIMING_LOG, maxBytes=5 << 20, backupCount=3)
+        else:
+            handler = logging.StreamHandler(sys.stderr)
+        logger.addHandler(handler)
+    return logger
+
+
+def record(event, timings, **fields):
+    """Учесть трассу запроса: окно для перцентилей + структурный лог."""
+    if not timings:
+        return
+    with _lock:
+        for name, seconds in [("total", timings["total"]), *timings["stages"].items()]:
+            _window.setdefault(name, deque(maxlen=WINDOW)).append(seconds)
+
+    if TIMING_LOG or timings["total"] >= SLOW_REQUEST:
+        _logger().info(json.dumps({
+            "ts": round(time.time(), 3),
+            "event": event,
+            "total": round(timings["total"], 4),
+            "stages": {k: round(v, 4) for k, v in timings["stages"].items()},
+            **({"profile": timings["profile"]} if "profile" in timings else {}),
+            **fields,
+        }, ensure_ascii=False))
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def percentiles():
+    """{stage: {count, p50, p95, p99, max}} по последним WINDOW запросам."""
+    with _lock:
+        snapshot = {name: sorted(values) for name, values in _window.items()}
+    return {
+        name: {
+            "count": len(values),
+            "p50": _percentile(values, 0.5),
+            "p95": _percentile(values, 0.95),
+            "p99": _percentile(values, 0.99),
+            "max": values[-1],
+        }
+        for name, values in snapshot.items() if values
+    }
+
+
+def render_table():
+    stats = percentiles()
+    if not stats:
+        return "_Нет данных — ещё не было отрисовок._"
+    lines = [
+        "| Этап | n | p50, мс | p95, мс | p99, мс | max, мс |",
+        "|---|---:|---:|---:|---:|---:|",
+    ]
+    for name in ("total", *STAGES):
+        s = stats.get(name)
+        if s:
+            lines.append(
+                f"| {name} | {s['count']} | {s['p50'] * 1000:.0f} | {s['p95'] * 1000:.0f} "
+                f"| {s['p99'] * 1000:.0f} | {s['max'] * 1000:.0f} |"
+            )
+    return "\n".join(lines)